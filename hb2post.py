@@ -13,62 +13,258 @@
 # Contributors:
 # - Luis Sergio Oliveira (euluis)
 
-from htmled import HbFile, PostExtractor
+# The parser modules are imported only when the handbook files are parsed,
+# so that the queries answered by the quick index start fast.
 import sys
 import os
 from optparse import OptionParser
 from datetime import date, datetime
 
 class CadernosOptions:
+    Commands = ['serve']
+
     def __init__(self, args=sys.argv[1:]):
-        parser = OptionParser()
-        parser.add_option('-s', '--startdate', default=date.today().__str__(),
-                          help='the start date of the date interval for which to get posts, inclusive')
-        parser.add_option('-e', '--enddate', default=date.today().__str__(),
-                          help='the end date of the date interval for which to get posts, inclusive')
+        parser = OptionParser(usage='%prog [options]\n' +
+                              '       %prog serve [--port PORT] [options]')
+        parser.add_option('-s', '--startdate', default=None,
+                          help='the start date of the date interval for which to get posts, inclusive [default: today]')
+        parser.add_option('-e', '--enddate', default=None,
+                          help='the end date of the date interval for which to get posts, inclusive [default: today]')
         parser.add_option('-b', '--handbook', default='programacao',
                           help="the handbook from which you want to retrieve posts: "
                           "cpp, ensino, idiota, pessoal, programacao or web [default: %default")
-        (self.options, args) = parser.parse_args(args)
+        parser.add_option('-o', '--output-dir', default=None,
+                          help='write each post to its own HTML file, plus monthly '
+                          'index pages, in this directory instead of printing them')
+        parser.add_option('-f', '--format', default='text', choices=['text', 'jsonl'],
+                          help="the output format of the posts: text or jsonl, "
+                          "one JSON object per line [default: %default]")
+        parser.add_option('--encoding', default='iso-8859-1',
+                          help='the character encoding of the handbook files '
+                          '[default: %default]')
+        parser.add_option('-c', '--changed-only', action='store_true', default=False,
+                          help='emit only the posts that are new or changed since '
+                          'they were last emitted, as recorded in the manifest')
+        parser.add_option('--manifest', default=None,
+                          help='the manifest of emitted posts used by --changed-only '
+                          '[default: .hb2post-manifest in the handbook directory]')
+        parser.add_option('--search', default=None, metavar='QUERY',
+                          help='search the posts in the index for QUERY, made of '
+                          'words, "phrases", -excluded words and OR, without '
+                          'parsing the handbook files')
+        parser.add_option('--update-index', action='store_true', default=False,
+                          help='index the handbook files changed since the index '
+                          'was last updated')
+        parser.add_option('--index', default=None,
+                          help='the full text index file used by --search and '
+                          '--update-index [default: .hb2post-index in the '
+                          'handbook directory]')
+        parser.add_option('--store', default=None,
+                          help='keep the entries, posts and links in this SQLite '
+                          'database, parsing only the handbook files changed '
+                          'since they were stored, and get the posts from it')
+        parser.add_option('-j', '--jobs', type='int', default=4,
+                          help='the number of parallel writers [default: %default]')
+        parser.add_option('-p', '--processes', type='int', default=1,
+                          help='the number of processes normalizing the '
+                          'entries of each handbook file and adapting the '
+                          'links of the posts [default: %default]')
+        parser.add_option('--dedup', action='store_true', default=False,
+                          help='drop the posts with the same date, title and '
+                          'contents as a previous post, e.g., an entry copied '
+                          'into another handbook file')
+        parser.add_option('--tolerant', action='store_true', default=False,
+                          help='skip the malformed entries of the handbook '
+                          'files, up to their next daily entry, reporting '
+                          'each to stderr, instead of stopping at the first')
+        parser.add_option('--quick-index', default=None,
+                          help='the index of the rendered posts which answers '
+                          'the text output without parsing the handbook files '
+                          'while they are unchanged [default: .hb2post-quick '
+                          'in the handbook directory]')
+        parser.add_option('--no-quick-index', action='store_true', default=False,
+                          help="neither use nor build the quick index")
+        parser.add_option('--check-links', action='store_true', default=False,
+                          help='report the links between posts which can\'t be '
+                          'adapted to the blog, with their file, line and '
+                          'offset, and exit with status 1 if there are any')
+        parser.add_option('--analytics', action='store_true', default=False,
+                          help='report the posts per month, the words per '
+                          'post, the share of code listings, the most linked '
+                          'entries and the writing streaks of the handbook '
+                          'files, parsed one at a time as with --processes '
+                          'and --tolerant')
+        parser.add_option('--memory-report', action='store_true', default=False,
+                          help='report to stderr the retained memory, the '
+                          'change and the peak of the resident set size of '
+                          'each phase of the extraction of the posts, and the '
+                          'types of the '
+                          'objects taking the most memory after it (not '
+                          'their allocation sites, which Python 2 can\'t '
+                          'trace)')
+        parser.add_option('--atom', default=None, metavar='FILE',
+                          help='write the posts to FILE as a Blogger import '
+                          'Atom feed, split in FILE_2, FILE_3, etc., when '
+                          'larger than --atom-max-bytes')
+        parser.add_option('--atom-max-bytes', type='int', default=None,
+                          help='the maximum size of each Atom file written '
+                          'by --atom [default: no maximum]')
+        parser.add_option('--watch', action='store_true', default=False,
+                          help='keep polling the handbook files, emitting the '
+                          'posts which are new or changed since the previous '
+                          'poll, until interrupted')
+        parser.add_option('--interval', type='float', default=1.0,
+                          help='the seconds between the polls of --watch '
+                          '[default: %default]')
+        parser.add_option('--port', type='int', default=8042,
+                          help='the localhost port of the preview server of the '
+                          'serve command [default: %default]')
+        (self.options, self.args) = parser.parse_args(args)
+        if self.args and (self.args[0] not in CadernosOptions.Commands or
+                          len(self.args) > 1):
+            parser.error("unexpected arguments: '" + ' '.join(self.args) + "'")
+        if self.options.tolerant and (self.options.store or
+                                      self.options.update_index):
+            parser.error('--tolerant can\'t be used with --store nor '
+                         '--update-index, which keep the parsed files for '
+                         'later runs')
+
+    def handbookdir(self):
+        return os.getenv('HOME') + '/documentos/cadernos/' + \
+            self.options.handbook + '/'
 
     def hbfilenames(self):
-        baseHandbooksDir = os.getenv('HOME') + '/documentos/cadernos/'
+        handbookDir = self.handbookdir()
         if self.options.handbook == 'programacao':
-            handbookDir = baseHandbooksDir + 'programacao/'
             filenames = [handbookDir + 'parte01.html']
             for i in range(2,6):
                 filenames.append(handbookDir + 'ficheiro0' + str(i) + '.html')
             return filenames
         else:
-            handbookDir = baseHandbooksDir + self.options.handbook + '/'
             filenames = []
             for i in range(1,3):
                 filenames.append(handbookDir + 'ficheiro0' + str(i) + '.html')
             return filenames
 
+    def command(self):
+        if self.args:
+            return self.args[0]
+        return None
+
+    def port(self):
+        return self.options.port
+
+    def watch(self):
+        return self.options.watch
+
+    def interval(self):
+        return self.options.interval
+
+    def checklinks(self):
+        return self.options.check_links
+
+    def analytics(self):
+        return self.options.analytics
+
+    def memoryreport(self):
+        return self.options.memory_report
+
+    def atompath(self):
+        return self.options.atom
+
+    def atommaxbytes(self):
+        return self.options.atom_max_bytes
+
     def parseIsoDate(self, strIsoDate):
         return datetime.strptime(strIsoDate, '%Y-%m-%d').date()
 
     def startdate(self):
+        if self.options.startdate == None:
+            return date.today()
         return self.parseIsoDate(self.options.startdate)
 
     def enddate(self):
+        if self.options.enddate == None:
+            return date.today()
         return self.parseIsoDate(self.options.enddate)
 
+    def outputdir(self):
+        return self.options.output_dir
+
+    def jobs(self):
+        return self.options.jobs
+
+    def processes(self):
+        return self.options.processes
+
+    def tolerant(self):
+        return self.options.tolerant
+
+    def dedup(self):
+        return self.options.dedup
+
+    def changedonly(self):
+        return self.options.changed_only
+
+    def manifestpath(self):
+        if self.options.manifest:
+            return self.options.manifest
+        return self.handbookdir() + '.hb2post-manifest'
+
+    def search(self):
+        return self.options.search
+
+    def updateindex(self):
+        return self.options.update_index
+
+    def indexpath(self):
+        if self.options.index:
+            return self.options.index
+        return self.handbookdir() + '.hb2post-index'
+
+    def storepath(self):
+        return self.options.store
+
+    def quickindexpath(self):
+        """quickindexpath() -> path of the quick index, or None if unused
+
+        The quick index is only used for the text output of the posts to the
+        standard output, with no other source nor filter of the posts, and
+        with the strict parsing, since the tolerant one reports diagnostics.
+        """
+        if self.options.no_quick_index or self.outputdir() or \
+                self.atompath() or self.format() != 'text' or \
+                self.changedonly() or self.storepath() or self.dedup() or \
+                self.tolerant():
+            return None
+        if self.options.quick_index:
+            return self.options.quick_index
+        return self.handbookdir() + '.hb2post-quick'
+
+    def format(self):
+        return self.options.format
+
+    def encoding(self):
+        return self.options.encoding
+
 
 def getPostsFromHbFile(hbfilename, startDate, endDate):
-    f = file(hbfilename)
+    from htmled import HbFile, PostExtractor
+    from hbsources import openHbSource
+    f = openHbSource(hbfilename)
     pe = PostExtractor(HbFile(f))
     f.close()
     return pe.getPosts(startDate, endDate)
 
 class HbFileAuto():
-    def __init__(self, filenames):
+    def __init__(self, filenames, workers = 1, tolerant = False):
         if filenames == None or len(filenames) == 0:
             raise ValueError(
                 "'filenames' must be a list containing at least one file name. It is: '"\
                     + str(filenames) + "'")
         self.filenames = filenames
+        self.workers = workers
+        self.tolerant = tolerant
         self.createHbFiles(filenames)
 
     def createHbFiles(self, fns):
@@ -83,22 +279,204 @@ class HbFileAuto():
         return hbf
 
     def openFile(self, fn):
-        return file(fn)
+        from hbsources import openHbSource
+        return openHbSource(fn)
 
     def closeFile(self, f):
         f.close()
 
     def createHbFile(self, f):
-        return HbFile(f)
+        from htmled import HbFile
+        hbf = HbFile(f, workers=self.workers, tolerant=self.tolerant)
+        printDiagnostics(f.name, hbf)
+        return hbf
+
+
+def printDiagnostics(name, hbf):
+    """printDiagnostics(name, hbf): print the diagnostics of the tolerant
+    parsing of the HbFile hbf, read from name, to stderr"""
+    for diagnostic in hbf.diagnostics:
+        print >> sys.stderr, name + ':' + str(diagnostic)
+
+
+class WarmHbFiles(HbFileAuto):
+    """HbFileAuto which keeps the HbFile instances of the handbook files
+    warm, re-parsing only the files whose size or modification time changed
+    since they were last parsed."""
+    def __init__(self, filenames, workers = 1, tolerant = False):
+        self.fingerprints = {}
+        HbFileAuto.__init__(self, filenames, workers, tolerant)
+
+    def hbf(self, fn):
+        from hbsources import sourceFingerprint
+        fingerprint = sourceFingerprint(fn)
+        hbf = HbFileAuto.hbf(self, fn)
+        self.fingerprints[fn] = fingerprint
+        return hbf
+
+    def refresh(self, errors = None):
+        """refresh([errors]) -> reparsedFilenames
+
+        Re-parse the handbook files that changed since they were last parsed.
+        If errors is a list, a file which fails to parse, e.g., while it is
+        being written, keeps its previous HbFile and (filename, error) is
+        appended to errors; the file is parsed again in the next refresh.
+        """
+        from hbsources import sourceFingerprint
+        from htmled import StateError
+        reparsed = []
+        for i, fn in enumerate(self.filenames):
+            if sourceFingerprint(fn) != self.fingerprints.get(fn):
+                try:
+                    self.hbfs[i] = self.hbf(fn)
+                except (StateError, ValueError), e:
+                    if errors == None:
+                        raise
+                    errors.append((fn, e))
+                    continue
+                reparsed.append(fn)
+        return reparsed
 
 
 def main():
     options = CadernosOptions()
-    hbfauto = HbFileAuto(options.hbfilenames())
-    pe = PostExtractor(*hbfauto.hbfs)
-    posts = pe.getPosts(options.startdate(), options.enddate())
+    if options.command() == 'serve':
+        from hbserve import serve
+        serve(options)
+        return
+    if options.watch():
+        from hbwatch import watch
+        watch(options)
+        return
+    if options.checklinks():
+        from hblinks import checkLinks
+        from hbsources import openHbSource
+        if checkLinks(options.hbfilenames(), openHbSource, sys.stdout,
+                      options.tolerant()):
+            sys.exit(1)
+        return
+    if options.analytics():
+        from hbanalytics import analyze
+        analyze(options.hbfilenames(), options.processes(),
+                options.tolerant()).report(sys.stdout)
+        return
+    if options.memoryreport():
+        from hbmemory import accountExtraction
+        posts, accounting = accountExtraction(options.hbfilenames(),
+                                              options.startdate(),
+                                              options.enddate(),
+                                              options.processes(),
+                                              options.tolerant(),
+                                              options.dedup())
+        writeTextPosts(posts, sys.stdout)
+        accounting.report(sys.stderr)
+        return
+    if options.updateindex() or options.search():
+        searchPosts(options)
+        return
+    quick = None
+    if options.quickindexpath():
+        from hbquick import QuickIndex
+        quick = QuickIndex(options.quickindexpath())
+        fingerprints = quick.fingerprints(options.hbfilenames())
+        if quick.isCurrent(fingerprints):
+            quick.writePosts(options.startdate(), options.enddate(), sys.stdout)
+            return
+    if options.storepath():
+        pe = storePostExtractor(options)
+    else:
+        from htmled import PostExtractor
+        hbfauto = HbFileAuto(options.hbfilenames(), options.processes(),
+                             options.tolerant())
+        pe = PostExtractor(*hbfauto.hbfs)
+    pe.workers = options.processes()
+    pe.dedup = options.dedup()
+    if quick != None:
+        quick.build(fingerprints, pe.iterPosts(), renderTextPost)
+        quick.writePosts(options.startdate(), options.enddate(), sys.stdout)
+        return
+    posts = pe.iterPosts(options.startdate(), options.enddate())
+    manifest = None
+    if options.changedonly():
+        from hbmanifest import PostManifest
+        manifest = PostManifest(options.manifestpath())
+        posts = manifest.changedPosts(posts)
+    if options.outputdir():
+        writePostFiles(list(posts), options.outputdir(), options.jobs())
+    elif options.atompath():
+        writeAtomPosts(posts, options)
+    elif options.format() == 'jsonl':
+        writeJsonLinesPosts(posts, sys.stdout, options.encoding())
+    else:
+        writeTextPosts(posts, sys.stdout)
+    if manifest != None:
+        manifest.save()
+
+
+def renderTextPost(post):
+    return str(post) + '\n'
+
+
+def writeTextPosts(posts, out):
     for post in posts:
-        print post
+        out.write(renderTextPost(post))
+
+
+def postAsDict(post):
+    return {'date': post.date.isoformat(), 'title': post.title,
+            'subjname': post.subjname, 'hbfname': post.hbfname,
+            'permalink': post.getPermaLink(), 'names': post.names,
+            'contents': post.contents}
+
+
+def writeJsonLinesPosts(posts, out, encoding='utf-8'):
+    """writeJsonLinesPosts(posts, out[, encoding])
+
+    Write each post to out as soon as it is generated, as a JSON object in a
+    line of its own. The strings of the posts are decoded with encoding.
+    """
+    import json
+    encoder = json.JSONEncoder(separators=(',', ':'), encoding=encoding)
+    for post in posts:
+        out.write(encoder.encode(postAsDict(post)))
+        out.write('\n')
+
+
+def storePostExtractor(options):
+    from hbstore import PostStore, StorePostExtractor
+    from hbsources import openHbSource
+    from htmled import HbFile
+    store = PostStore(options.storepath())
+    store.update(options.hbfilenames(), openHbSource, HbFile)
+    return StorePostExtractor(store)
+
+
+def searchPosts(options):
+    from hbsearch import HbIndex, decodeQuery
+    index = HbIndex(options.indexpath(), options.encoding())
+    if options.updateindex():
+        if index.update(options.hbfilenames()):
+            index.save()
+    if options.search():
+        for d, title, permaLink, score in \
+                index.search(decodeQuery(options.search())):
+            print d, permaLink, title
+
+
+def writePostFiles(posts, outputdir, jobs):
+    from hbwriter import PostFileWriter
+    written, unchanged = PostFileWriter(outputdir, jobs).writePosts(posts)
+    print >> sys.stderr, str(len(written)) + ' files written, ' + \
+        str(len(unchanged)) + ' unchanged.'
+
+
+def writeAtomPosts(posts, options):
+    from hbatom import AtomExporter
+    exporter = AtomExporter(options.atompath(), options.atommaxbytes(),
+                            options.encoding(), title=options.options.handbook)
+    paths = exporter.exportPosts(posts)
+    print >> sys.stderr, str(exporter.entries) + ' posts written to ' + \
+        str(len(paths)) + ' files.'
 
 
 if __name__ == "__main__":
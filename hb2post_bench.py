@@ -0,0 +1,108 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Benchmark of the startup latency of hb2post: the cold invocations, which
+# parse the handbook files (and rebuild the quick index), and the warm ones,
+# which are answered by the quick index.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from optparse import OptionParser
+
+Handbook = 'web'
+
+
+def writeSyntheticHbFile(path, firstDate, days, subjectsPerDay = 2):
+    """writeSyntheticHbFile(path, firstDate, days[, subjectsPerDay])
+
+    Write a handbook file with a daily entry for each of days days, starting
+    at firstDate, each with subjectsPerDay subject entries.
+    """
+    out = open(path, 'wb')
+    try:
+        out.write('<html><head><title>Ficheiro</title></head><body>\n'
+                  '<h1>Caderno</h1>\n<div lang="en">\n')
+        for day in range(days):
+            d = (firstDate + timedelta(day)).isoformat()
+            out.write('<h2><a name="%s" class="ancora">%s</a></h2>\n' % (d, d))
+            for subject in range(subjectsPerDay):
+                name = 'se_%s_%d' % (d.replace('-', '_'), subject)
+                out.write('<h3><a name="%s">Subject %d of %s</a></h3>\n' %
+                          (name, subject, d))
+                out.write('<p>Some text of the subject entry, with a '
+                          '<a href="#%s">link to the day</a>.</p>\n' % d)
+        out.write('</div>\n<a name="fundo" class="ancora"></a>\n'
+                  '</body></html>\n')
+    finally:
+        out.close()
+
+def timeInvocations(home, args, runs):
+    """timeInvocations(home, args, runs) -> [seconds1, seconds2, ...]"""
+    env = dict(os.environ)
+    env['HOME'] = home
+    command = [sys.executable, os.path.join(os.path.dirname(
+                os.path.abspath(__file__)), 'hb2post.py'), '-b', Handbook] + args
+    times = []
+    for i in range(runs):
+        start = time.time()
+        subprocess.check_call(command, env=env, stdout=open(os.devnull, 'wb'))
+        times.append(time.time() - start)
+    return times
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) / 2]
+
+
+def main(args = sys.argv[1:]):
+    parser = OptionParser(usage='%prog [-d DAYS] [-r RUNS]')
+    parser.add_option('-d', '--days', type='int', default=500,
+                      help='the number of daily entries of each handbook file '
+                      '[default: %default]')
+    parser.add_option('-r', '--runs', type='int', default=5,
+                      help='the number of invocations of each kind '
+                      '[default: %default]')
+    (options, args) = parser.parse_args(args)
+    home = tempfile.mkdtemp()
+    try:
+        hbdir = os.path.join(home, 'documentos', 'cadernos', Handbook)
+        os.makedirs(hbdir)
+        for i in range(1, 3):
+            writeSyntheticHbFile(os.path.join(hbdir, 'ficheiro0%d.html' % i),
+                                 date(2000, 1, 1) + timedelta(i * options.days),
+                                 options.days)
+        quickIndex = os.path.join(hbdir, '.hb2post-quick')
+        cold = []
+        for i in range(options.runs):
+            if os.path.exists(quickIndex):
+                os.remove(quickIndex)
+            cold += timeInvocations(home, [], 1)
+        warm = timeInvocations(home, [], options.runs)
+        noIndex = timeInvocations(home, ['--no-quick-index'], options.runs)
+        print 'daily entries: %d' % (2 * options.days)
+        print 'invocation                   median seconds'
+        print 'cold (rebuilds quick index)  %14.3f' % median(cold)
+        print 'warm (quick index)           %14.3f' % median(warm)
+        print 'without quick index          %14.3f' % median(noIndex)
+    finally:
+        shutil.rmtree(home)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,10 @@
 from datetime import date
 import unittest
 import re
+import json
+from StringIO import StringIO
 from hb2post import *
+from htmled import Post
 
 
 class CadernosOptionsTest(unittest.TestCase):
@@ -58,6 +61,91 @@ class CadernosOptionsTest(unittest.TestCase):
         self.assertDateEquals(date.today(), options.enddate())
 
 
+    def test_format_default_and_jsonl(self):
+        self.assertEquals('text', CadernosOptions([]).format())
+        self.assertEquals('jsonl', CadernosOptions(['--format', 'jsonl']).format())
+
+    def test_atom_output_doesnt_use_the_quick_index(self):
+        self.assertEquals(None, CadernosOptions([]).atompath())
+        options = CadernosOptions(['--atom', 'posts.xml',
+                                   '--atom-max-bytes', '1000000'])
+        self.assertEquals('posts.xml', options.atompath())
+        self.assertEquals(1000000, options.atommaxbytes())
+        self.assertEquals(None, options.quickindexpath())
+
+    def test_tolerant_parsing_doesnt_use_the_quick_index(self):
+        self.assertTrue(CadernosOptions([]).quickindexpath() != None)
+        options = CadernosOptions(['--tolerant'])
+        self.assertTrue(options.tolerant())
+        self.assertEquals(None, options.quickindexpath())
+
+    def test_tolerant_parsing_isnt_kept_for_later_runs(self):
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.assertRaises(SystemExit, CadernosOptions,
+                              ['--tolerant', '--store', 'posts.db'])
+            self.assertRaises(SystemExit, CadernosOptions,
+                              ['--tolerant', '--update-index'])
+        finally:
+            sys.stderr = stderr
+
+    def test_watch_and_interval(self):
+        self.assertFalse(CadernosOptions([]).watch())
+        options = CadernosOptions(['--watch', '--interval', '0.25'])
+        self.assertTrue(options.watch())
+        self.assertEquals(0.25, options.interval())
+        self.assertEquals(1.0, CadernosOptions([]).interval())
+
+    def test_serve_command(self):
+        self.assertEquals(None, CadernosOptions([]).command())
+        options = CadernosOptions(['serve', '--port', '8080'])
+        self.assertEquals('serve', options.command())
+        self.assertEquals(8080, options.port())
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.assertRaises(SystemExit, CadernosOptions, ['publish'])
+        finally:
+            sys.stderr = stderr
+
+
+class PostsOutputTest(unittest.TestCase):
+    def setUp(self):
+        self.posts = [Post(date(2010, 2, 6), 'A title', '<p><a name="x">x</a></p>',
+                           'subj', 'hbf.html'),
+                      Post(date(2010, 2, 8), 'Caf\xe9', '<p>\xe9</p>',
+                           'subj2', 'hbf.html')]
+
+    def test_text_format(self):
+        out = StringIO()
+        writeTextPosts(self.posts, out)
+        self.assertEquals(str(self.posts[0]) + '\n' + str(self.posts[1]) + '\n',
+                          out.getvalue())
+
+    def test_jsonl_format(self):
+        out = StringIO()
+        writeJsonLinesPosts(self.posts, out, 'iso-8859-1')
+        lines = out.getvalue().splitlines()
+        self.assertEquals(2, len(lines))
+        first = json.loads(lines[0])
+        self.assertEquals({'date': '2010-02-06', 'title': 'A title',
+                           'subjname': 'subj', 'hbfname': 'hbf.html',
+                           'permalink': self.posts[0].getPermaLink(),
+                           'names': ['x'],
+                           'contents': '<p><a name="x">x</a></p>'}, first)
+        self.assertEquals(u'Caf\xe9', json.loads(lines[1])['title'])
+
+    def test_jsonl_format_writes_each_post_when_generated(self):
+        out = StringIO()
+        def generatePosts():
+            yield self.posts[0]
+            self.assertEquals(1, len(out.getvalue().splitlines()))
+            yield self.posts[1]
+        writeJsonLinesPosts(generatePosts(), out, 'iso-8859-1')
+        self.assertEquals(2, len(out.getvalue().splitlines()))
+
+
 class HbFileAutoTest(unittest.TestCase):
     def setUp(self):
         self.non_existing_file = 'non_existing_file.html'
@@ -95,6 +183,30 @@ class HbFileAutoTest(unittest.TestCase):
         except IOError as e:
             pass # expected
 
+    def test_tolerant_HbFileAuto_reports_diagnostics(self):
+        import shutil
+        import tempfile
+        dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir, 'ficheiro01.html')
+            text = open('dummy_hbfile.html').read()
+            f = open(path, 'w')
+            f.write(text.replace('<h4>Heading within a subject entry</h4>',
+                                 '</h2>', 1))
+            f.close()
+            stderr = sys.stderr
+            sys.stderr = StringIO()
+            try:
+                hbfauto = HbFileAuto([path], tolerant=True)
+                report = sys.stderr.getvalue()
+            finally:
+                sys.stderr = stderr
+            self.assertEquals(1, len(hbfauto.hbfs[0].diagnostics))
+            self.assertTrue(report.startswith(path + ':'))
+            self.assertTrue('h2End' in report)
+        finally:
+            shutil.rmtree(dir)
+
     def test_create_HbFileAuto_with_no_filenames_fails(self):
         files = []
         try:
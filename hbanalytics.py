@@ -0,0 +1,213 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Analytics of the handbooks: posts per month, words per post, share of code
+# listings, most linked entries and writing streaks, computed from the
+# entries of each handbook file as it is parsed.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import re
+from datetime import timedelta
+from htmled import Post, PostExtractor
+
+
+class HbStats:
+    """Mergeable counters of the posts of handbook files.
+
+    The posts aren't kept: each is counted in the posts per (handbook,
+    'yyyy-mm'), the yearly totals of posts, words, characters and <pre>
+    characters, the histogram of the words per post, in buckets of
+    WordsBucket words, the counts of the links to each hbfname#anchor, and
+    the runs of consecutive days with posts, as (firstDay, lastDay) pairs.
+
+    The runs are at most one per day with posts. The link counts are
+    bounded by pruneCounts to about MaxLinkTargets targets, so they are
+    exact only while there are fewer linked targets; otherwise they are
+    lower bounds, which keep the most linked entries.
+    """
+    WordsBucket = 100
+
+    MaxLinkTargets = 10000
+
+    PreRe = re.compile(r'<pre[\s>].*?</pre>', re.IGNORECASE | re.DOTALL)
+
+    TagRe = re.compile(r'<[^>]*>')
+
+    def __init__(self):
+        self.postsPerMonth = {}
+        self.years = {}
+        self.wordsHistogram = {}
+        self.linkCounts = {}
+        self.days = []
+
+    def addPost(self, handbook, post, pe = None):
+        """addPost(handbook, post[, pe])
+
+        Count post of handbook. The links are found by the PostExtractor pe.
+        """
+        if pe == None:
+            pe = PostExtractor()
+        contents = post.contents or ''
+        month = (handbook, post.date.strftime('%Y-%m'))
+        self.postsPerMonth[month] = self.postsPerMonth.get(month, 0) + 1
+        words = len(HbStats.TagRe.sub(' ', contents).split())
+        preChars = sum([len(match.group()) for match in
+                        HbStats.PreRe.finditer(contents)])
+        addCounts(self.years, post.date.year, [1, words, len(contents),
+                                               preChars])
+        bucket = words // HbStats.WordsBucket
+        self.wordsHistogram[bucket] = self.wordsHistogram.get(bucket, 0) + 1
+        for match, hbfname, anchor in pe.iterHbfLinks(post):
+            target = hbfname + '#' + anchor
+            self.linkCounts[target] = self.linkCounts.get(target, 0) + 1
+        self.pruneLinkCounts()
+        if self.days and self.days[-1][0] <= post.date <= \
+                self.days[-1][1] + timedelta(1):
+            self.days[-1] = (self.days[-1][0], max(self.days[-1][1],
+                                                   post.date))
+        else:
+            self.days.append((post.date, post.date))
+
+    def merge(self, other):
+        """merge(other) -> self, with the counters of other added"""
+        for month, count in other.postsPerMonth.items():
+            self.postsPerMonth[month] = self.postsPerMonth.get(month, 0) + count
+        for year, counts in other.years.items():
+            addCounts(self.years, year, counts)
+        for bucket, count in other.wordsHistogram.items():
+            self.wordsHistogram[bucket] = \
+                self.wordsHistogram.get(bucket, 0) + count
+        for target, count in other.linkCounts.items():
+            self.linkCounts[target] = self.linkCounts.get(target, 0) + count
+        self.pruneLinkCounts()
+        self.days = mergeRuns(self.days + other.days)
+        return self
+
+    def pruneLinkCounts(self):
+        # pruning only at twice the bound makes it amortized constant time
+        if len(self.linkCounts) > 2 * HbStats.MaxLinkTargets:
+            self.linkCounts = pruneCounts(self.linkCounts,
+                                          HbStats.MaxLinkTargets)
+
+    def streaks(self):
+        """streaks() -> [(days, firstDay, lastDay), ...], longest first"""
+        runs = mergeRuns(self.days)
+        return sorted([((last - first).days + 1, first, last)
+                       for first, last in runs],
+                      key=lambda streak: (-streak[0], streak[1]))
+
+    def mostLinked(self, top = 10):
+        """mostLinked([top]) -> [(count, 'hbfname#anchor'), ...]"""
+        return sorted([(count, target) for target, count in
+                       self.linkCounts.items()],
+                      key=lambda item: (-item[0], item[1]))[:top]
+
+    def report(self, out, top = 10):
+        out.write('posts per month\n')
+        for handbook, month in sorted(self.postsPerMonth.keys()):
+            out.write('%-16s %s %6d\n' % (handbook, month,
+                                          self.postsPerMonth[(handbook,
+                                                              month)]))
+        out.write('\nyear    posts    words  words/post  pre share\n')
+        for year in sorted(self.years.keys()):
+            posts, words, chars, preChars = self.years[year]
+            out.write('%4d %8d %8d %11.1f %9.1f%%\n' % (
+                    year, posts, words, float(words) / posts,
+                    100.0 * preChars / max(chars, 1)))
+        out.write('\nwords per post\n')
+        for bucket in sorted(self.wordsHistogram.keys()):
+            first = bucket * HbStats.WordsBucket
+            out.write('%5d-%-5d %6d\n' % (first, first + HbStats.WordsBucket
+                                          - 1, self.wordsHistogram[bucket]))
+        out.write('\nmost linked entries\n')
+        for count, target in self.mostLinked(top):
+            out.write('%6d %s\n' % (count, target))
+        out.write('\nlongest writing streaks\n')
+        for days, first, last in self.streaks()[:top]:
+            out.write('%6d days from %s to %s\n' % (days, first, last))
+
+
+def addCounts(counters, key, counts):
+    current = counters.get(key)
+    if current == None:
+        counters[key] = list(counts)
+    else:
+        for i, count in enumerate(counts):
+            current[i] += count
+
+def pruneCounts(counts, k):
+    """pruneCounts(counts, k) -> counts of at most k keys
+
+    Subtract the (k + 1)th largest count from all the counts, dropping the
+    keys left without count, as the Misra-Gries frequent items summary: a
+    key counted more than 1 / (k + 1) of the total is kept, and each count
+    is lowered by at most that. Pruned counts may still be added and pruned
+    again.
+    """
+    if len(counts) <= k:
+        return counts
+    threshold = sorted(counts.values(), reverse=True)[k]
+    return dict([(key, count - threshold) for key, count in counts.items()
+                 if count > threshold])
+
+def mergeRuns(runs):
+    """mergeRuns([(firstDay, lastDay), ...]) -> sorted disjoint runs
+
+    Merge the runs of days which overlap or are consecutive.
+    """
+    merged = []
+    for first, last in sorted(runs):
+        if merged and first <= merged[-1][1] + timedelta(1):
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+def handbookOfPath(path):
+    """handbookOfPath(path) -> the name of the directory of the handbook
+    file, e.g., 'web' for '~/documentos/cadernos/web/ficheiro01.html'"""
+    return os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+def fileStats(filename, workers = 1, tolerant = False):
+    """fileStats(filename[, workers[, tolerant]]) -> hbStats of the handbook
+    file
+
+    The file is parsed as by hb2post, with workers and tolerant, and its
+    entries are counted as they are taken from the parsed file, without
+    building, sorting or adapting the links of its posts.
+    """
+    from hb2post import HbFileAuto
+    hbf = HbFileAuto([filename], workers, tolerant).hbfs[0]
+    handbook = handbookOfPath(filename)
+    hbfname = hbf.getFileName()
+    stats = HbStats()
+    pe = PostExtractor()
+    for de in hbf.dailyEntries:
+        for se in de.subjects:
+            stats.addPost(handbook, Post(de.date, se.title, se.contents,
+                                         se.name, hbfname), pe)
+    return stats
+
+def analyze(filenames, workers = 1, tolerant = False):
+    """analyze(filenames[, workers[, tolerant]]) -> hbStats of all the handbook
+    files
+
+    The files are parsed one at a time, each by fileStats, so that only the
+    counters are kept from one file to the next.
+    """
+    stats = HbStats()
+    for filename in filenames:
+        stats.merge(fileStats(filename, workers, tolerant))
+    return stats
@@ -0,0 +1,145 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbanalytics module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from StringIO import StringIO
+from hbanalytics import *
+from htmled import Post, StateError
+
+DummyHbFiles = ['dummy_hbfile.html', 'dummy_hbfile2.html']
+
+
+class HbStatsTest(unittest.TestCase):
+    def post(self, d, contents, subjname = 's', hbfname = 'f.html'):
+        return Post(d, 'Title', contents, subjname, hbfname)
+
+    def testCountsOfPosts(self):
+        stats = HbStats()
+        stats.addPost('web', self.post(date(2010, 2, 6), '<p>one two</p>'
+                                       '<pre>x = 1</pre>'))
+        stats.addPost('web', self.post(date(2010, 2, 7), '<p>' + 'w ' * 150 +
+                                       '</p>'))
+        stats.addPost('cpp', self.post(date(2011, 3, 1), '<p>one</p>'))
+        self.assertEquals({('web', '2010-02'): 2, ('cpp', '2011-03'): 1},
+                          stats.postsPerMonth)
+        self.assertEquals([2, 155, 30 + 307, len('<pre>x = 1</pre>')],
+                          stats.years[2010])
+        self.assertEquals({0: 2, 1: 1}, stats.wordsHistogram)
+
+    def testMostLinked(self):
+        stats = HbStats()
+        stats.addPost('web', self.post(date(2010, 2, 6),
+                                       '<a name="x">x</a><a href="#x">x</a>'
+                                       '<a href="g.html#y">y</a>'))
+        stats.addPost('web', self.post(date(2010, 2, 7),
+                                       '<a href="g.html#y">y</a>'
+                                       '<a href="#z">z</a>'))
+        self.assertEquals([(2, 'g.html#y'), (1, 'f.html#z')],
+                          stats.mostLinked())
+
+    def testStreaksMergeAcrossFiles(self):
+        first = HbStats()
+        second = HbStats()
+        for day in [1, 2, 3, 10]:
+            first.addPost('web', self.post(date(2010, 2, day), ''))
+        for day in [4, 5, 11, 20]:
+            second.addPost('web', self.post(date(2010, 2, day), ''))
+        first.merge(second)
+        self.assertEquals([(5, date(2010, 2, 1), date(2010, 2, 5)),
+                           (2, date(2010, 2, 10), date(2010, 2, 11)),
+                           (1, date(2010, 2, 20), date(2010, 2, 20))],
+                          first.streaks())
+        self.assertEquals(8, first.years[2010][0])
+
+    def testPruneCountsKeepsTheFrequentKeys(self):
+        counts = {'a': 10, 'b': 6, 'c': 2, 'd': 1, 'e': 1}
+        self.assertEquals({'a': 8, 'b': 4}, pruneCounts(counts, 2))
+        self.assertTrue(pruneCounts(counts, 5) is counts)
+
+    def testLinkCountsAreBounded(self):
+        stats = HbStats()
+        maxLinkTargets = HbStats.MaxLinkTargets
+        HbStats.MaxLinkTargets = 2
+        try:
+            for day in range(1, 21):
+                stats.addPost('web', self.post(date(2010, 2, day),
+                                               '<a href="g.html#y">y</a>'
+                                               '<a href="g.html#n%d">n</a>' %
+                                               day))
+        finally:
+            HbStats.MaxLinkTargets = maxLinkTargets
+        self.assertTrue(len(stats.linkCounts) <= 4)
+        self.assertEquals('g.html#y', stats.mostLinked()[0][1])
+
+    def testMergeRuns(self):
+        self.assertEquals([(date(2010, 1, 1), date(2010, 1, 9))],
+                          mergeRuns([(date(2010, 1, 5), date(2010, 1, 9)),
+                                     (date(2010, 1, 1), date(2010, 1, 4)),
+                                     (date(2010, 1, 2), date(2010, 1, 3))]))
+
+
+class AnalyzeTest(unittest.TestCase):
+    def testDummyHbFiles(self):
+        stats = analyze(DummyHbFiles)
+        self.assertEquals(8, sum(stats.postsPerMonth.values()))
+        self.assertEquals([2010, 2011], sorted(stats.years.keys()))
+        self.assertEquals((1, 'dummy_hbfile.html#idiota_1st_mil'),
+                          stats.mostLinked()[1])
+        out = StringIO()
+        stats.report(out)
+        self.assertTrue('most linked entries\n' in out.getvalue())
+        self.assertTrue('2010-02      3\n' in out.getvalue())
+
+    def testTolerantAnalysis(self):
+        text = open(DummyHbFiles[0]).read()
+        broken = text.replace('has UML 2.0 support', 'has UML 2.0 support</h2>')
+        self.assertNotEquals(text, broken)
+        dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir, DummyHbFiles[0])
+            f = open(path, 'wb')
+            f.write(broken)
+            f.close()
+            self.assertRaises(StateError, analyze, [path])
+            stderr = sys.stderr
+            sys.stderr = StringIO()
+            try:
+                stats = analyze([path], tolerant = True)
+                reported = sys.stderr.getvalue()
+            finally:
+                sys.stderr = stderr
+        finally:
+            shutil.rmtree(dir)
+        self.assertTrue(path + ':' in reported)
+        self.assertTrue(0 < sum(stats.postsPerMonth.values()) < 4)
+
+    def testParallelAnalysisEqualsSerial(self):
+        serial = analyze(DummyHbFiles)
+        parallel = analyze(DummyHbFiles, 2)
+        self.assertEquals(serial.postsPerMonth, parallel.postsPerMonth)
+        self.assertEquals(serial.years, parallel.years)
+        self.assertEquals(serial.wordsHistogram, parallel.wordsHistogram)
+        self.assertEquals(serial.linkCounts, parallel.linkCounts)
+        self.assertEquals(serial.streaks(), parallel.streaks())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Exports the extracted posts as Blogger import files: Atom feeds with an
+# entry per post, written incrementally and split in files of bounded size.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+from datetime import datetime
+from StringIO import StringIO
+from xml.sax.saxutils import XMLGenerator
+from xml.sax.xmlreader import AttributesImpl
+from htmled import Post
+
+AtomNamespace = 'http://www.w3.org/2005/Atom'
+
+KindScheme = 'http://schemas.google.com/g/2005#kind'
+
+PostKind = 'http://schemas.google.com/blogger/2008/kind#post'
+
+
+class AtomExporter:
+    """Writes posts to Blogger import files, which are Atom feeds with an
+    entry per post, e.g., 'posts.xml', 'posts_2.xml', 'posts_3.xml'.
+
+    Each entry is written as soon as its post is generated, so only one post
+    is kept in memory. A new file is started when the next entry would make
+    the current one larger than maxBytes; an entry larger than maxBytes gets
+    a file of its own. A None maxBytes means a single file.
+    The strings of the posts are decoded with encoding and the files are
+    written in UTF-8.
+    """
+    BufferSize = 64 * 1024
+
+    def __init__(self, path, maxBytes = None, encoding = 'iso-8859-1',
+                 author = 'hb2post', title = None):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.encoding = encoding
+        self.author = author
+        if title == None:
+            title = Post.BlogURL
+        self.title = title
+        self.paths = []
+        self.entries = 0
+
+    def exportPosts(self, posts):
+        """exportPosts(posts) -> paths of the written files
+
+        Write the posts, which must be ordered by date.
+        """
+        self.paths = []
+        self.entries = 0
+        self.f = None
+        month = None
+        permaLinks = set()
+        try:
+            for post in posts:
+                # repeated permalinks can only happen in the same month
+                if (post.date.year, post.date.month) != month:
+                    month = (post.date.year, post.date.month)
+                    permaLinks = set()
+                entry = self.entryText(post, self.uniqueId(post.getPermaLink(),
+                                                           permaLinks))
+                if self.f == None or (self.maxBytes != None and
+                                      self.fileEntries > 0 and
+                                      self.size + len(entry) +
+                                      len(self.footer) > self.maxBytes):
+                    self.startFile()
+                self.write(entry)
+                self.fileEntries += 1
+                self.entries += 1
+            if self.f == None:
+                self.startFile()
+        finally:
+            self.endFile()
+        return self.paths
+
+    def uniqueId(self, permaLink, permaLinks):
+        """Atom entries can't share an id, so suffix repeated permalinks with
+        _2, _3, etc., as the post files are."""
+        uniqueId = permaLink
+        i = 1
+        while uniqueId in permaLinks:
+            i += 1
+            uniqueId = permaLink[:-len('.html')] + '_' + str(i) + '.html'
+        permaLinks.add(uniqueId)
+        return uniqueId
+
+    def filePath(self, number):
+        if number == 1:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return root + '_' + str(number) + ext
+
+    def startFile(self):
+        self.endFile()
+        path = self.filePath(len(self.paths) + 1)
+        self.f = open(path, 'wb', AtomExporter.BufferSize)
+        self.paths.append(path)
+        self.size = 0
+        self.fileEntries = 0
+        self.write(self.headerText())
+
+    def endFile(self):
+        if self.f != None:
+            try:
+                self.write(self.footer)
+            finally:
+                self.f.close()
+                self.f = None
+
+    def write(self, text):
+        self.f.write(text)
+        self.size += len(text)
+
+    footer = '</feed>\n'
+
+    def headerText(self):
+        out = StringIO()
+        xml = XMLGenerator(out, 'utf-8')
+        xml.startDocument()
+        xml.startElement('feed', AttributesImpl({'xmlns': AtomNamespace}))
+        xml.ignorableWhitespace('\n')
+        self.element(xml, 'id', Post.BlogURL)
+        self.element(xml, 'updated', datetime.utcnow().strftime(
+                '%Y-%m-%dT%H:%M:%SZ'))
+        self.element(xml, 'title', self.text(self.title), {'type': 'text'})
+        self.element(xml, 'generator', 'Blogger',
+                     {'uri': 'http://www.blogger.com'})
+        self.authorElement(xml)
+        return out.getvalue()
+
+    def entryText(self, post, entryId):
+        """entryText(post, entryId) -> the UTF-8 Atom entry of the post
+
+        The title and the contents of the posts are HTML, kept as such.
+        """
+        out = StringIO()
+        xml = XMLGenerator(out, 'utf-8')
+        xml.startElement('entry', AttributesImpl({}))
+        xml.ignorableWhitespace('\n')
+        timestamp = post.date.isoformat() + 'T00:00:00Z'
+        self.element(xml, 'id', entryId)
+        self.element(xml, 'published', timestamp)
+        self.element(xml, 'updated', timestamp)
+        self.element(xml, 'category', None, {'scheme': KindScheme,
+                                             'term': PostKind})
+        self.element(xml, 'title', self.text(post.title), {'type': 'html'})
+        self.element(xml, 'content', self.text(post.contents or ''),
+                     {'type': 'html'})
+        self.element(xml, 'link', None, {'rel': 'alternate',
+                                         'type': 'text/html',
+                                         'href': post.getPermaLink()})
+        self.authorElement(xml)
+        xml.endElement('entry')
+        xml.ignorableWhitespace('\n')
+        return out.getvalue()
+
+    def authorElement(self, xml):
+        xml.startElement('author', AttributesImpl({}))
+        xml.ignorableWhitespace('\n')
+        self.element(xml, 'name', self.text(self.author))
+        xml.endElement('author')
+        xml.ignorableWhitespace('\n')
+
+    def element(self, xml, name, text, attrs = {}):
+        xml.startElement(name, AttributesImpl(attrs))
+        if text != None:
+            xml.characters(text)
+        xml.endElement(name)
+        xml.ignorableWhitespace('\n')
+
+    def text(self, s):
+        if isinstance(s, str):
+            return s.decode(self.encoding)
+        return s
@@ -0,0 +1,122 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbatom module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from xml.dom import minidom
+from hbatom import *
+from htmled import Post
+
+
+class AtomExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'posts.xml')
+        self.posts = [Post(date(2010, 2, 6), 'First post', '<p>one</p>',
+                           'first', 'hbf.html'),
+                      Post(date(2010, 2, 8), 'Caf&eacute; \xe9',
+                           '<p>a &amp; \xe9</p>', 'second', 'hbf.html'),
+                      Post(date(2010, 5, 16), 'Third post', '<p>three</p>',
+                           'third', 'hbf.html')]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def entries(self, path):
+        feed = minidom.parse(path).documentElement
+        self.assertEquals(AtomNamespace, feed.namespaceURI)
+        return feed.getElementsByTagName('entry')
+
+    def childText(self, element, name):
+        return element.getElementsByTagName(name)[0].firstChild.data
+
+    def testEntriesOfPosts(self):
+        self.assertEquals([self.path],
+                          AtomExporter(self.path).exportPosts(self.posts))
+        entries = self.entries(self.path)
+        self.assertEquals(3, len(entries))
+        first, second = entries[0], entries[1]
+        self.assertEquals(self.posts[0].getPermaLink(),
+                          self.childText(first, 'id'))
+        self.assertEquals(self.posts[0].getPermaLink(),
+                          first.getElementsByTagName('link')[0].getAttribute(
+                'href'))
+        self.assertEquals('2010-02-06T00:00:00Z',
+                          self.childText(first, 'published'))
+        self.assertEquals('First post', self.childText(first, 'title'))
+        self.assertEquals('<p>one</p>', self.childText(first, 'content'))
+        self.assertEquals(PostKind, first.getElementsByTagName(
+                'category')[0].getAttribute('term'))
+        self.assertEquals(u'Caf&eacute; \xe9', self.childText(second, 'title'))
+        self.assertEquals(u'<p>a &amp; \xe9</p>',
+                          self.childText(second, 'content'))
+
+    def testNoPostsMakeAnEmptyFeed(self):
+        self.assertEquals([self.path], AtomExporter(self.path).exportPosts([]))
+        self.assertEquals(0, len(self.entries(self.path)))
+
+    def testRepeatedPermaLinksGetUniqueIds(self):
+        posts = [Post(date(2010, 2, 6), 'Same', '<p>1</p>', 'a', 'hbf.html'),
+                 Post(date(2010, 2, 7), 'Same', '<p>2</p>', 'b', 'hbf.html')]
+        AtomExporter(self.path).exportPosts(posts)
+        ids = [self.childText(entry, 'id') for entry in
+               self.entries(self.path)]
+        self.assertEquals([posts[0].getPermaLink(),
+                           posts[0].getPermaLink()[:-len('.html')] +
+                           '_2.html'], ids)
+
+    def testSplitInFilesOfBoundedSize(self):
+        posts = [Post(date(2010, 2, 6 + i), 'Post %d' % i,
+                      '<p>' + 'text ' * 100 + '</p>', 's%d' % i, 'hbf.html')
+                 for i in range(10)]
+        maxBytes = 2000
+        exporter = AtomExporter(self.path, maxBytes)
+        paths = exporter.exportPosts(posts)
+        self.assertTrue(len(paths) > 1)
+        self.assertEquals(self.path, paths[0])
+        self.assertEquals(os.path.join(self.dir, 'posts_2.xml'), paths[1])
+        titles = []
+        for path in paths:
+            self.assertTrue(os.path.getsize(path) <= maxBytes)
+            titles.extend([self.childText(entry, 'title')
+                           for entry in self.entries(path)])
+        self.assertEquals([post.title for post in posts], titles)
+        self.assertEquals(10, exporter.entries)
+
+    def testEntryLargerThanMaxBytesGetsItsOwnFile(self):
+        posts = [Post(date(2010, 2, 6), 'Big', '<p>' + 'x' * 5000 + '</p>',
+                      'big', 'hbf.html'),
+                 Post(date(2010, 2, 7), 'Small', '<p>y</p>', 'small',
+                      'hbf.html')]
+        paths = AtomExporter(self.path, 2000).exportPosts(posts)
+        self.assertEquals(2, len(paths))
+        self.assertEquals([1, 1], [len(self.entries(path)) for path in paths])
+
+    def testWritesEachPostWhenGenerated(self):
+        exporter = AtomExporter(self.path, 1)
+        def generatePosts():
+            yield self.posts[0]
+            yield self.posts[1]
+            self.assertEquals(1, len(self.entries(self.path)))
+            yield self.posts[2]
+        self.assertEquals(3, len(exporter.exportPosts(generatePosts())))
+
+
+if __name__ == "__main__":
+    unittest.main()
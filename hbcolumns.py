@@ -0,0 +1,172 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Columnar in memory table of posts, for analytics over whole archives.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+from array import array
+from datetime import date
+from htmled import Post
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def monthKey(d):
+    return (d.year, d.month)
+
+def yearKey(d):
+    return (d.year,)
+
+def weekKey(d):
+    return d.isocalendar()[:2]
+
+DateKeys = {'year': yearKey, 'month': monthKey, 'week': weekKey}
+
+
+class PostTable:
+    """A table of posts kept in columns instead of Post instances.
+
+    The dates are kept as ordinals in an array('i'), which is also seen as a
+    NumPy array when NumPy is available. The titles and contents are slices
+    of a single shared string, delimited by the offsets array, and the file
+    and subject names are interned, with the file names stored as codes.
+    Post instances are only created when a row is requested.
+    """
+    def __init__(self, posts = ()):
+        self.ordinals = array('i')
+        self.offsets = array('l', [0])
+        self.hbfCodes = array('i')
+        self.hbfnames = []
+        self.subjnames = []
+        codes = {}
+        texts = []
+        end = 0
+        for post in posts:
+            self.ordinals.append(post.date.toordinal())
+            for text in (post.title or '', post.contents or ''):
+                texts.append(text)
+                end += len(text)
+                self.offsets.append(end)
+            if post.hbfname not in codes:
+                codes[post.hbfname] = len(self.hbfnames)
+                self.hbfnames.append(self.intern(post.hbfname))
+            self.hbfCodes.append(codes[post.hbfname])
+            self.subjnames.append(self.intern(post.subjname))
+        self.text = ''.join(texts)
+        self.ordinalsView = None
+        self.hbfCodesView = None
+        if numpy != None and len(self.ordinals) > 0:
+            self.ordinalsView = numpy.frombuffer(self.ordinals,
+                                                 dtype=numpy.intc)
+            self.hbfCodesView = numpy.frombuffer(self.hbfCodes,
+                                                 dtype=numpy.intc)
+
+    def intern(self, s):
+        if isinstance(s, str):
+            return intern(s)
+        return s
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def date(self, row):
+        return date.fromordinal(self.ordinals[row])
+
+    def title(self, row):
+        return self.text[self.offsets[2 * row]: self.offsets[2 * row + 1]]
+
+    def contents(self, row):
+        return self.text[self.offsets[2 * row + 1]: self.offsets[2 * row + 2]]
+
+    def hbfname(self, row):
+        return self.hbfnames[self.hbfCodes[row]]
+
+    def post(self, row):
+        """post(row) -> Post of the row"""
+        return Post(self.date(row), self.title(row), self.contents(row),
+                    self.subjnames[row], self.hbfname(row))
+
+    def posts(self, rows = None):
+        """posts([rows]) -> generatorOfPosts of the rows, or of all rows"""
+        if rows == None:
+            rows = xrange(len(self))
+        for row in rows:
+            yield self.post(row)
+
+    def rowsInRange(self, d1 = None, d2 = None):
+        """rowsInRange([d1[, d2]]) -> rows
+
+        The rows with dates from d1 to d2, inclusive, where None means an open
+        range. Vectorized with NumPy when it is available.
+        """
+        low = -1
+        high = date.max.toordinal() + 1
+        if d1 != None:
+            low = d1.toordinal()
+        if d2 != None:
+            high = d2.toordinal()
+        if self.ordinalsView is not None:
+            view = self.ordinalsView
+            return numpy.nonzero((view >= low) & (view <= high))[0].tolist()
+        return [row for row, ordinal in enumerate(self.ordinals)
+                if low <= ordinal <= high]
+
+    def countByDate(self, by = 'month', rows = None):
+        """countByDate([by[, rows]]) -> {key: count}
+
+        Count the rows, or all rows, by 'year', 'month' or 'week' (see
+        PostExtractor.groupPosts for the keys). The distinct dates are
+        counted first, so that the keys are computed once per date.
+        """
+        keyOf = DateKeys[by]
+        counts = {}
+        for ordinal, count in self.countOrdinals(rows):
+            key = keyOf(date.fromordinal(ordinal))
+            counts[key] = counts.get(key, 0) + count
+        return counts
+
+    def countOrdinals(self, rows):
+        if self.ordinalsView is not None:
+            view = self.ordinalsView
+            if rows is not None:
+                view = view[numpy.asarray(rows, dtype=numpy.intp)]
+            ordinals, counts = numpy.unique(view, return_counts=True)
+            return zip(ordinals.tolist(), counts.tolist())
+        ordinals = self.ordinals
+        if rows is not None:
+            ordinals = [ordinals[row] for row in rows]
+        counts = {}
+        for ordinal in ordinals:
+            counts[ordinal] = counts.get(ordinal, 0) + 1
+        return counts.items()
+
+    def countByFile(self, rows = None):
+        """countByFile([rows]) -> {hbfname: count}"""
+        if self.hbfCodesView is not None:
+            codes = self.hbfCodesView
+            if rows is not None:
+                codes = codes[numpy.asarray(rows, dtype=numpy.intp)]
+            counts = numpy.bincount(codes,
+                                    minlength=len(self.hbfnames)).tolist()
+        else:
+            codes = self.hbfCodes
+            if rows is not None:
+                codes = [codes[row] for row in rows]
+            counts = [0] * len(self.hbfnames)
+            for code in codes:
+                counts[code] += 1
+        return dict([(self.hbfnames[code], count)
+                     for code, count in enumerate(counts) if count])
@@ -0,0 +1,81 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbcolumns module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+from datetime import date
+import hbcolumns
+from hbcolumns import *
+from htmled import HbFile, PostExtractor
+
+
+class PostTableTest(unittest.TestCase):
+    def setUp(self):
+        f1 = file('dummy_hbfile.html')
+        f2 = file('dummy_hbfile2.html')
+        self.posts = PostExtractor(HbFile(f1), HbFile(f2)).getPosts()
+        f1.close()
+        f2.close()
+        self.table = PostTable(self.posts)
+
+    def testRowsAreConvertedToPosts(self):
+        self.assertEquals(len(self.posts), len(self.table))
+        self.assertEquals([str(post) for post in self.posts],
+                          [str(post) for post in self.table.posts()])
+        post = self.table.post(4)
+        self.assertEquals(self.posts[4].subjname, post.subjname)
+        self.assertEquals(self.posts[4].hbfname, post.hbfname)
+        self.assertEquals(self.posts[4].names, post.names)
+
+    def testNamesAreInterned(self):
+        self.assertEquals(['dummy_hbfile.html', 'dummy_hbfile2.html'],
+                          self.table.hbfnames)
+        self.assertTrue(self.table.hbfname(0) is self.table.hbfname(1))
+
+    def testRowsInRange(self):
+        self.assertEquals([2, 3, 4, 5],
+                          self.table.rowsInRange(date(2010, 2, 7),
+                                                 date(2011, 2, 6)))
+        self.assertEquals([6, 7], self.table.rowsInRange(date(2011, 2, 7)))
+        self.assertEquals([0, 1], self.table.rowsInRange(None, date(2010, 2, 6)))
+
+    def testCountByDate(self):
+        self.assertEquals({(2010,): 4, (2011,): 4},
+                          self.table.countByDate('year'))
+        self.assertEquals({(2010, 2): 3, (2010, 5): 1, (2011, 2): 3,
+                           (2011, 5): 1}, self.table.countByDate())
+        rows = self.table.rowsInRange(date(2011, 1, 1))
+        self.assertEquals({(2011, 5): 2, (2011, 6): 1, (2011, 20): 1},
+                          self.table.countByDate('week', rows))
+
+    def testCountByFile(self):
+        self.assertEquals({'dummy_hbfile.html': 4, 'dummy_hbfile2.html': 4},
+                          self.table.countByFile())
+        self.assertEquals({'dummy_hbfile2.html': 2},
+                          self.table.countByFile([6, 7]))
+
+
+class PostTableWithoutNumpyTest(PostTableTest):
+    def setUp(self):
+        self.numpy = hbcolumns.numpy
+        hbcolumns.numpy = None
+        PostTableTest.setUp(self)
+
+    def tearDown(self):
+        hbcolumns.numpy = self.numpy
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Graph of the links between the handbook posts, for backlink and
+# reachability queries without parsing the handbook files.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import marshal
+import os
+import sys
+import zlib
+from array import array
+from collections import deque
+from optparse import OptionParser
+
+
+class LinkGraph:
+    """The links between the posts of a set of handbook files, as edges from
+    the source post to the target post.
+
+    The posts are the nodes, numbered in the order of PostExtractor.iterPosts,
+    and the links are resolved as adaptPostsLinks does (the first post with
+    an anchor wins). The edges are kept in compressed sparse rows: the links
+    of node n are targets[offsets[n]: offsets[n + 1]], and the backlinks are
+    kept likewise. Each handbook file keeps its own posts, anchors and
+    unresolved links, so an update only parses the files that changed and
+    then resolves the links again, which needs no parsing.
+    """
+    Version = 1
+
+    def __init__(self, path = None):
+        """LinkGraph([path]) -> linkGraph
+
+        Load the graph from path, if it exists, otherwise start empty.
+        """
+        self.path = path
+        self.filenames = []
+        self.files = {}
+        self.nodes = []
+        self.offsets = array('l', [0])
+        self.targets = array('i')
+        self.backOffsets = array('l', [0])
+        self.sources = array('i')
+        self.nodeOfAnchor = None
+        if path != None and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        f = open(self.path, 'rb')
+        try:
+            data = marshal.loads(zlib.decompress(f.read()))
+        finally:
+            f.close()
+        if data['version'] != LinkGraph.Version:
+            return
+        self.filenames = data['filenames']
+        self.files = data['files']
+        self.nodes = data['nodes']
+        for name, typecode in [('offsets', 'l'), ('targets', 'i'),
+                               ('backOffsets', 'l'), ('sources', 'i')]:
+            setattr(self, name, array(typecode, data[name]))
+
+    def save(self):
+        data = {'version': LinkGraph.Version, 'filenames': self.filenames,
+                'files': self.files, 'nodes': self.nodes}
+        for name in ['offsets', 'targets', 'backOffsets', 'sources']:
+            data[name] = getattr(self, name).tostring()
+        tmpPath = self.path + '.tmp'
+        f = open(tmpPath, 'wb')
+        try:
+            f.write(zlib.compress(marshal.dumps(data)))
+        finally:
+            f.close()
+        os.rename(tmpPath, self.path)
+
+    def update(self, filenames):
+        """update(filenames) -> listOfReparsedFilenames
+
+        Parse the handbook files which changed since the last update, drop
+        the files that are no longer in filenames and resolve the links.
+        """
+        from hbsources import sourceFingerprint
+        reparsed = []
+        for filename in set(self.files.keys()) - set(filenames):
+            del self.files[filename]
+        for filename in filenames:
+            fingerprint = sourceFingerprint(filename)
+            if filename in self.files and \
+                    self.files[filename]['fingerprint'] == fingerprint:
+                continue
+            self.setFilePosts(filename, fingerprint, self.postsOfFile(filename))
+            reparsed.append(filename)
+        self.filenames = list(filenames)
+        self.resolveLinks()
+        return reparsed
+
+    def postsOfFile(self, filename):
+        from hbsources import openHbSource
+        from htmled import HbFile, PostExtractor
+        f = openHbSource(filename)
+        try:
+            hbf = HbFile(f)
+        finally:
+            f.close()
+        return PostExtractor(hbf).buildPosts()
+
+    def setFilePosts(self, filename, fingerprint, posts):
+        """setFilePosts(filename, fingerprint, posts)
+
+        Keep the posts of a handbook file, without adapted links, replacing
+        the ones it had. resolveLinks must be called afterwards.
+        """
+        from htmled import AnchorTable, PostExtractor
+        pe = PostExtractor()
+        records = []
+        for post in posts:
+            refs = [(hbfname, anchor)
+                    for match, hbfname, anchor in pe.iterHbfLinks(post)]
+            records.append((post.date.toordinal(), post.getPermaLink(),
+                            post.hbfname, post.subjname,
+                            AnchorTable.postAnchors(post), refs))
+        self.files[filename] = {'fingerprint': fingerprint, 'posts': records}
+
+    def resolveLinks(self):
+        """resolveLinks()
+
+        Number the posts of all the files and resolve their links in edges.
+        """
+        keyed = []
+        for fileSeq, filename in enumerate(self.filenames):
+            for postSeq, record in enumerate(self.files[filename]['posts']):
+                keyed.append(((record[0], fileSeq, postSeq), record))
+        keyed.sort(key=lambda item: item[0])
+        records = [record for key, record in keyed]
+        self.nodes = [record[:4] for record in records]
+        nodeOfAnchor = {}
+        for node, record in enumerate(records):
+            hbfname = record[2]
+            for anchor, keepAnchor in record[4]:
+                nodeOfAnchor.setdefault((hbfname, anchor), node)
+        links = []
+        for node, record in enumerate(records):
+            targets = set([nodeOfAnchor.get(ref) for ref in record[5]])
+            targets.discard(None)
+            targets.discard(node)
+            links.append(sorted(targets))
+        self.offsets, self.targets = compressedRows(links)
+        backlinks = [[] for node in self.nodes]
+        for node, targets in enumerate(links):
+            for target in targets:
+                backlinks[target].append(node)
+        self.backOffsets, self.sources = compressedRows(backlinks)
+        self.nodeOfAnchor = nodeOfAnchor
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def edgeCount(self):
+        return len(self.targets)
+
+    def node(self, target):
+        """node(target) -> node of the post, or None if there isn't one
+
+        The target is the permalink of a post, or a handbook file name and an
+        anchor in it, as in 'ficheiro02.html#anchor'.
+        """
+        if '#' in target and not target.startswith('http'):
+            return self.anchorNodes().get(tuple(target.split('#', 1)))
+        for node, info in enumerate(self.nodes):
+            if info[1] == target:
+                return node
+        return None
+
+    def anchorNodes(self):
+        if self.nodeOfAnchor == None:
+            self.resolveLinks()
+        return self.nodeOfAnchor
+
+    def links(self, node):
+        """links(node) -> nodes the post links to"""
+        return self.targets[self.offsets[node]: self.offsets[node + 1]].tolist()
+
+    def backlinks(self, node):
+        """backlinks(node) -> nodes of the posts linking to the post"""
+        return self.sources[self.backOffsets[node]:
+                            self.backOffsets[node + 1]].tolist()
+
+    def reachable(self, node, backwards = False):
+        """reachable(node[, backwards]) -> nodes in breadth first order
+
+        The nodes of the posts reachable from the post by following links, or
+        backlinks if backwards is True, not including the post itself.
+        """
+        neighbours = self.links
+        if backwards:
+            neighbours = self.backlinks
+        seen = set([node])
+        order = []
+        queue = deque([node])
+        while queue:
+            for next in neighbours(queue.popleft()):
+                if next not in seen:
+                    seen.add(next)
+                    order.append(next)
+                    queue.append(next)
+        return order
+
+    def describe(self, node):
+        """describe(node) -> 'yyyy-mm-dd permalink'"""
+        from datetime import date
+        return '%s %s' % (date.fromordinal(self.nodes[node][0]),
+                          self.nodes[node][1])
+
+
+def compressedRows(rows):
+    """compressedRows(rows) -> (offsets, values) of the rows of int lists"""
+    offsets = array('l', [0])
+    values = array('i')
+    for row in rows:
+        values.extend(row)
+        offsets.append(len(values))
+    return offsets, values
+
+
+def main(args = sys.argv[1:]):
+    parser = OptionParser(usage='%prog update -g GRAPH HBFILE...\n' +
+                          '       %prog backlinks|links|reachable|reaching ' +
+                          '-g GRAPH TARGET\n\n' +
+                          'TARGET is the permalink of a post or HBFILE#anchor.')
+    parser.add_option('-g', '--graph', default='.hb2post-graph',
+                      help='the file of the link graph [default: %default]')
+    (options, args) = parser.parse_args(args)
+    if not args:
+        parser.error('a command is required')
+    command = args[0]
+    graph = LinkGraph(options.graph)
+    if command == 'update':
+        reparsed = graph.update(args[1:])
+        graph.save()
+        print >> sys.stderr, '%d files parsed, %d posts, %d links.' % \
+            (len(reparsed), len(graph), graph.edgeCount())
+        return
+    queries = {'links': graph.links, 'backlinks': graph.backlinks,
+               'reachable': graph.reachable,
+               'reaching': lambda node: graph.reachable(node, True)}
+    if command not in queries or len(args) != 2:
+        parser.error("unknown command or wrong arguments: '" +
+                     ' '.join(args) + "'")
+    node = graph.node(args[1])
+    if node == None:
+        parser.error("'" + args[1] + "' isn't a post in the graph")
+    for other in queries[command](node):
+        print graph.describe(other)
+
+
+if __name__ == "__main__":
+    main()
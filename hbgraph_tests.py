@@ -0,0 +1,135 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbgraph module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from hbgraph import *
+from htmled import HbFile, Post, PostExtractor
+
+
+class LinkGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filenames = []
+        for name in ['dummy_hbfile.html', 'dummy_hbfile2.html']:
+            path = os.path.join(self.dir, name)
+            shutil.copy(name, path)
+            self.filenames.append(path)
+        self.path = os.path.join(self.dir, 'graph')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def post(self, day, name, contents, hbfname = 'ficheiro01.html'):
+        return Post(date(2010, 3, day), 'Post ' + name, contents, name, hbfname)
+
+    def link(self, hbfname, anchor):
+        return '<a href="%s#%s">link</a>' % (hbfname, anchor)
+
+    def chainGraph(self):
+        graph = LinkGraph()
+        graph.filenames = ['f1', 'f2']
+        graph.setFilePosts('f1', None, [
+                self.post(1, 'a', self.link('ficheiro02.html', 'b')),
+                self.post(3, 'c', '<a name="inc">c</a>' + self.link('', 'a'))])
+        graph.setFilePosts('f2', None, [
+                self.post(2, 'b', self.link('ficheiro01.html', 'inc') +
+                          self.link('', 'b') + self.link('', 'none'),
+                          'ficheiro02.html'),
+                self.post(4, 'd', self.link('ficheiro01.html', 'a'),
+                          'ficheiro02.html')])
+        graph.resolveLinks()
+        return graph
+
+    def testNodesInPostsOrder(self):
+        graph = self.chainGraph()
+        self.assertEquals(['a', 'b', 'c', 'd'],
+                          [subjname for ordinal, permaLink, hbfname, subjname
+                           in graph.nodes])
+
+    def testLinksAndBacklinks(self):
+        graph = self.chainGraph()
+        self.assertEquals([1], graph.links(0))
+        self.assertEquals([2], graph.links(1))
+        self.assertEquals([0], graph.links(2))
+        self.assertEquals([2, 3], graph.backlinks(0))
+        self.assertEquals([], graph.backlinks(3))
+        self.assertEquals(4, graph.edgeCount())
+
+    def testReachable(self):
+        graph = self.chainGraph()
+        self.assertEquals([0, 1, 2], graph.reachable(3))
+        self.assertEquals([1, 2], graph.reachable(0))
+        self.assertEquals([2, 3, 1], graph.reachable(0, True))
+
+    def testNodeOfTarget(self):
+        graph = self.chainGraph()
+        self.assertEquals(2, graph.node('ficheiro01.html#inc'))
+        self.assertEquals(1, graph.node('ficheiro02.html#b'))
+        self.assertEquals(3, graph.node(graph.nodes[3][1]))
+        self.assertEquals(None, graph.node('ficheiro02.html#a'))
+
+    def testLinksBetweenFilesAsAdapted(self):
+        graph = LinkGraph()
+        graph.update(self.filenames)
+        hbfs = []
+        for filename in self.filenames:
+            f = open(filename)
+            hbfs.append(HbFile(f))
+            f.close()
+        posts = PostExtractor(*hbfs).extractPosts()
+        self.assertEquals(len(posts), len(graph))
+        for node, post in enumerate(posts):
+            linked = set([other.getPermaLink() for other in posts
+                          if other is not post and
+                          'href="' + other.getPermaLink() in post.contents])
+            self.assertEquals(linked, set([graph.nodes[target][1] for target
+                                           in graph.links(node)]))
+        profit2010 = graph.node('dummy_hbfile.html#idiota_1st_mil')
+        profit2011 = graph.node('dummy_hbfile2.html#idiota_10th_mil')
+        self.assertTrue(profit2011 in graph.backlinks(profit2010))
+
+    def testSaveAndLoad(self):
+        graph = LinkGraph(self.path)
+        graph.update(self.filenames)
+        graph.save()
+        loaded = LinkGraph(self.path)
+        self.assertEquals(graph.nodes, loaded.nodes)
+        self.assertEquals(graph.targets, loaded.targets)
+        self.assertEquals(graph.sources, loaded.sources)
+        node = graph.node('dummy_hbfile.html#idiota_1st_mil')
+        self.assertEquals(graph.backlinks(node), loaded.backlinks(node))
+        self.assertEquals(node, loaded.node('dummy_hbfile.html#idiota_1st_mil'))
+
+    def testUpdateParsesOnlyChangedFiles(self):
+        graph = LinkGraph(self.path)
+        self.assertEquals(self.filenames, graph.update(self.filenames))
+        graph.save()
+        graph = LinkGraph(self.path)
+        self.assertEquals([], graph.update(self.filenames))
+        f = open(self.filenames[1], 'ab')
+        f.write('\n')
+        f.close()
+        self.assertEquals([self.filenames[1]], graph.update(self.filenames))
+        graph.update(self.filenames[:1])
+        self.assertEquals(set(self.filenames[:1]), set(graph.files.keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Journal of the events of the tokenization of a handbook file, which the
+# HbFileParser replays to parse the file again without tokenizing it.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import marshal
+import os
+import sys
+import time
+import zlib
+from array import array
+from optparse import OptionParser
+from HTMLParser import HTMLParser
+from htmled import HbFile, PostExtractor
+
+# The events, each recorded as 5 integers: the code, the line and the offset
+# in the line of the event, as given by HTMLParser.getpos, and 2 arguments.
+StartTag = 0   # tag index, index of the name attribute of <a> or -1
+EndTag = 1     # tag index, 0
+Data = 2       # length of the data, which is in the text at the event, 0
+DataText = 3   # index of the data, 0
+EntityRef = 4  # index of the entity name, 0
+CharRef = 5    # index of the character reference, 0
+
+EventSize = 5
+
+# Only the end tags which the HbFileParser handles are recorded.
+RecordedEndTags = set(['h2', 'h3', 'div'])
+
+
+class HbEventJournal:
+    """The events of the tokenization of a handbook file, with its text,
+    which is needed to replay them: the contents of the subject entries are
+    taken from the text.
+
+    The names of the tags, of the anchors and of the entities, and the rare
+    data which isn't at its position in the text, are kept once in the
+    strings table and referred by their index.
+    """
+    Version = 1
+
+    def __init__(self, name = None, text = ''):
+        self.name = name
+        self.text = text
+        self.strings = []
+        self.stringIndexes = {}
+        self.events = array('i')
+
+    def __len__(self):
+        return len(self.events) // EventSize
+
+    def stringIndex(self, string):
+        index = self.stringIndexes.get(string)
+        if index == None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self.stringIndexes[string] = index
+        return index
+
+    def add(self, code, pos, arg1 = 0, arg2 = 0):
+        self.events.extend((code, pos[0], pos[1], arg1, arg2))
+
+    def replay(self, parser):
+        """replay(parser)
+
+        Call the handlers of the HbFileParser parser for each event, with the
+        position of the parser set to that of the event. The text must have
+        been fed to the parser, as HbFileParser.replay does.
+        """
+        events = self.events
+        strings = self.strings
+        text = self.text
+        for i in xrange(0, len(events), EventSize):
+            code = events[i]
+            parser.lineno = events[i + 1]
+            parser.offset = events[i + 2]
+            if code == Data:
+                start = parser.charNumFromLineAndOffset((parser.lineno,
+                                                         parser.offset))
+                parser.handle_data(text[start: start + events[i + 3]])
+            elif code == StartTag:
+                attrs = []
+                if events[i + 4] >= 0:
+                    attrs = [('name', strings[events[i + 4]])]
+                parser.handle_starttag(strings[events[i + 3]], attrs)
+            elif code == EndTag:
+                parser.handle_endtag(strings[events[i + 3]])
+            elif code == DataText:
+                parser.handle_data(strings[events[i + 3]])
+            elif code == EntityRef:
+                parser.handle_entityref(strings[events[i + 3]])
+            elif code == CharRef:
+                parser.handle_charref(strings[events[i + 3]])
+
+    def save(self, path):
+        data = {'version': HbEventJournal.Version, 'name': self.name,
+                'text': self.text, 'strings': self.strings,
+                'events': self.events.tostring()}
+        tmpPath = path + '.tmp'
+        f = open(tmpPath, 'wb')
+        try:
+            f.write(zlib.compress(marshal.dumps(data)))
+        finally:
+            f.close()
+        os.rename(tmpPath, path)
+
+    @staticmethod
+    def load(path):
+        """load(path) -> hbEventJournal saved in path"""
+        f = open(path, 'rb')
+        try:
+            data = marshal.loads(zlib.decompress(f.read()))
+        finally:
+            f.close()
+        if data['version'] != HbEventJournal.Version:
+            raise ValueError("'" + path + "' is a journal of version " +
+                             str(data['version']) + ', instead of ' +
+                             str(HbEventJournal.Version))
+        journal = HbEventJournal(data['name'], data['text'])
+        journal.strings = data['strings']
+        journal.events = array('i', data['events'])
+        return journal
+
+
+class JournalRecorder(HTMLParser):
+    """Tokenizes a handbook file, recording the events which an HbFileParser
+    handles in an HbEventJournal."""
+    def __init__(self, journal):
+        HTMLParser.__init__(self)
+        self.journal = journal
+        self.lineStarts = [0]
+
+    def record(self):
+        text = self.journal.text
+        newLine = text.find('\n')
+        while newLine != -1:
+            self.lineStarts.append(newLine + 1)
+            newLine = text.find('\n', newLine + 1)
+        self.feed(text)
+        return self.journal
+
+    def handle_starttag(self, tag, attrs):
+        name = -1
+        if tag == 'a':
+            for attr in attrs:
+                if attr[0] == 'name':
+                    name = self.journal.stringIndex(attr[1])
+                    break
+        self.journal.add(StartTag, self.getpos(),
+                         self.journal.stringIndex(tag), name)
+
+    def handle_endtag(self, tag):
+        if tag in RecordedEndTags:
+            self.journal.add(EndTag, self.getpos(),
+                             self.journal.stringIndex(tag))
+
+    def handle_data(self, data):
+        pos = self.getpos()
+        start = self.lineStarts[pos[0] - 1] + pos[1]
+        if self.journal.text.startswith(data, start):
+            self.journal.add(Data, pos, len(data))
+        else:
+            self.journal.add(DataText, pos, self.journal.stringIndex(data))
+
+    def handle_entityref(self, name):
+        self.journal.add(EntityRef, self.getpos(),
+                         self.journal.stringIndex(name))
+
+    def handle_charref(self, name):
+        self.journal.add(CharRef, self.getpos(),
+                         self.journal.stringIndex(name))
+
+
+def recordJournal(f):
+    """recordJournal(f) -> hbEventJournal of the handbook file f"""
+    return JournalRecorder(HbEventJournal(f.name, f.read())).record()
+
+
+def timeExtraction(journals, replay):
+    start = time.time()
+    hbfs = []
+    for journal in journals:
+        if replay:
+            hbfs.append(HbFile(None, journal=journal))
+        else:
+            from StringIO import StringIO
+            source = StringIO(journal.text)
+            source.name = journal.name
+            hbfs.append(HbFile(source))
+    posts = PostExtractor(*hbfs).extractPosts()
+    return time.time() - start, [str(post) for post in posts]
+
+def main(args = sys.argv[1:]):
+    parser = OptionParser(usage='%prog record HBFILE JOURNAL\n' +
+                          '       %prog bench HBFILE...\n\n' +
+                          'bench times the extraction of the posts of the ' +
+                          'handbook files tokenizing\nthem and replaying ' +
+                          'their journals.')
+    (options, args) = parser.parse_args(args)
+    if len(args) == 3 and args[0] == 'record':
+        from hbsources import openHbSource
+        f = openHbSource(args[1])
+        try:
+            journal = recordJournal(f)
+        finally:
+            f.close()
+        journal.save(args[2])
+        print >> sys.stderr, '%d events recorded.' % len(journal)
+    elif len(args) > 1 and args[0] == 'bench':
+        from hbsources import openHbSource
+        journals = []
+        for filename in args[1:]:
+            f = openHbSource(filename)
+            try:
+                journals.append(recordJournal(f))
+            finally:
+                f.close()
+        tokenizing, tokenizedPosts = timeExtraction(journals, False)
+        replaying, replayedPosts = timeExtraction(journals, True)
+        print 'tokenizing  replaying  speedup  identical'
+        print '%10.3f  %9.3f  %7.2f  %9s' % (tokenizing, replaying,
+                                             tokenizing / replaying,
+                                             tokenizedPosts == replayedPosts)
+    else:
+        parser.error("unknown command or wrong arguments: '" +
+                     ' '.join(args) + "'")
+
+
+if __name__ == "__main__":
+    main()
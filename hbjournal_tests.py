@@ -0,0 +1,110 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbjournal module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from hbjournal import *
+from htmled import HbFile, HbFileParser
+
+
+def entriesOf(hbf):
+    return [(de.date, [(se.title, se.name, se.contents, se.span)
+                       for se in de.subjects]) for de in hbf.dailyEntries]
+
+def source(text, name = 'ficheiro01.html'):
+    f = StringIO(text)
+    f.name = name
+    return f
+
+
+class HbEventJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def journalOf(self, filename):
+        f = open(filename)
+        try:
+            return recordJournal(f)
+        finally:
+            f.close()
+
+    def testReplayedHbFilesAreTheParsedOnes(self):
+        for filename in ['dummy_hbfile.html', 'dummy_hbfile2.html']:
+            f = open(filename)
+            parsed = HbFile(f)
+            f.close()
+            replayed = HbFile(None, journal=self.journalOf(filename))
+            self.assertEquals(filename, replayed.getFileName())
+            self.assertEquals(entriesOf(parsed), entriesOf(replayed))
+
+    def testSaveAndLoad(self):
+        journal = self.journalOf('dummy_hbfile.html')
+        path = os.path.join(self.dir, 'journal')
+        journal.save(path)
+        loaded = HbEventJournal.load(path)
+        self.assertEquals(journal.name, loaded.name)
+        self.assertEquals(journal.text, loaded.text)
+        self.assertEquals(journal.strings, loaded.strings)
+        self.assertEquals(journal.events, loaded.events)
+        self.assertEquals(entriesOf(HbFile(None, journal=journal)),
+                          entriesOf(HbFile(None, journal=loaded)))
+
+    def testEntitiesAndNestedMarkupInTitles(self):
+        text = '<div><h2><a name="2010-01-01">2010-01-01</a></h2>\n' + \
+            '<h3><a name="cafe">Caf&eacute; <code>&#227;</code></a></h3>\n' + \
+            '<p>x &amp; y</p>\n</div>'
+        journal = recordJournal(source(text))
+        self.assertTrue('eacute' in journal.strings)
+        self.assertEquals(entriesOf(HbFile(source(text))),
+                          entriesOf(HbFile(None, journal=journal)))
+
+    def testDataOutOfItsPlaceIsInTheStrings(self):
+        journal = HbEventJournal('ficheiro01.html', '<div><h2>\n</h2>')
+        journal.add(StartTag, (1, 0), journal.stringIndex('div'), -1)
+        journal.add(StartTag, (1, 5), journal.stringIndex('h2'), -1)
+        journal.add(DataText, (1, 9), journal.stringIndex('2010-01-01'))
+        journal.add(EndTag, (2, 0), journal.stringIndex('h2'))
+        parser = HbFileParser(None)
+        [de] = parser.replay(journal)
+        self.assertEquals('2010-01-01', de.date.isoformat())
+
+    def testTolerantReplay(self):
+        text = '<div><h2><a name="2010-01-01">2010-01-01</a></h2>\n' + \
+            '<h3><a name="a">A</a></h3>\n<p>a</h2></p>\n' + \
+            '<h2><a name="2010-01-02">2010-01-02</a></h2>\n' + \
+            '<h3><a name="b">B</a></h3>\n<p>b</p>\n</div>'
+        parsed = HbFile(source(text), tolerant=True)
+        replayed = HbFile(None, tolerant=True,
+                          journal=recordJournal(source(text)))
+        self.assertEquals(entriesOf(parsed), entriesOf(replayed))
+        self.assertEquals([str(d) for d in parsed.diagnostics],
+                          [str(d) for d in replayed.diagnostics])
+        self.assertEquals(1, len(replayed.diagnostics))
+
+    def testParallelNormalizationOfReplay(self):
+        journal = self.journalOf('dummy_hbfile2.html')
+        self.assertEquals(entriesOf(HbFile(None, journal=journal)),
+                          entriesOf(HbFile(None, workers=2, journal=journal)))
+
+
+if __name__ == "__main__":
+    unittest.main()
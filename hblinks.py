@@ -0,0 +1,115 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Check of the links between the handbook posts, reporting the links which
+# can't be adapted to the blog before the posts are published.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+from bisect import bisect_right
+from StringIO import StringIO
+from htmled import AnchorTable, HbFile, PostExtractor
+
+
+def readHbFiles(filenames, openFile, tolerant = False):
+    """readHbFiles(filenames, openFile[, tolerant]) -> [(hbFile, text), ...]
+
+    Parse the handbook files, keeping their text, to which the spans of the
+    subject entries refer. The diagnostics of the tolerant parsing are
+    printed to stderr.
+    """
+    from hb2post import printDiagnostics
+    hbfsAndTexts = []
+    for filename in filenames:
+        f = openFile(filename)
+        try:
+            text = f.read()
+            source = StringIO(text)
+            source.name = f.name
+        finally:
+            f.close()
+        hbf = HbFile(source, tolerant=tolerant)
+        printDiagnostics(source.name, hbf)
+        hbfsAndTexts.append((hbf, text))
+    return hbfsAndTexts
+
+def brokenLinks(hbfsAndTexts):
+    """brokenLinks([(hbFile, text), ...]) -> [(post, offset, link), ...]
+
+    Find the links of the posts of the handbook files which can't be adapted
+    to the blog, because no post has their anchor, in the order of the files
+    and of the posts in each file. The offset is the offset of the link in
+    the text of the handbook file of the post.
+    The anchors of all the files are indexed first, in a single pass over
+    the posts, without sorting the posts nor adapting their links.
+    """
+    pe = PostExtractor()
+    filesPosts = []
+    for hbf, text in hbfsAndTexts:
+        subjects = [se for de in hbf.dailyEntries for se in de.subjects]
+        filesPosts.append((PostExtractor(hbf).buildPosts(), subjects, text))
+    anchors = AnchorTable()
+    for posts, subjects, text in filesPosts:
+        for post in posts:
+            anchors.addPost(post)
+    broken = []
+    for posts, subjects, text in filesPosts:
+        for post, se in zip(posts, subjects):
+            occurrences = {}
+            offsets = None
+            for match, hbfname, anchor in pe.iterHbfLinks(post):
+                key = (match.group('filename'), anchor)
+                occurrences[key] = occurrences.get(key, 0) + 1
+                if anchors.resolve(hbfname, anchor) == None:
+                    if offsets == None:
+                        offsets = linkOffsets(text, se.span)
+                    keyOffsets = offsets.get(key, ())
+                    offset = se.span[0]
+                    if occurrences[key] <= len(keyOffsets):
+                        offset = keyOffsets[occurrences[key] - 1]
+                    broken.append((post, offset, match.group()))
+    return broken
+
+def linkOffsets(text, span):
+    """linkOffsets(text, span) -> {(filename, anchor): [offset, ...]}
+
+    The offsets in text of the links in the span of the raw contents of a
+    subject entry, in a single pass. A link which the normalization of the
+    contents changed isn't found, and is reported at the start of the span.
+    """
+    start, end = span
+    offsets = {}
+    for match in PostExtractor.HbfIntraLinkRe.finditer(text, start, end):
+        offsets.setdefault((match.group('filename'), match.group('anchor')),
+                           []).append(match.start())
+    return offsets
+
+def lineOfOffset(lineStarts, offset):
+    """lineOfOffset(lineStarts, offset) -> number of the line, from 1, of
+    the offset, given the offsets of the starts of the lines"""
+    return bisect_right(lineStarts, offset)
+
+def checkLinks(filenames, openFile, out, tolerant = False):
+    """checkLinks(filenames, openFile, out[, tolerant]) -> numberOfBrokenLinks
+
+    Report to out each broken link of the posts of the handbook files, as
+    'hbfname:line:offset: yyyy-mm-dd subjname link'.
+    """
+    hbfsAndTexts = readHbFiles(filenames, openFile, tolerant)
+    lineStarts = dict([(hbf.getFileName(), hbf.lineStarts)
+                       for hbf, text in hbfsAndTexts])
+    broken = brokenLinks(hbfsAndTexts)
+    for post, offset, link in broken:
+        out.write('%s:%d:%d: %s %s %s\n' % (
+                post.hbfname, lineOfOffset(lineStarts[post.hbfname], offset),
+                offset, post.date, post.subjname, link))
+    return len(broken)
@@ -0,0 +1,123 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hblinks module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import sys
+import unittest
+from StringIO import StringIO
+from hblinks import *
+from hbsources import openHbSource
+from htmled import StateError
+
+
+def hbText(*entries):
+    return '<html><body><div lang="en">\n' + ''.join(entries) + \
+        '</div>\n</body></html>\n'
+
+def dailyEntry(d, subjects):
+    return '<h2><a name="%s" class="ancora">%s</a></h2>\n' % (d, d) + \
+        ''.join(['<h3><a name="%s">%s</a></h3>\n%s\n' % subject
+                 for subject in subjects])
+
+
+class BrokenLinksTest(unittest.TestCase):
+    def openFile(self, filename):
+        f = StringIO(self.texts[filename])
+        f.name = filename
+        return f
+
+    def check(self):
+        out = StringIO()
+        count = checkLinks(sorted(self.texts.keys()), self.openFile, out)
+        return count, out.getvalue().splitlines()
+
+    def testDummyHbFiles(self):
+        out = StringIO()
+        self.assertEquals(1, checkLinks(['dummy_hbfile.html',
+                                         'dummy_hbfile2.html'],
+                                        openHbSource, out))
+        text = open('dummy_hbfile2.html').read()
+        offset = text.index('<a href="dummy_hbfile.html#2010-05-06"')
+        self.assertEquals('dummy_hbfile2.html:72:%d: 2011-05-16 2011-05-16 '
+                          '<a href="dummy_hbfile.html#2010-05-06" '
+                          'class="ligacao">' % offset, out.getvalue().strip())
+
+    def testResolvedLinksAreNotReported(self):
+        self.texts = {
+            'ficheiro01.html': hbText(dailyEntry('2010-01-01', [
+                        ('a', 'A', '<p><a name="in_a">x</a>'
+                         '<a href="#in_a">same post</a>'
+                         '<a href="ficheiro02.html#b">b</a></p>')])),
+            'ficheiro02.html': hbText(dailyEntry('2010-01-02', [
+                        ('b', 'B', '<p><a href="ficheiro01.html#in_a">a</a>'
+                         '<a href="#b">itself</a></p>')]))}
+        self.assertEquals((0, []), self.check())
+
+    def testBrokenLinksWithPostFileAndOffset(self):
+        self.texts = {
+            'ficheiro01.html': hbText(dailyEntry('2010-01-01', [
+                        ('a', 'A', '<p><a href="#none">x</a></p>'),
+                        ('b', 'B', '<p><a href="ficheiro03.html#a">y</a>\n'
+                         '<a href="#none">z</a></p>')]))}
+        count, lines = self.check()
+        self.assertEquals(3, count)
+        text = self.texts['ficheiro01.html']
+        first = text.index('<a href="#none">')
+        self.assertEquals('ficheiro01.html:4:%d: 2010-01-01 a '
+                          '<a href="#none">' % first, lines[0])
+        self.assertEquals(text.index('<a href="ficheiro03.html#a">'),
+                          int(lines[1].split(':')[2]))
+        self.assertEquals(text.index('<a href="#none">', first + 1),
+                          int(lines[2].split(':')[2]))
+        self.assertTrue(lines[2].startswith('ficheiro01.html:7:'))
+
+    def testTolerantCheckSkipsMalformedEntries(self):
+        self.texts = {
+            'ficheiro01.html': hbText(dailyEntry('2010-01-01', [
+                        ('a', 'A', '<p><a href="#none">x</a></p>'),
+                        ('b', 'B', '<p></h2><a href="#none">y</a></p>')]),
+                                      dailyEntry('2010-01-02', [
+                        ('c', 'C', '<p><a href="#a">a</a></p>')]))}
+        self.assertRaises(StateError, self.check)
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            count = checkLinks(['ficheiro01.html'], self.openFile, StringIO(),
+                               True)
+            reported = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEquals(1, count)
+        self.assertTrue(reported.startswith('ficheiro01.html:'))
+
+    def testLineOfOffset(self):
+        lineStarts = [0, 3, 4]
+        self.assertEquals([1, 1, 1, 2, 3, 3],
+                          [lineOfOffset(lineStarts, offset)
+                           for offset in range(6)])
+
+    def testBrokenLinksOfPosts(self):
+        self.texts = {
+            'ficheiro01.html': hbText(dailyEntry('2010-01-01', [
+                        ('a', 'A', '<p><a href="ficheiro01.html#none">x</a>'
+                         '</p>')]))}
+        hbfsAndTexts = readHbFiles(['ficheiro01.html'], self.openFile)
+        [(post, offset, link)] = brokenLinks(hbfsAndTexts)
+        self.assertEquals('a', post.subjname)
+        self.assertEquals('<a href="ficheiro01.html#none">', link)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Manifest of the published posts, to find out which posts are new or
+# changed.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import json
+import os
+
+
+class PostManifest:
+    """Maps the permalinks of the posts to their fingerprints (see
+    Post.getFingerprint), as they were when last emitted, and is kept in a
+    local JSON file."""
+    def __init__(self, path):
+        """PostManifest(path) -> postManifest
+
+        Load the manifest from path, if it exists, otherwise start empty.
+        """
+        self.path = path
+        self.fingerprints = {}
+        if os.path.exists(path):
+            f = open(path)
+            try:
+                self.fingerprints = json.load(f)
+            finally:
+                f.close()
+
+    def isChanged(self, post):
+        """isChanged(post) -> True if post is new or was modified"""
+        return self.fingerprints.get(post.getPermaLink()) != \
+            post.getFingerprint()
+
+    def update(self, post):
+        self.fingerprints[post.getPermaLink()] = post.getFingerprint()
+
+    def changedPosts(self, posts):
+        """changedPosts(posts) -> generatorOfPosts
+
+        Generate the new or modified posts of posts, updating the manifest
+        with each of them as they are generated.
+        """
+        for post in posts:
+            permaLink = post.getPermaLink()
+            fingerprint = post.getFingerprint()
+            if self.fingerprints.get(permaLink) != fingerprint:
+                self.fingerprints[permaLink] = fingerprint
+                yield post
+
+    def save(self):
+        """save()
+
+        Save the manifest to its path, replacing the previous file only
+        after the new one is completely written.
+        """
+        tmpPath = self.path + '.tmp'
+        f = open(tmpPath, 'w')
+        try:
+            json.dump(self.fingerprints, f, sort_keys=True, indent=0)
+        finally:
+            f.close()
+        os.rename(tmpPath, self.path)
@@ -0,0 +1,62 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbmanifest module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import date
+from hbmanifest import *
+from htmled import Post
+
+
+class PostManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'manifest')
+        self.posts = [Post(date(2010, 2, 6), 'First', '<p>one</p>', 'a', 'h.html'),
+                      Post(date(2010, 2, 8), 'Second', '<p>two</p>', 'b', 'h.html')]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def changedPostsOfNewManifest(self):
+        manifest = PostManifest(self.path)
+        changed = list(manifest.changedPosts(self.posts))
+        manifest.save()
+        return changed
+
+    def testAllPostsAreNewInEmptyManifest(self):
+        self.assertEquals(self.posts, self.changedPostsOfNewManifest())
+
+    def testOnlyChangedAndNewPostsAfterSave(self):
+        self.changedPostsOfNewManifest()
+        self.assertEquals([], self.changedPostsOfNewManifest())
+        self.posts[1].contents += '<p>more</p>'
+        self.posts.append(Post(date(2010, 2, 9), 'Third', '', 'c', 'h.html'))
+        self.assertEquals(self.posts[1:], self.changedPostsOfNewManifest())
+
+    def testIsChangedAndUpdate(self):
+        manifest = PostManifest(self.path)
+        self.assertTrue(manifest.isChanged(self.posts[0]))
+        manifest.update(self.posts[0])
+        self.assertFalse(manifest.isChanged(self.posts[0]))
+        self.posts[0].title = 'First, renamed'
+        self.assertTrue(manifest.isChanged(self.posts[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
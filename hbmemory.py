@@ -0,0 +1,241 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Memory accounting of the phases of the extraction of posts: reading and
+# parsing the handbook files, building and sorting the posts, taking their anchors,
+# filtering them and adapting their links.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import gc
+import os
+import sys
+from StringIO import StringIO
+from hb2post import HbFileAuto
+
+Phases = ['read', 'parse', 'build', 'sort', 'anchors', 'filter', 'adapt']
+
+
+class PhaseMemory:
+    """The memory of a phase: the bytes retained after it (negative when it
+    frees more than it allocates), the change of the resident set size of
+    the process during it, the peak growth of the resident set size during
+    it, over its size when the phase began, and the types with the largest
+    deep size in the state kept after it, as (typeName, bytes) pairs."""
+    def __init__(self, name, retained, rss, peak, largestTypes):
+        self.name = name
+        self.retained = retained
+        self.rss = rss
+        self.peak = peak
+        self.largestTypes = largestTypes
+
+    def __str__(self):
+        return '%-8s %12d %12d %12d' % (self.name, self.retained, self.rss,
+                                        self.peak)
+
+
+class MemoryAccounting:
+    """Accounts for the memory of consecutive phases.
+
+    The retained bytes are the change of the deep size of the live state
+    given to endPhase, and the largest types are those of the objects of the
+    state; Python 2 can't trace the source lines which allocated them. The
+    resident set size is sampled from /proc/self/statm when each phase
+    begins and ends. Its peak, which shows the memory allocated and freed
+    within the phase, is the high water mark of /proc/self/status, which is
+    reset to the current size when each phase begins. Where there is no
+    /proc, or the mark can't be reset, they are 0.
+    """
+    def __init__(self, largestTypes = 10):
+        self.largestTypes = largestTypes
+        self.phases = []
+        self.stateSize = 0
+
+    def start(self, state = ()):
+        self.stateSize = deepSize(state)
+        self.beginPhase()
+
+    def beginPhase(self):
+        gc.collect()
+        self.rss = residentSetSize()
+        self.peakReset = resetPeakResidentSetSize()
+
+    def endPhase(self, name, state = ()):
+        """endPhase(name[, state]) -> phaseMemory
+
+        End the phase, whose live state (all the objects kept after it) is
+        state, and begin the next one.
+        """
+        gc.collect()
+        sizes = {}
+        size = deepSize(state, sizes)
+        largestTypes = sorted(sizes.items(), key=lambda item: -item[1])
+        peak = 0
+        if self.peakReset:
+            peak = max(peakResidentSetSize() - self.rss, 0)
+        phase = PhaseMemory(name, size - self.stateSize,
+                            residentSetSize() - self.rss, peak,
+                            largestTypes[:self.largestTypes])
+        self.stateSize = size
+        self.phases.append(phase)
+        self.beginPhase()
+        return phase
+
+    def phase(self, name):
+        """phase(name) -> phaseMemory of the phase named name"""
+        for phase in self.phases:
+            if phase.name == name:
+                return phase
+        raise KeyError(name)
+
+    def report(self, out):
+        out.write('phase        retained    rss delta         peak\n')
+        for phase in self.phases:
+            out.write(str(phase) + '\n')
+        for phase in self.phases:
+            out.write('\nlargest types after %s:\n' % phase.name)
+            for typeName, size in phase.largestTypes:
+                out.write('%12d %s\n' % (size, typeName))
+
+
+def residentSetSize():
+    """residentSetSize() -> bytes, or 0 if unknown"""
+    try:
+        f = open('/proc/self/statm')
+    except IOError:
+        return 0
+    try:
+        pages = int(f.read().split()[1])
+    finally:
+        f.close()
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+def resetPeakResidentSetSize():
+    """resetPeakResidentSetSize() -> whether the peak was reset
+
+    Reset the high water mark of the resident set size of the process (see
+    proc(5)) to its current size.
+    """
+    try:
+        f = open('/proc/self/clear_refs', 'w')
+    except IOError:
+        return False
+    try:
+        f.write('5')
+    finally:
+        try:
+            f.close()
+        except IOError:
+            return False
+    return True
+
+def peakResidentSetSize():
+    """peakResidentSetSize() -> bytes, or 0 if unknown"""
+    try:
+        f = open('/proc/self/status')
+    except IOError:
+        return 0
+    try:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    finally:
+        f.close()
+    return 0
+
+def deepSize(obj, sizes = None):
+    """deepSize(obj[, sizes]) -> bytes of obj and of all it refers to
+
+    Objects referred more than once are counted once. The bytes of each
+    type are added to the sizes dictionary, when given.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size = sys.getsizeof(o)
+        total += size
+        if sizes != None:
+            typeName = type(o).__name__
+            if typeName == 'instance':
+                typeName = o.__class__.__name__
+            sizes[typeName] = sizes.get(typeName, 0) + size
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif hasattr(o, '__dict__') and not isinstance(o, type):
+            stack.append(o.__dict__)
+    return total
+
+
+class ReadHbFiles(HbFileAuto):
+    """HbFileAuto which parses the texts already read from the handbook
+    files, given as {filename: (name, text)}."""
+    def __init__(self, filenames, texts, workers = 1, tolerant = False):
+        self.texts = texts
+        HbFileAuto.__init__(self, filenames, workers, tolerant)
+        del self.texts
+
+    def openFile(self, fn):
+        name, text = self.texts[fn]
+        source = StringIO(text)
+        source.name = name
+        return source
+
+
+def accountExtraction(filenames, d1 = None, d2 = None, workers = 1,
+                      tolerant = False, dedup = False, accounting = None):
+    """accountExtraction(filenames[, d1[, d2[, workers[, tolerant[, dedup[,
+        accounting]]]]]]) -> (posts, memoryAccounting)
+
+    Extract the posts from d1 to d2 of the handbook files, as hb2post does
+    with the same options, accounting for the memory of each of its Phases,
+    which are the steps of PostExtractor.iterPosts.
+    """
+    from hbsources import openHbSource
+    from htmled import PostExtractor
+    if accounting == None:
+        accounting = MemoryAccounting()
+    accounting.start()
+    texts = {}
+    for filename in filenames:
+        f = openHbSource(filename)
+        try:
+            texts[filename] = (f.name, f.read())
+        finally:
+            f.close()
+    accounting.endPhase('read', texts)
+    hbfs = ReadHbFiles(filenames, texts, workers, tolerant).hbfs
+    del texts
+    accounting.endPhase('parse', hbfs)
+    pe = PostExtractor(*hbfs)
+    pe.workers = workers
+    pe.dedup = dedup
+    posts = pe.buildPosts()
+    accounting.endPhase('build', (hbfs, posts))
+    posts.sort()
+    accounting.endPhase('sort', (hbfs, posts))
+    anchors = pe.anchorTable(posts)
+    accounting.endPhase('anchors', (hbfs, posts, anchors))
+    posts = pe.uniqueOf(posts)
+    selected = pe.postsInRange(posts, [post.date for post in posts], d1, d2)
+    del posts
+    accounting.endPhase('filter', (hbfs, anchors, selected))
+    selected = list(pe.iterAdaptedPosts(anchors, selected))
+    accounting.endPhase('adapt', (hbfs, anchors, selected))
+    return selected, accounting
@@ -0,0 +1,112 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbmemory module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import sys
+import unittest
+from StringIO import StringIO
+from datetime import date
+from hbmemory import *
+from htmled import HbFile, PostExtractor
+
+
+class MemoryAccountingTest(unittest.TestCase):
+    def setUp(self):
+        self.filenames = ['dummy_hbfile.html', 'dummy_hbfile2.html']
+        self.textSize = sum([os.path.getsize(filename)
+                             for filename in self.filenames])
+        self.posts, self.accounting = accountExtraction(self.filenames)
+
+    def testPhasesInOrder(self):
+        self.assertEquals(Phases,
+                          [phase.name for phase in self.accounting.phases])
+        self.assertRaises(KeyError, self.accounting.phase, 'write')
+
+    def hbFiles(self):
+        hbfs = []
+        for filename in self.filenames:
+            f = open(filename)
+            hbfs.append(HbFile(f))
+            f.close()
+        return hbfs
+
+    def assertSamePosts(self, expected, actual):
+        self.assertEquals([(p.date, p.title, p.contents) for p in expected],
+                          [(p.date, p.title, p.contents) for p in actual])
+
+    def testSamePostsAsExtractPosts(self):
+        self.assertSamePosts(PostExtractor(*self.hbFiles()).extractPosts(),
+                             self.posts)
+
+    def testSamePostsAsGetPostsOfRange(self):
+        d1 = date(2010, 2, 7)
+        d2 = date(2011, 2, 6)
+        posts, accounting = accountExtraction(self.filenames, d1, d2)
+        self.assertEquals(4, len(posts))
+        self.assertSamePosts(PostExtractor(*self.hbFiles()).getPosts(d1, d2),
+                             posts)
+
+    def testMemoryBudgets(self):
+        self.assertTrue(self.accounting.phase('read').retained >= self.textSize)
+        self.assertTrue(self.accounting.phase('parse').retained > 0)
+        self.assertTrue(self.accounting.phase('parse').retained <
+                        10 * self.textSize)
+        self.assertTrue(self.accounting.phase('build').retained <
+                        5 * self.textSize)
+        for phase in self.accounting.phases:
+            self.assertTrue(phase.peak >= 0)
+            self.assertTrue(len(phase.largestTypes) <= 10)
+
+    def testPeakOfMemoryFreedWithinThePhase(self):
+        accounting = MemoryAccounting()
+        accounting.start()
+        size = 64 * 1024 * 1024
+        text = 'x' * size
+        del text
+        phase = accounting.endPhase('transient')
+        if resetPeakResidentSetSize():
+            # the text may reuse a few pages resident before the phase
+            self.assertTrue(phase.peak >= 0.9 * size)
+            self.assertTrue(phase.rss < 0.1 * size)
+        else:
+            self.assertEquals(0, phase.peak)
+
+    def testResidentSetSize(self):
+        if os.path.exists('/proc/self/statm'):
+            self.assertTrue(residentSetSize() > 0)
+        else:
+            self.assertEquals(0, residentSetSize())
+
+    def testReport(self):
+        out = StringIO()
+        self.accounting.report(out)
+        lines = out.getvalue().splitlines()
+        self.assertEquals('phase        retained    rss delta         peak',
+                          lines[0])
+        self.assertTrue(lines[1].startswith('read '))
+        self.assertTrue(lines[2].startswith('parse '))
+        self.assertTrue('largest types after adapt:' in lines)
+
+    def testDeepSizeCountsSharedObjectsOnce(self):
+        text = 'x' * 1000
+        sizes = {}
+        self.assertEquals(deepSize([text, text], sizes),
+                          sys.getsizeof([text, text]) + sys.getsizeof(text))
+        self.assertEquals(sys.getsizeof(text), sizes['str'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Precomputed index of the rendered posts of a handbook, which answers date
+# range queries without importing the parser nor parsing the handbook files.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import marshal
+import os
+from bisect import bisect_left, bisect_right
+
+
+class QuickIndex:
+    """The posts of a handbook, rendered in the text output format, with the
+    sorted dates of the posts and the offsets of their text.
+
+    The index is a single file with a marshaled header (the fingerprints of
+    the handbook files, the date ordinals and the offsets), followed by the
+    rendered posts in date order, so a date range is answered by a binary
+    search and a single read. It is current while the fingerprints of the
+    handbook files match the ones recorded when it was built.
+    """
+    Version = 1
+
+    def __init__(self, path):
+        """QuickIndex(path) -> quickIndex
+
+        Load the header of the index in path, if it exists and has the same
+        version, otherwise the index isn't current for any files.
+        """
+        self.path = path
+        self.files = None
+        self.ordinals = []
+        self.offsets = [0]
+        self.textStart = 0
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        f = open(self.path, 'rb')
+        try:
+            try:
+                header = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return
+            self.textStart = f.tell()
+        finally:
+            f.close()
+        if not isinstance(header, dict) or \
+                header.get('version') != QuickIndex.Version:
+            return
+        self.files = header['files']
+        self.ordinals = header['ordinals']
+        self.offsets = header['offsets']
+
+    def fingerprints(self, filenames):
+        """fingerprints(filenames) -> {filename: fingerprint}"""
+        from hbsources import sourceFingerprint
+        return dict([(filename, sourceFingerprint(filename))
+                     for filename in filenames])
+
+    def isCurrent(self, fingerprints):
+        """isCurrent(fingerprints) -> True if built from the same files"""
+        return self.files == fingerprints
+
+    def build(self, fingerprints, posts, render):
+        """build(fingerprints, posts, render)
+
+        Rebuild the index from the posts, sorted by date and with their links
+        adapted, rendering each post with render, and save it.
+        """
+        texts = []
+        self.ordinals = []
+        self.offsets = [0]
+        for post in posts:
+            text = render(post)
+            texts.append(text)
+            self.ordinals.append(post.date.toordinal())
+            self.offsets.append(self.offsets[-1] + len(text))
+        self.files = dict(fingerprints)
+        header = marshal.dumps({'version': QuickIndex.Version,
+                                'files': self.files,
+                                'ordinals': self.ordinals,
+                                'offsets': self.offsets})
+        self.textStart = len(header)
+        tmpPath = self.path + '.tmp'
+        f = open(tmpPath, 'wb')
+        try:
+            f.write(header)
+            f.write(''.join(texts))
+        finally:
+            f.close()
+        os.rename(tmpPath, self.path)
+
+    def rowsInRange(self, d1, d2):
+        return (bisect_left(self.ordinals, d1.toordinal()),
+                bisect_right(self.ordinals, d2.toordinal()))
+
+    def writePosts(self, d1, d2, out):
+        """writePosts(d1, d2, out) -> number of posts written
+
+        Write the rendered posts from d1 to d2, inclusive, to out. The index
+        file isn't opened when there are no posts in the range.
+        """
+        start, end = self.rowsInRange(d1, d2)
+        if start == end:
+            return 0
+        f = open(self.path, 'rb')
+        try:
+            f.seek(self.textStart + self.offsets[start])
+            out.write(f.read(self.offsets[end] - self.offsets[start]))
+        finally:
+            f.close()
+        return end - start
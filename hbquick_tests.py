@@ -0,0 +1,109 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbquick module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date
+from StringIO import StringIO
+from hbquick import *
+from hb2post import renderTextPost, writeTextPosts
+from htmled import HbFile, PostExtractor
+
+
+class QuickIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'quick')
+        self.filenames = ['dummy_hbfile.html', 'dummy_hbfile2.html']
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def postExtractor(self):
+        hbfs = []
+        for filename in self.filenames:
+            f = open(filename)
+            hbfs.append(HbFile(f))
+            f.close()
+        return PostExtractor(*hbfs)
+
+    def buildIndex(self):
+        quick = QuickIndex(self.path)
+        fingerprints = quick.fingerprints(self.filenames)
+        quick.build(fingerprints, self.postExtractor().iterPosts(),
+                    renderTextPost)
+        return fingerprints
+
+    def assertSameOutput(self, d1, d2):
+        expected = StringIO()
+        writeTextPosts(self.postExtractor().iterPosts(d1, d2), expected)
+        out = StringIO()
+        count = QuickIndex(self.path).writePosts(d1, d2, out)
+        self.assertEquals(expected.getvalue(), out.getvalue())
+        return count
+
+    def testMissingIndexIsNotCurrent(self):
+        quick = QuickIndex(self.path)
+        self.assertFalse(quick.isCurrent(quick.fingerprints(self.filenames)))
+
+    def testBuiltIndexIsCurrent(self):
+        fingerprints = self.buildIndex()
+        self.assertTrue(QuickIndex(self.path).isCurrent(fingerprints))
+
+    def testChangedFileMakesIndexNotCurrent(self):
+        fingerprints = self.buildIndex()
+        changed = dict(fingerprints)
+        changed['dummy_hbfile2.html'] = (0, 0.0)
+        self.assertFalse(QuickIndex(self.path).isCurrent(changed))
+
+    def testWritePostsSameAsParsing(self):
+        self.buildIndex()
+        self.assertEquals(2, self.assertSameOutput(date(2011, 2, 6),
+                                                   date(2011, 2, 6)))
+        self.assertEquals(4, self.assertSameOutput(date(2010, 1, 1),
+                                                   date(2010, 12, 31)))
+        self.assertSameOutput(date(2000, 1, 1), date(2020, 1, 1))
+
+    def testEmptyRangeDoesntReadIndex(self):
+        self.buildIndex()
+        quick = QuickIndex(self.path)
+        os.remove(self.path)
+        out = StringIO()
+        self.assertEquals(0, quick.writePosts(date(2005, 1, 1),
+                                              date(2005, 1, 31), out))
+        self.assertEquals('', out.getvalue())
+
+    def testCorruptIndexIsNotCurrent(self):
+        fingerprints = self.buildIndex()
+        f = open(self.path, 'wb')
+        f.write('not an index')
+        f.close()
+        self.assertFalse(QuickIndex(self.path).isCurrent(fingerprints))
+
+    def testHb2postImportDoesntImportParser(self):
+        code = 'import sys, hb2post; print "htmled" in sys.modules, ' + \
+            '"HTMLParser" in sys.modules'
+        output = subprocess.Popen([sys.executable, '-c', code],
+                                  stdout=subprocess.PIPE).communicate()[0]
+        self.assertEquals('False False', output.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Full text index and search of the handbook posts.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import marshal
+import math
+import os
+import re
+import sys
+import zlib
+from itertools import chain
+from HTMLParser import HTMLParser
+
+WordPattern = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text, encoding = 'iso-8859-1'):
+    """tokenize(text[, encoding]) -> listOfWords
+
+    Split the tag free text in lower case words, after decoding it with
+    encoding and replacing its character and entity references.
+    """
+    if not text:
+        return []
+    if not isinstance(text, unicode):
+        text = text.decode(encoding, 'replace')
+    if '&' in text:
+        text = HTMLParser().unescape(text)
+    return WordPattern.findall(text.lower())
+
+def decodeQuery(query, encoding = None):
+    """decodeQuery(query[, encoding]) -> unicodeQuery
+
+    Decode a query given in the command line with encoding, which defaults
+    to the encoding of the terminal, not to that of the handbook files.
+    """
+    if isinstance(query, unicode):
+        return query
+    if encoding == None:
+        import locale
+        encoding = sys.stdin.encoding or locale.getpreferredencoding() or \
+            'ascii'
+    return query.decode(encoding, 'replace')
+
+
+class HbIndex:
+    """An inverted index of the words of the titles and contents of the posts
+    of a set of handbook files, which is kept in a compact binary file.
+
+    The postings of a word map the ids of the posts (documents) to the
+    positions of the word in the post. The title words come first, followed
+    by a gap and the contents words, so that phrases don't span both.
+    Each handbook file is indexed independently, so that updating the index
+    only parses the files that changed since the last update.
+    """
+    Version = 1
+
+    def __init__(self, path = None, encoding = 'iso-8859-1'):
+        """HbIndex([path[, encoding]]) -> hbIndex
+
+        Load the index from path, if it exists, otherwise start empty.
+        """
+        self.path = path
+        self.encoding = encoding
+        self.docs = []
+        self.files = {}
+        self.postings = {}
+        if path != None and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        f = open(self.path, 'rb')
+        try:
+            data = marshal.loads(zlib.decompress(f.read()))
+        finally:
+            f.close()
+        if data['version'] != HbIndex.Version:
+            return
+        self.docs = data['docs']
+        self.files = data['files']
+        self.postings = data['postings']
+
+    def save(self):
+        self.compact()
+        data = {'version': HbIndex.Version, 'docs': self.docs,
+                'files': self.files, 'postings': self.postings}
+        tmpPath = self.path + '.tmp'
+        f = open(tmpPath, 'wb')
+        try:
+            f.write(zlib.compress(marshal.dumps(data)))
+        finally:
+            f.close()
+        os.rename(tmpPath, self.path)
+
+    def update(self, filenames):
+        """update(filenames) -> listOfReindexedFilenames
+
+        Index the handbook files which changed since they were last indexed
+        and drop the files that are no longer in filenames.
+        """
+        from hbsources import sourceFingerprint
+        reindexed = []
+        for filename in set(self.files.keys()) - set(filenames):
+            self.removeFile(filename)
+        for filename in filenames:
+            fingerprint = sourceFingerprint(filename)
+            if filename in self.files and \
+                    self.files[filename]['fingerprint'] == fingerprint:
+                continue
+            self.removeFile(filename)
+            self.addFile(filename, fingerprint, self.postsOfFile(filename))
+            reindexed.append(filename)
+        return reindexed
+
+    def postsOfFile(self, filename):
+        from hbsources import openHbSource
+        from htmled import HbFile, PostExtractor
+        f = openHbSource(filename)
+        try:
+            hbf = HbFile(f)
+        finally:
+            f.close()
+        return PostExtractor(hbf).buildPosts()
+
+    def addFile(self, filename, fingerprint, posts):
+        docIds = []
+        for post in posts:
+            docIds.append(self.addPost(post))
+        self.files[filename] = {'fingerprint': fingerprint, 'docs': docIds}
+
+    def addPost(self, post):
+        from htmled import PostExtractor
+        docId = len(self.docs)
+        self.docs.append((post.date.toordinal(), post.title,
+                          post.getPermaLink(), post.hbfname))
+        titleWords = tokenize(post.title, self.encoding)
+        contentsWords = tokenize(PostExtractor().stripTags(post.contents or ''),
+                                 self.encoding)
+        for position, word in chain(enumerate(titleWords),
+                                    enumerate(contentsWords,
+                                              len(titleWords) + 1)):
+            self.postings.setdefault(word, {}).setdefault(docId, []).append(
+                position)
+        return docId
+
+    def removeFile(self, filename):
+        if filename not in self.files:
+            return
+        docIds = set(self.files.pop(filename)['docs'])
+        for docId in docIds:
+            self.docs[docId] = None
+        for word in self.postings.keys():
+            wordPostings = self.postings[word]
+            for docId in docIds.intersection(wordPostings):
+                del wordPostings[docId]
+            if not wordPostings:
+                del self.postings[word]
+
+    def compact(self):
+        """compact()
+
+        Drop the docs of the removed files, which are None, renumbering the
+        remaining docs in the files and in the postings.
+        """
+        if None not in self.docs:
+            return
+        newIds = {}
+        docs = []
+        for docId, doc in enumerate(self.docs):
+            if doc != None:
+                newIds[docId] = len(docs)
+                docs.append(doc)
+        self.docs = docs
+        for f in self.files.values():
+            f['docs'] = [newIds[docId] for docId in f['docs']]
+        for word, wordPostings in self.postings.items():
+            self.postings[word] = dict([(newIds[docId], positions)
+                                        for docId, positions
+                                        in wordPostings.items()])
+
+    def search(self, query):
+        """search(query) -> [(date, title, permaLink, score), ...]
+
+        Get the posts matching query, ordered from the highest score. A query
+        which isn't unicode is decoded with the encoding of the handbook
+        files (see decodeQuery for queries from the command line). The query
+        is a sequence of words and "quoted phrases", which must all be
+        in the post, unless prefixed with - (or NOT), in which case none of
+        them may be. OR separates alternative sequences.
+        """
+        from datetime import date
+        result = set()
+        for alternative in self.parseQuery(query):
+            result |= self.matchAlternative(alternative)
+        words = set(tokenize(query, self.encoding))
+        liveDocs = sum([len(f['docs']) for f in self.files.values()])
+        scored = [(self.score(docId, words, liveDocs), docId)
+                  for docId in result]
+        scored.sort(key=lambda item: (-item[0], -self.docs[item[1]][0]))
+        hits = []
+        for score, docId in scored:
+            ordinal, title, permaLink, hbfname = self.docs[docId]
+            hits.append((date.fromordinal(ordinal), title, permaLink, score))
+        return hits
+
+    QueryTokenPattern = re.compile(r'(-|NOT\s+)?(?:"([^"]*)"|(\S+))')
+
+    def parseQuery(self, query):
+        """parseQuery(query) -> [[(negated, words), ...], ...]"""
+        alternatives = [[]]
+        for match in HbIndex.QueryTokenPattern.finditer(query):
+            negation, phrase, word = match.groups()
+            if word == 'OR' and not negation:
+                alternatives.append([])
+                continue
+            words = tokenize(phrase if phrase != None else word, self.encoding)
+            if words:
+                alternatives[-1].append((negation != None, words))
+        return [alternative for alternative in alternatives if alternative]
+
+    def matchAlternative(self, alternative):
+        docIds = None
+        for negated, words in alternative:
+            if not negated:
+                matched = self.matchPhrase(words)
+                docIds = matched if docIds == None else docIds & matched
+        if docIds == None:
+            return set()
+        for negated, words in alternative:
+            if negated:
+                docIds -= self.matchPhrase(words)
+        return docIds
+
+    def matchPhrase(self, words):
+        wordsPostings = [self.postings.get(word, {}) for word in words]
+        docIds = set(wordsPostings[0])
+        for wordPostings in wordsPostings[1:]:
+            docIds.intersection_update(wordPostings)
+        if len(words) == 1:
+            return docIds
+        matched = set()
+        for docId in docIds:
+            starts = set(wordsPostings[0][docId])
+            for i, wordPostings in enumerate(wordsPostings[1:]):
+                starts.intersection_update([p - i - 1
+                                            for p in wordPostings[docId]])
+                if not starts:
+                    break
+            if starts:
+                matched.add(docId)
+        return matched
+
+    def score(self, docId, words, liveDocs):
+        """score(docId, words, liveDocs) -> tf-idf of the words in the post"""
+        score = 0.0
+        for word in words:
+            wordPostings = self.postings.get(word, {})
+            if docId in wordPostings:
+                idf = math.log(1.0 + float(liveDocs) / len(wordPostings))
+                score += len(wordPostings[docId]) * idf
+        return score
@@ -0,0 +1,133 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbsearch module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import date
+from hbsearch import *
+
+
+class TokenizeTest(unittest.TestCase):
+    def testWordsAreLowerCaseWithoutEntities(self):
+        self.assertEquals([u'caf\xe9', u'c', u'and', u'uml', u'2', u'0'],
+                          tokenize('Caf&eacute; C++ and UML 2.0'))
+
+    def testLatin1Text(self):
+        self.assertEquals([u'programa\xe7\xe3o'], tokenize('Programa\xe7\xe3o'))
+
+
+class HbIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'index')
+        self.hbf1 = os.path.join(self.dir, 'dummy_hbfile.html')
+        self.hbf2 = os.path.join(self.dir, 'dummy_hbfile2.html')
+        shutil.copy('dummy_hbfile.html', self.hbf1)
+        shutil.copy('dummy_hbfile2.html', self.hbf2)
+        self.index = HbIndex(self.path)
+        self.index.update([self.hbf1, self.hbf2])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def titles(self, query, index = None):
+        return sorted([title for d, title, permaLink, score
+                       in (index or self.index).search(query)])
+
+    def testWordQuery(self):
+        self.assertEquals(['Idiota gets 1 million euros profit',
+                           'Idiota gets 10 million euros profit'],
+                          self.titles('idiota'))
+
+    def testAndQuery(self):
+        self.assertEquals(['Idiota gets 10 million euros profit'],
+                          self.titles('million 10th'))
+
+    def testPhraseQuery(self):
+        self.assertEquals(['ArgoUML release with UML 2.1.1 support'],
+                          self.titles('"UML 2.1.1 support"'))
+        self.assertEquals([], self.titles('"support UML"'))
+
+    def testOrAndNotQueries(self):
+        self.assertEquals(['ArgoUML release with UML 2.0 support',
+                           'Idiota gets 1 million euros profit'],
+                          self.titles('"UML 2.0" OR rollercoaster'))
+        self.assertEquals(['Idiota gets 1 million euros profit'],
+                          self.titles('idiota -10th'))
+        self.assertEquals(['Idiota gets 1 million euros profit'],
+                          self.titles('idiota NOT "10th million"'))
+
+    def testQueryFromAUtf8Terminal(self):
+        from htmled import Post
+        self.index.addPost(Post(date(2010, 3, 1), 'Caf\xe9', '<p>Bica</p>',
+                                'cafe', 'dummy_hbfile.html'))
+        query = decodeQuery('caf\xc3\xa9', 'utf-8')
+        self.assertEquals(u'caf\xe9', query)
+        self.assertEquals(['Caf\xe9'], self.titles(query))
+        self.assertEquals(['Caf\xe9'], self.titles('caf\xe9'))
+
+    def testTagsArentIndexed(self):
+        self.assertEquals([], self.titles('ligacao'))
+        self.assertEquals([], self.titles('href'))
+
+    def testHitsHaveDateAndPermaLink(self):
+        hits = self.index.search('rollercoaster')
+        self.assertEquals(1, len(hits))
+        self.assertEquals(date(2010, 2, 6), hits[0][0])
+        self.assertEquals('http://argonauts-life.blogspot.com/2010/02/' +
+                          'idiota-gets-1-million-euros-profit.html', hits[0][2])
+
+    def testSavedIndexAnswersQueries(self):
+        self.index.save()
+        loaded = HbIndex(self.path)
+        self.assertEquals(self.titles('idiota'), self.titles('idiota', loaded))
+        self.assertEquals([], loaded.update([self.hbf1, self.hbf2]))
+
+    def testUpdateReindexesOnlyChangedFiles(self):
+        text = open(self.hbf2).read().replace('9 million', 'nine million')
+        f = open(self.hbf2, 'w')
+        f.write(text)
+        f.close()
+        mtime = os.path.getmtime(self.hbf2) + 10
+        os.utime(self.hbf2, (mtime, mtime))
+        self.assertEquals([self.hbf2], self.index.update([self.hbf1, self.hbf2]))
+        self.assertEquals(['Idiota gets 10 million euros profit'],
+                          self.titles('nine'))
+        self.assertEquals([], self.titles('"9 million"'))
+
+    def testUpdateDropsRemovedFiles(self):
+        self.index.update([self.hbf1])
+        self.assertEquals(['Idiota gets 1 million euros profit'],
+                          self.titles('idiota'))
+
+    def testSaveCompactsTheDocsOfRemovedFiles(self):
+        self.index.update([self.hbf2])
+        self.assertTrue(None in self.index.docs)
+        self.index.save()
+        loaded = HbIndex(self.path)
+        self.assertFalse(None in loaded.docs)
+        self.assertEquals(len(loaded.files[self.hbf2]['docs']),
+                          len(loaded.docs))
+        self.assertEquals(['Idiota gets 10 million euros profit'],
+                          self.titles('idiota', loaded))
+        self.assertEquals(self.titles('"UML 2.1.1 support"', self.index),
+                          self.titles('"UML 2.1.1 support"', loaded))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Local preview server of the posts, which keeps the handbook files parsed
+# and the rendered pages in memory between requests.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import cgi
+import re
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from itertools import groupby
+from urlparse import urlsplit, parse_qs
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from htmled import AnchorTable, Post, PostExtractor, monthGrouping
+from hbwriter import IndexItemTemplate, PostFileWriter
+
+Host = '127.0.0.1'
+
+MonthPathPattern = re.compile(r'^/(\d{4})/(\d{2})/(?:index\.html)?$')
+
+
+class PreviewSnapshot:
+    """The posts of the handbook files at some point in time, with the pages
+    of the preview rendered on demand and cached.
+
+    The pages follow the layout of the files written by PostFileWriter: the
+    index of the months at '/', the index of a month at '/yyyy/mm/' and the
+    posts at their permalink paths. The links to the blog in the posts are
+    made relative to the preview. '/posts?start=yyyy-mm-dd&end=yyyy-mm-dd'
+    lists the posts of a date range and '/lookup?hbfname=f&anchor=a' (or
+    '/lookup?permalink=url') redirects to the page of a post. The pages
+    without a query are cached. The errors of the handbook files which
+    failed to parse, as 'filename: error' strings, are shown at the top of
+    every page.
+    """
+    def __init__(self, posts, charset = 'iso-8859-1', errors = ()):
+        """PreviewSnapshot(posts[, charset[, errors]]) -> previewSnapshot
+
+        The posts must be ordered by date and have their links adapted.
+        """
+        self.posts = posts
+        self.errors = list(errors)
+        self.dates = [post.date for post in posts]
+        self.anchors = AnchorTable(posts)
+        self.writer = PostFileWriter(None, charset=charset)
+        self.paths = []
+        self.postOfPath = {}
+        uniquePaths = set()
+        for post in posts:
+            path = '/' + self.writer.uniquePath(post.getPermaLinkPath(),
+                                                uniquePaths)
+            self.paths.append(path)
+            self.postOfPath[path] = post
+        self.pages = {}
+
+    def respond(self, url):
+        """respond(url) -> (status, location, page)
+
+        The location is only given for redirections.
+        """
+        if url in self.pages:
+            return 200, None, self.pages[url]
+        path, query = urlsplit(url)[2:4]
+        params = dict([(name, values[-1])
+                       for name, values in parse_qs(query).items()])
+        if path == '/lookup':
+            location = self.lookup(params)
+            if location == None:
+                return 404, None, self.notFound(url)
+            return 302, location, ''
+        if path == '/posts':
+            try:
+                page = self.rangePage(params.get('start'), params.get('end'))
+            except ValueError:
+                return 400, None, 'Bad date range.\n'
+        elif path == '/':
+            page = self.monthsPage()
+        elif path in self.postOfPath:
+            page = self.postPage(self.postOfPath[path])
+        elif MonthPathPattern.match(path):
+            page = self.monthPage(*map(int, MonthPathPattern.match(
+                        path).groups()))
+            if page == None:
+                return 404, None, self.notFound(url)
+        else:
+            return 404, None, self.notFound(url)
+        page = self.withErrors(page)
+        if not query:
+            self.pages[url] = page
+        return 200, None, page
+
+    def withErrors(self, page):
+        if not self.errors:
+            return page
+        notice = '<ul class="errors">\n' + ''.join(
+            ['<li>%s</li>\n' % cgi.escape(error) for error in self.errors]) + \
+            '</ul>\n'
+        return page.replace('<body>\n', '<body>\n' + notice, 1)
+
+    def notFound(self, url):
+        return "'" + cgi.escape(url, True) + "' not found.\n"
+
+    def postPage(self, post):
+        return self.writer.postText(post).replace(Post.BlogURL, '/')
+
+    def monthsPage(self):
+        items = []
+        for (year, month), monthDates in groupby(self.dates,
+                                                 lambda d: (d.year, d.month)):
+            monthDir = '%d/%02d' % (year, month)
+            items.append(IndexItemTemplate % {'date': '', 'title': monthDir,
+                                              'href': '/' + monthDir + '/'})
+        return self.writer.indexText('Posts', items)
+
+    def monthPage(self, year, month):
+        try:
+            first = date(year, month, 1)
+        except ValueError:
+            return None
+        start = bisect_left(self.dates, first)
+        end = bisect_right(self.dates, monthGrouping(first)[1], start)
+        if start == end:
+            return None
+        return self.writer.indexText('%d/%02d' % (year, month),
+                                     self.items(start, end))
+
+    def rangePage(self, start, end):
+        d1 = d2 = None
+        first = 0
+        last = len(self.dates)
+        if start:
+            d1 = parseIsoDate(start)
+            first = bisect_left(self.dates, d1)
+        if end:
+            d2 = parseIsoDate(end)
+            last = bisect_right(self.dates, d2)
+        return self.writer.indexText('Posts from %s to %s' %
+                                     (d1 or '', d2 or ''),
+                                     self.items(first, last))
+
+    def items(self, start, end):
+        return [IndexItemTemplate % {'date': self.posts[i].date,
+                                     'title': self.posts[i].title,
+                                     'href': self.paths[i]}
+                for i in range(start, end)]
+
+    def lookup(self, params):
+        """lookup(params) -> path of the post, or None if not found"""
+        if 'permalink' in params:
+            path = '/' + params['permalink'][len(Post.BlogURL):]
+            if params['permalink'].startswith(Post.BlogURL) and \
+                    path in self.postOfPath:
+                return path
+            return None
+        if 'hbfname' not in params or 'anchor' not in params:
+            return None
+        target = self.anchors.resolve(params['hbfname'], params['anchor'])
+        if target == None:
+            return None
+        permaLink, keepAnchor = target
+        location = '/' + permaLink[len(Post.BlogURL):]
+        if keepAnchor:
+            location += '#' + params['anchor']
+        return location
+
+
+def parseIsoDate(strIsoDate):
+    return datetime.strptime(strIsoDate, '%Y-%m-%d').date()
+
+
+class PreviewState:
+    """The warm state of the preview: the parsed handbook files and the
+    snapshot of their posts, which is rebuilt only when a file changes.
+    A file which fails to parse, e.g., while it is being edited, keeps its
+    previous posts, and its error is shown in the pages until it parses."""
+    def __init__(self, hbfiles, charset = 'iso-8859-1'):
+        """PreviewState(hbfiles[, charset]) -> previewState
+
+        hbfiles is an hb2post.WarmHbFiles, or any object with its hbfs
+        attribute and refresh method.
+        """
+        self.hbfiles = hbfiles
+        self.charset = charset
+        self.lock = threading.Lock()
+        self.errors = {}
+        self.current = self.buildSnapshot()
+
+    def buildSnapshot(self):
+        return PreviewSnapshot(PostExtractor(*self.hbfiles.hbfs).extractPosts(),
+                               self.charset, self.errorMessages())
+
+    def errorMessages(self):
+        return [fn + ': ' + self.errors[fn] for fn in sorted(self.errors)]
+
+    def snapshot(self):
+        """snapshot() -> the PreviewSnapshot of the current handbook files"""
+        self.lock.acquire()
+        try:
+            errors = []
+            reparsed = self.hbfiles.refresh(errors)
+            previousErrors = dict(self.errors)
+            for fn in reparsed:
+                self.errors.pop(fn, None)
+            for fn, error in errors:
+                self.errors[fn] = str(error)
+            if reparsed:
+                self.current = self.buildSnapshot()
+            elif self.errors != previousErrors:
+                self.current = PreviewSnapshot(self.current.posts,
+                                               self.charset,
+                                               self.errorMessages())
+            return self.current
+        finally:
+            self.lock.release()
+
+
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, location, page = self.server.state.snapshot().respond(self.path)
+        self.send_response(status)
+        if location != None:
+            self.send_header('Location', location)
+        self.send_header('Content-Type', 'text/html; charset=' +
+                         self.server.state.charset)
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+
+class PreviewServer(ThreadingMixIn, HTTPServer):
+    """A threaded HTTP server of the preview, bound to localhost only."""
+    daemon_threads = True
+
+    def __init__(self, state, port = 8042):
+        HTTPServer.__init__(self, (Host, port), PreviewRequestHandler)
+        self.state = state
+
+
+def serve(options):
+    from hb2post import WarmHbFiles
+    state = PreviewState(WarmHbFiles(options.hbfilenames(),
+                                     options.processes(),
+                                     options.tolerant()),
+                         options.encoding())
+    server = PreviewServer(state, options.port())
+    print >> sys.stderr, 'Serving the preview at http://%s:%d/' % \
+        server.server_address
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
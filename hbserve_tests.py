@@ -0,0 +1,163 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbserve module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib2
+from hbserve import *
+from hb2post import WarmHbFiles
+
+
+class PreviewTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filenames = []
+        for name in ['dummy_hbfile.html', 'dummy_hbfile2.html']:
+            path = os.path.join(self.dir, name)
+            shutil.copy(name, path)
+            self.filenames.append(path)
+        self.hbfiles = WarmHbFiles(self.filenames)
+        self.state = PreviewState(self.hbfiles)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def respond(self, url):
+        return self.state.snapshot().respond(url)
+
+    def postPath(self, subjname):
+        snapshot = self.state.snapshot()
+        for post, path in zip(snapshot.posts, snapshot.paths):
+            if post.subjname == subjname:
+                return path
+
+    def testMonthsPage(self):
+        status, location, page = self.respond('/')
+        self.assertEquals(200, status)
+        self.assertTrue('href="/2010/02/"' in page)
+        self.assertTrue('href="/2011/02/"' in page)
+
+    def testMonthPage(self):
+        status, location, page = self.respond('/2010/02/')
+        self.assertEquals(200, status)
+        self.assertTrue('Idiota gets 1 million euros profit' in page)
+        self.assertFalse('Idiota gets 10 million euros profit' in page)
+        self.assertEquals(404, self.respond('/2003/02/')[0])
+        self.assertEquals(404, self.respond('/2010/13/')[0])
+
+    def testPostPageWithLinksToThePreview(self):
+        path = self.postPath('idiota_10th_mil')
+        status, location, page = self.respond(path)
+        self.assertEquals(200, status)
+        self.assertTrue('href="' + self.postPath('idiota_1st_mil') + '"' in page)
+        self.assertFalse(Post.BlogURL + '2010' in page)
+
+    def testPagesAreCached(self):
+        snapshot = self.state.snapshot()
+        page = snapshot.respond('/')[2]
+        self.assertTrue(page is snapshot.respond('/')[2])
+
+    def testRangePage(self):
+        status, location, page = self.respond(
+            '/posts?start=2011-02-06&end=2011-02-06')
+        self.assertEquals(200, status)
+        self.assertEquals(2, page.count('<li>'))
+        self.assertEquals(400, self.respond('/posts?start=yesterday')[0])
+
+    def testLookupAnchor(self):
+        status, location, page = self.respond(
+            '/lookup?hbfname=dummy_hbfile.html&anchor=idiota_1st_mil')
+        self.assertEquals(302, status)
+        self.assertEquals(self.postPath('idiota_1st_mil'), location)
+        self.assertEquals(404, self.respond(
+                '/lookup?hbfname=dummy_hbfile.html&anchor=none')[0])
+
+    def testLookupPermaLink(self):
+        path = self.postPath('idiota_1st_mil')
+        status, location, page = self.respond('/lookup?permalink=' +
+                                              Post.BlogURL + path[1:])
+        self.assertEquals(302, status)
+        self.assertEquals(path, location)
+
+    def testNotFound(self):
+        self.assertEquals(404, self.respond('/none.html')[0])
+
+    def testNotFoundPathIsEscaped(self):
+        status, location, page = self.respond('/<script>"x".html')
+        self.assertEquals(404, status)
+        self.assertFalse('<script>' in page)
+        self.assertTrue('&lt;script&gt;&quot;x&quot;.html' in page)
+
+    def testFileWhichFailsToParseKeepsItsPostsAndShowsTheError(self):
+        snapshot = self.state.snapshot()
+        f = open(self.filenames[0], 'ab')
+        f.write('<h2><a name="2010-99-99">2010-99-99</a></h2>\n')
+        f.close()
+        mtime = os.path.getmtime(self.filenames[0]) + 10
+        os.utime(self.filenames[0], (mtime, mtime))
+        status, location, page = self.respond('/')
+        self.assertEquals(200, status)
+        self.assertTrue('href="/2010/02/"' in page)
+        self.assertTrue('<ul class="errors">\n<li>' + self.filenames[0] +
+                        ": invalid date '2010-99-99'" in page)
+        self.assertEquals(snapshot.posts, self.state.snapshot().posts)
+        self.assertTrue('2010-99-99' in self.respond('/2010/02/')[2])
+        f = open(self.filenames[0], 'wb')
+        f.write(open('dummy_hbfile.html').read())
+        f.close()
+        os.utime(self.filenames[0], (mtime + 10, mtime + 10))
+        self.assertFalse('class="errors"' in self.respond('/')[2])
+
+    def testOnlyChangedFilesAreReparsed(self):
+        snapshot = self.state.snapshot()
+        self.assertTrue(snapshot is self.state.snapshot())
+        hbf2 = self.hbfiles.hbfs[1]
+        f = open(self.filenames[0], 'ab')
+        f.write('\n')
+        f.close()
+        self.assertEquals([self.filenames[0]], self.hbfiles.refresh())
+        self.assertTrue(hbf2 is self.hbfiles.hbfs[1])
+        self.assertEquals([], self.hbfiles.refresh())
+
+    def testChangedFileRebuildsSnapshot(self):
+        snapshot = self.state.snapshot()
+        f = open(self.filenames[1], 'ab')
+        f.write('\n')
+        f.close()
+        self.assertFalse(snapshot is self.state.snapshot())
+
+    def testServerBoundToLocalhost(self):
+        server = PreviewServer(self.state, 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            host, port = server.server_address
+            self.assertEquals('127.0.0.1', host)
+            response = urllib2.urlopen('http://127.0.0.1:%d/2010/02/' % port)
+            self.assertEquals(200, response.getcode())
+            self.assertTrue('Idiota gets 1 million euros profit' in
+                            response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
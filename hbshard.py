@@ -0,0 +1,286 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Sharded extraction of posts: split handbook files into shards at the daily
+# entries, extract the posts of each shard independently (e.g., in different
+# machines) and merge the partial results.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import glob
+import json
+import os
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import date
+from optparse import OptionParser
+from StringIO import StringIO
+
+DailyEntryBoundaryPattern = re.compile(r'<!--.*?-->|<h2[\s>]',
+                                       re.IGNORECASE | re.DOTALL)
+
+# Ends the last subject entry of a shard where the next daily entry would.
+ShardEnd = '<h2>'
+
+ShardHeaderPattern = re.compile(
+    r'<!-- hb2posts shard hbfname="(?P<hbfname>[^"]*)" ' +
+    r'file="(?P<file>\d+)" shard="(?P<shard>\d+)" -->\n')
+
+ShardFilePattern = 'shard-*.html'
+
+ResultSuffix = '.result.json'
+
+# JSON strings are unicode, and latin-1 decodes any bytes without loss.
+ShardEncoding = 'latin-1'
+
+
+def dailyEntriesStarts(text):
+    """dailyEntriesStarts(text) -> [start1, start2, ...]
+
+    The offsets of the <h2> tags starting the daily entries, skipping the ones
+    in comments.
+    """
+    return [match.start() for match in DailyEntryBoundaryPattern.finditer(text)
+            if not match.group().startswith('<!--')]
+
+def splitHbText(text, n):
+    """splitHbText(text, n) -> [shardText1, shardText2, ...]
+
+    Split the text of a handbook file in at most n shards of contiguous daily
+    entries with about the same size. The first shard also has what comes
+    before the first daily entry and the last one what comes after the last.
+    """
+    starts = dailyEntriesStarts(text)
+    if n <= 1 or len(starts) <= 1:
+        return [text]
+    candidates = starts[1:]
+    cuts = [0]
+    for k in range(1, n):
+        target = k * len(text) / n
+        first = bisect_right(candidates, cuts[-1])
+        nearestIndex = max(bisect_left(candidates, target), first)
+        nearest = candidates[max(nearestIndex - 1, first): nearestIndex + 1]
+        if nearest:
+            cuts.append(min(nearest, key=lambda c: abs(c - target)))
+    cuts.append(len(text))
+    return [text[cuts[i]: cuts[i + 1]] for i in range(len(cuts) - 1)]
+
+def writeShards(filenames, n, shardDir, openFile):
+    """writeShards(filenames, n, shardDir, openFile) -> shardPaths
+
+    Split each handbook file in up to n shards, writing each shard to a
+    self-contained HTML file in shardDir, with a header comment with the
+    handbook file name and the file and shard indexes. The shards of a
+    previous split in shardDir, and their results, are removed.
+    """
+    from htmled import getHbFileName
+    for path in shardsInDir(shardDir):
+        for oldPath in (path, path + ResultSuffix):
+            if os.path.exists(oldPath):
+                os.remove(oldPath)
+    paths = []
+    for fileIndex, filename in enumerate(filenames):
+        f = openFile(filename)
+        try:
+            text = f.read()
+            hbfname = getHbFileName(f.name)
+        finally:
+            f.close()
+        shards = splitHbText(text, n)
+        for shardIndex, shardText in enumerate(shards):
+            if shardIndex < len(shards) - 1:
+                shardText += ShardEnd
+            path = os.path.join(shardDir, 'shard-%03d-%03d.html' %
+                                (fileIndex, shardIndex))
+            out = open(path, 'wb')
+            try:
+                out.write('<!-- hb2posts shard hbfname="%s" file="%d" '
+                          'shard="%d" -->\n' % (hbfname, fileIndex, shardIndex))
+                out.write(shardText)
+            finally:
+                out.close()
+            paths.append(path)
+    return paths
+
+def extractShard(shardPath, resultPath = None):
+    """extractShard(shardPath[, resultPath]) -> resultPath
+
+    Parse a shard and write its partial result: its posts, without adapted
+    links, and the anchors of each post, in the order of the shard.
+    """
+    from htmled import HbFile, PostExtractor, AnchorTable
+    f = open(shardPath, 'rb')
+    try:
+        text = f.read()
+    finally:
+        f.close()
+    header = ShardHeaderPattern.match(text)
+    if not header:
+        raise ValueError("'" + shardPath + "' isn't a handbook file shard.")
+    source = StringIO(text)
+    source.name = header.group('hbfname')
+    hbf = HbFile(source)
+    posts = []
+    for post in PostExtractor(hbf).buildPosts():
+        posts.append([post.date.toordinal(), decode(post.title),
+                      decode(post.contents), decode(post.subjname),
+                      [[decode(anchor), keepAnchor] for anchor, keepAnchor
+                       in AnchorTable.postAnchors(post)]])
+    result = {'hbfname': decode(header.group('hbfname')),
+              'file': int(header.group('file')),
+              'shard': int(header.group('shard')), 'posts': posts}
+    if resultPath == None:
+        resultPath = shardPath + ResultSuffix
+    out = open(resultPath, 'wb')
+    try:
+        json.dump(result, out)
+    finally:
+        out.close()
+    return resultPath
+
+def decode(s):
+    if s == None:
+        return None
+    return s.decode(ShardEncoding)
+
+def encode(s):
+    if s == None:
+        return None
+    return s.encode(ShardEncoding)
+
+def mergeResults(resultPaths):
+    """mergeResults(resultPaths) -> posts
+
+    Merge the partial results of the shards in the same posts, in the same
+    order, that PostExtractor.extractPosts gets from the whole handbook files:
+    the posts are ordered by date, file and position in the file, and their
+    links are adapted with the anchors of all the shards.
+    """
+    from htmled import AnchorTable, Post, PostExtractor
+    entries = []
+    for resultPath in resultPaths:
+        f = open(resultPath, 'rb')
+        try:
+            result = json.load(f)
+        finally:
+            f.close()
+        hbfname = encode(result['hbfname'])
+        for i, (ordinal, title, contents, subjname, anchors) in \
+                enumerate(result['posts']):
+            post = Post(date.fromordinal(ordinal), encode(title),
+                        encode(contents), encode(subjname), hbfname)
+            entries.append(((ordinal, result['file'], result['shard'], i),
+                            post, [(encode(anchor), keepAnchor)
+                                   for anchor, keepAnchor in anchors]))
+    entries.sort(key=lambda entry: entry[0])
+    anchors = AnchorTable()
+    for key, post, postAnchors in entries:
+        anchors.addAnchors(post.hbfname, post.getPermaLink(), postAnchors)
+    posts = [post for key, post, postAnchors in entries]
+    pe = PostExtractor()
+    for post in posts:
+        pe.adaptPostLinks(anchors, post)
+    return posts
+
+def runShards(shardPaths, extractCommand = None):
+    """runShards(shardPaths[, extractCommand]) -> resultPaths
+
+    Run the extraction of each shard in a separate local process, all at
+    the same time, as they would run in different machines.
+    """
+    import subprocess
+    if extractCommand == None:
+        extractCommand = [sys.executable, os.path.abspath(__file__), 'extract']
+    processes = [subprocess.Popen(extractCommand + [shardPath])
+                 for shardPath in shardPaths]
+    for shardPath, process in zip(shardPaths, processes):
+        if process.wait() != 0:
+            raise RuntimeError("The extraction of '" + shardPath + "' failed.")
+    return [shardPath + ResultSuffix for shardPath in shardPaths]
+
+def shardsInDir(shardDir):
+    """shardsInDir(shardDir) -> sorted paths of the shards in shardDir"""
+    return sorted(glob.glob(os.path.join(shardDir, ShardFilePattern)))
+
+def resultsOfShards(shardPaths):
+    """resultsOfShards(shardPaths) -> resultPaths
+
+    The results of the shards, which must have been extracted after the
+    shards were written, lest a stale result of a previous split is merged.
+    """
+    resultPaths = []
+    for shardPath in shardPaths:
+        resultPath = shardPath + ResultSuffix
+        if not os.path.exists(resultPath) or \
+                os.path.getmtime(resultPath) < os.path.getmtime(shardPath):
+            raise ValueError("'" + shardPath + "' wasn't extracted.")
+        resultPaths.append(resultPath)
+    return resultPaths
+
+
+def main(args = sys.argv[1:]):
+    parser = OptionParser(usage='%prog split [-n N] -d DIR HBFILE...\n' +
+                          '       %prog extract SHARD...\n' +
+                          '       %prog merge [-s DATE] [-e DATE] -d DIR\n' +
+                          '       %prog local [-n N] -d DIR HBFILE...')
+    parser.add_option('-n', '--shards', type='int', default=4,
+                      help='the number of shards per handbook file [default: %default]')
+    parser.add_option('-d', '--dir', default='.',
+                      help='the directory of the shards and their results')
+    parser.add_option('-s', '--startdate', default=None,
+                      help='the start date of the merged posts, inclusive')
+    parser.add_option('-e', '--enddate', default=None,
+                      help='the end date of the merged posts, inclusive')
+    (options, args) = parser.parse_args(args)
+    if not args:
+        parser.error('a command is required')
+    command = args[0]
+    if command == 'split':
+        from hbsources import openHbSource
+        for path in writeShards(args[1:], options.shards, options.dir,
+                                openHbSource):
+            print path
+    elif command == 'extract':
+        for shardPath in args[1:]:
+            extractShard(shardPath)
+    elif command in ('merge', 'local'):
+        if command == 'local':
+            from hbsources import openHbSource
+            resultPaths = runShards(writeShards(args[1:], options.shards,
+                                                options.dir, openHbSource))
+        else:
+            try:
+                resultPaths = resultsOfShards(shardsInDir(options.dir))
+            except ValueError, e:
+                parser.error(str(e))
+        from hb2post import writeTextPosts
+        from htmled import PostExtractor
+        posts = mergeResults(resultPaths)
+        d1 = d2 = None
+        if options.startdate:
+            d1 = parseIsoDate(options.startdate)
+        if options.enddate:
+            d2 = parseIsoDate(options.enddate)
+        posts = PostExtractor().postsInRange(posts, [p.date for p in posts],
+                                             d1, d2)
+        writeTextPosts(posts, sys.stdout)
+    else:
+        parser.error("unknown command '" + command + "'")
+
+def parseIsoDate(strIsoDate):
+    from datetime import datetime
+    return datetime.strptime(strIsoDate, '%Y-%m-%d').date()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbshard module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+import os
+import shutil
+import tempfile
+from hbshard import *
+from hbsources import openHbSource
+from htmled import HbFile, PostExtractor
+
+
+class SplitHbTextTest(unittest.TestCase):
+    def setUp(self):
+        self.text = open('dummy_hbfile.html').read()
+
+    def testDailyEntriesStartsSkipComments(self):
+        starts = dailyEntriesStarts(self.text)
+        self.assertEquals(3, len(starts))
+        for start in starts:
+            self.assertEquals('<h2><a name="20', self.text[start: start + 15])
+
+    def testSplitKeepsAllTheText(self):
+        for n in range(1, 5):
+            shards = splitHbText(self.text, n)
+            self.assertEquals(self.text, ''.join(shards))
+            self.assertTrue(len(shards) <= n)
+        shards = splitHbText(self.text, 3)
+        self.assertEquals(3, len(shards))
+        self.assertTrue(shards[1].startswith('<h2>'))
+        self.assertTrue(shards[2].startswith('<h2>'))
+
+
+class ShardedExtractionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.files = ['dummy_hbfile.html', 'dummy_hbfile2.html']
+        f1 = open(self.files[0])
+        f2 = open(self.files[1])
+        self.expected = [str(post) for post in
+                         PostExtractor(HbFile(f1), HbFile(f2)).getPosts()]
+        f1.close()
+        f2.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testMergedShardsAreTheExtractedPosts(self):
+        for n in (1, 2, 3):
+            shardDir = os.path.join(self.dir, str(n))
+            os.mkdir(shardDir)
+            shardPaths = writeShards(self.files, n, shardDir, openHbSource)
+            resultPaths = [extractShard(path) for path in shardPaths]
+            self.assertEquals(self.expected,
+                              [str(post) for post in mergeResults(resultPaths)])
+
+    def testShardsRunInSeparateProcesses(self):
+        shardPaths = writeShards(self.files, 3, self.dir, openHbSource)
+        self.assertEquals(6, len(shardPaths))
+        resultPaths = runShards(shardPaths)
+        self.assertEquals(self.expected,
+                          [str(post) for post in mergeResults(resultPaths)])
+
+    def testSplitRemovesThePreviousShardsAndResults(self):
+        shardPaths = writeShards(self.files, 3, self.dir, openHbSource)
+        for path in shardPaths:
+            extractShard(path)
+        shardPaths = writeShards(self.files, 1, self.dir, openHbSource)
+        self.assertEquals(shardPaths, shardsInDir(self.dir))
+        self.assertRaises(ValueError, resultsOfShards, shardPaths)
+        for path in shardPaths:
+            extractShard(path)
+        self.assertEquals(self.expected,
+                          [str(post) for post in
+                           mergeResults(resultsOfShards(shardPaths))])
+
+    def testNotAShard(self):
+        self.assertRaises(ValueError, extractShard, self.files[0],
+                          os.path.join(self.dir, 'result.json'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Handbook file sources: plain, compressed and archived handbook files.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+class HbSource:
+    """A readable handbook file.
+
+    Its name is the logical handbook file name, i.e., the name the file would
+    have if it was neither compressed nor a member of an archive, so that
+    HbFile.getFileName and the links between handbook files keep working.
+    """
+    def __init__(self, name, f, container = None):
+        """HbSource(name, f[, container]) -> hbSource
+
+        Wraps the file like object f, which is closed together with the
+        optional container (e.g., the archive f is a member of).
+        """
+        self.name = name
+        self.f = f
+        self.container = container
+        self.closed = False
+
+    def read(self, size = None):
+        if size == None:
+            return self.f.read()
+        return self.f.read(size)
+
+    def close(self):
+        if self.closed:
+            return
+        self.f.close()
+        if self.container != None:
+            self.container.close()
+        self.closed = True
+
+
+ArchiveMemberSeparator = '!'
+
+def openGzipFile(path):
+    import gzip
+    return gzip.open(path, 'rb')
+
+def openXzFile(path):
+    if lzma == None:
+        raise IOError("Reading '" + path + "' requires the lzma module.")
+    return lzma.LZMAFile(path, 'rb')
+
+CompressedFileOpeners = [('.gz', openGzipFile), ('.xz', openXzFile)]
+
+def openZipMember(path, member):
+    import zipfile
+    archive = zipfile.ZipFile(path)
+    try:
+        return archive.open(member), archive
+    except KeyError:
+        archive.close()
+        raise IOError("No member '" + member + "' in archive '" + path + "'")
+
+def openTarMember(path, member):
+    import tarfile
+    archive = tarfile.open(path)
+    try:
+        return archive.extractfile(member), archive
+    except KeyError:
+        archive.close()
+        raise IOError("No member '" + member + "' in archive '" + path + "'")
+
+ArchiveOpeners = [('.zip', openZipMember), ('.tar', openTarMember),
+                  ('.tar.gz', openTarMember), ('.tgz', openTarMember),
+                  ('.tar.bz2', openTarMember)]
+
+def registerCompressedFileOpener(suffix, opener):
+    """registerCompressedFileOpener(suffix, opener)
+
+    Register opener, a function of a path that returns a file like object
+    with the decompressed contents, for the files ending with suffix.
+    """
+    CompressedFileOpeners.insert(0, (suffix, opener))
+
+def registerArchiveOpener(suffix, opener):
+    """registerArchiveOpener(suffix, opener)
+
+    Register opener, a function of the archive path and member name that
+    returns the tuple (memberFile, archive), for archives ending with suffix.
+    """
+    ArchiveOpeners.insert(0, (suffix, opener))
+
+def compressedFileOpener(path):
+    for suffix, opener in CompressedFileOpeners:
+        if path.endswith(suffix):
+            return suffix, opener
+    return None, None
+
+def openHbSource(path):
+    """openHbSource(path) -> hbSource
+
+    Open the handbook file in path, decompressing it while it is read. The
+    path may be:
+    - a plain handbook file, e.g., 'ficheiro02.html';
+    - a compressed handbook file, e.g., 'ficheiro02.html.gz', whose logical
+      name is 'ficheiro02.html';
+    - a member of an archive, e.g., '2009.zip!ficheiro02.html', whose logical
+      name is the member name;
+    - a plain handbook file name for which only a compressed file exists,
+      e.g., 'ficheiro02.html' when only 'ficheiro02.html.xz' exists.
+    """
+    if ArchiveMemberSeparator in path:
+        archivePath, member = path.split(ArchiveMemberSeparator, 1)
+        for suffix, opener in ArchiveOpeners:
+            if archivePath.endswith(suffix):
+                f, archive = opener(archivePath, member)
+                return HbSource(member, f, archive)
+        raise IOError("Unknown archive type of '" + archivePath + "'")
+    suffix, opener = compressedFileOpener(path)
+    if opener != None:
+        return HbSource(path[:-len(suffix)], opener(path))
+    if not os.path.exists(path):
+        for suffix, opener in CompressedFileOpeners:
+            if os.path.exists(path + suffix):
+                return HbSource(path, opener(path + suffix))
+    return HbSource(path, open(path))
+
+def sourceFingerprint(path):
+    """sourceFingerprint(path) -> (size, mtime)
+
+    The size and modification time of the file from where the handbook file
+    in path is read (see openHbSource), which change when it changes.
+    """
+    if ArchiveMemberSeparator in path:
+        path = path.split(ArchiveMemberSeparator, 1)[0]
+    elif not os.path.exists(path) and compressedFileOpener(path)[1] == None:
+        for suffix, opener in CompressedFileOpeners:
+            if os.path.exists(path + suffix):
+                path = path + suffix
+                break
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime)
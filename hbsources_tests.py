@@ -0,0 +1,119 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbsources module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+import gzip
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from hbsources import *
+from htmled import HbFile
+
+
+class OpenHbSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.contents = open('dummy_hbfile.html').read()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def writeGzip(self, name):
+        f = gzip.open(self.path(name), 'wb')
+        f.write(self.contents)
+        f.close()
+
+    def assertHbFileFromSource(self, path, expectedFileName):
+        f = openHbSource(path)
+        hbf = HbFile(f)
+        f.close()
+        self.assertTrue(f.closed)
+        self.assertEquals(expectedFileName, hbf.getFileName())
+        self.assertEquals(3, len(hbf.dailyEntries))
+
+    def testPlainFile(self):
+        self.assertHbFileFromSource('dummy_hbfile.html', 'dummy_hbfile.html')
+
+    def testGzipFile(self):
+        self.writeGzip('ficheiro02.html.gz')
+        self.assertHbFileFromSource(self.path('ficheiro02.html.gz'),
+                                    'ficheiro02.html')
+
+    def testCompressedFileFoundFromPlainName(self):
+        self.writeGzip('ficheiro03.html.gz')
+        self.assertHbFileFromSource(self.path('ficheiro03.html'),
+                                    'ficheiro03.html')
+
+    @unittest.skipIf(lzma == None, 'lzma module not available')
+    def testXzFile(self):
+        f = lzma.LZMAFile(self.path('ficheiro04.html.xz'), 'wb')
+        f.write(self.contents)
+        f.close()
+        self.assertHbFileFromSource(self.path('ficheiro04.html.xz'),
+                                    'ficheiro04.html')
+
+    def testZipMember(self):
+        archive = zipfile.ZipFile(self.path('2009.zip'), 'w',
+                                  zipfile.ZIP_DEFLATED)
+        archive.writestr('ficheiro05.html', self.contents)
+        archive.close()
+        self.assertHbFileFromSource(self.path('2009.zip') + '!ficheiro05.html',
+                                    'ficheiro05.html')
+
+    def testTarMember(self):
+        archive = tarfile.open(self.path('2008.tar.gz'), 'w:gz')
+        archive.add('dummy_hbfile.html', 'programacao/ficheiro06.html')
+        archive.close()
+        self.assertHbFileFromSource(self.path('2008.tar.gz') +
+                                    '!programacao/ficheiro06.html',
+                                    'ficheiro06.html')
+
+    def testMissingArchiveMember(self):
+        archive = zipfile.ZipFile(self.path('2007.zip'), 'w')
+        archive.writestr('ficheiro01.html', self.contents)
+        archive.close()
+        self.assertRaises(IOError, openHbSource,
+                          self.path('2007.zip') + '!ficheiro02.html')
+
+    def testNonExistingFile(self):
+        self.assertRaises(IOError, openHbSource, self.path('none.html'))
+
+    def testSourceFingerprint(self):
+        self.writeGzip('ficheiro08.html.gz')
+        path = self.path('ficheiro08.html.gz')
+        fingerprint = (os.path.getsize(path), os.path.getmtime(path))
+        self.assertEquals(fingerprint, sourceFingerprint(path))
+        self.assertEquals(fingerprint,
+                          sourceFingerprint(self.path('ficheiro08.html')))
+        self.assertRaises(OSError, sourceFingerprint, self.path('none.html'))
+
+    def testRegisteredCompressedFileOpener(self):
+        self.writeGzip('ficheiro07.html.z9')
+        registerCompressedFileOpener('.z9', lambda path: gzip.open(path, 'rb'))
+        try:
+            self.assertHbFileFromSource(self.path('ficheiro07.html.z9'),
+                                        'ficheiro07.html')
+        finally:
+            del CompressedFileOpeners[0]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,340 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# SQLite store of the handbook files entries, posts and links.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import sqlite3
+from datetime import date
+from htmled import Post, PostExtractor
+
+Schema = '''
+CREATE TABLE IF NOT EXISTS hbfiles (
+    id INTEGER PRIMARY KEY,
+    hbfname TEXT NOT NULL,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    seq INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS daily_entries (
+    id INTEGER PRIMARY KEY,
+    hbfile_id INTEGER NOT NULL REFERENCES hbfiles(id),
+    date TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS subject_entries (
+    id INTEGER PRIMARY KEY,
+    daily_entry_id INTEGER NOT NULL REFERENCES daily_entries(id),
+    subjname TEXT,
+    title TEXT,
+    contents TEXT);
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    hbfile_id INTEGER NOT NULL REFERENCES hbfiles(id),
+    subject_entry_id INTEGER NOT NULL REFERENCES subject_entries(id),
+    seq INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    title TEXT,
+    subjname TEXT,
+    hbfname TEXT,
+    permalink TEXT,
+    contents TEXT);
+CREATE TABLE IF NOT EXISTS anchors (
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    hbfname TEXT NOT NULL,
+    anchor TEXT NOT NULL,
+    kind INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS links (
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    href TEXT NOT NULL,
+    target_post_id INTEGER REFERENCES posts(id),
+    keep_anchor INTEGER);
+CREATE INDEX IF NOT EXISTS daily_entries_date ON daily_entries(date);
+CREATE INDEX IF NOT EXISTS daily_entries_hbfile ON daily_entries(hbfile_id);
+CREATE INDEX IF NOT EXISTS subject_entries_subjname ON subject_entries(subjname);
+CREATE INDEX IF NOT EXISTS subject_entries_daily_entry
+    ON subject_entries(daily_entry_id);
+CREATE INDEX IF NOT EXISTS posts_date ON posts(date);
+CREATE INDEX IF NOT EXISTS posts_hbfname ON posts(hbfname);
+CREATE INDEX IF NOT EXISTS posts_subjname ON posts(subjname);
+CREATE INDEX IF NOT EXISTS posts_hbfile ON posts(hbfile_id);
+CREATE INDEX IF NOT EXISTS anchors_anchor ON anchors(hbfname, anchor);
+CREATE INDEX IF NOT EXISTS anchors_post ON anchors(post_id);
+CREATE INDEX IF NOT EXISTS links_post ON links(post_id);
+CREATE INDEX IF NOT EXISTS links_target ON links(target_post_id);
+'''
+
+# Stores of another version are rebuilt, see PostStore.
+SchemaVersion = 2
+
+Tables = ['hbfiles', 'daily_entries', 'subject_entries', 'posts', 'anchors',
+          'links']
+
+# anchors.kind: the subject entry name or a name within the post contents;
+# blogLinkFromHbfLink checks the subject entry name of a post first.
+SubjectAnchor = 0
+NameAnchor = 1
+
+PostOrder = 'p.date, f.seq, p.seq'
+
+
+class PostStore:
+    """Stores the daily entries, subject entries, posts, anchors and resolved
+    links of handbook files in a SQLite database.
+
+    Each handbook file is stored with batched inserts in a transaction of its
+    own, replacing what was previously stored for it. The files are keyed by
+    their path, since files of different handbooks may have the same name.
+    A store of another SchemaVersion is emptied, to be stored again.
+    """
+    def __init__(self, path = ':memory:'):
+        self.connection = sqlite3.connect(path)
+        self.connection.text_factory = str
+        c = self.connection
+        if c.execute('PRAGMA user_version').fetchone()[0] != SchemaVersion:
+            with c:
+                for table in Tables:
+                    c.execute('DROP TABLE IF EXISTS ' + table)
+            c.execute('PRAGMA user_version = %d' % SchemaVersion)
+        c.executescript(Schema)
+
+    def close(self):
+        self.connection.close()
+
+    def fileFingerprint(self, path):
+        """fileFingerprint(path) -> (size, mtime) or None if not stored"""
+        row = self.connection.execute(
+            'SELECT size, mtime FROM hbfiles WHERE path = ?',
+            (path,)).fetchone()
+        if row == None:
+            return None
+        return tuple(row)
+
+    def storeHbFile(self, hbf, path = None, fingerprint = (None, None)):
+        """storeHbFile(hbf[, path[, fingerprint]])
+
+        Store the entries and posts of the HbFile hbf, replacing the ones
+        previously stored for the file with the same path, which defaults to
+        the name of the file. The links aren't resolved, see resolveLinks.
+        """
+        hbfname = hbf.getFileName()
+        if path == None:
+            path = hbfname
+        posts = PostExtractor(hbf).buildPosts()
+        c = self.connection
+        with c:
+            row = c.execute('SELECT id, seq FROM hbfiles WHERE path = ?',
+                            (path,)).fetchone()
+            if row == None:
+                seq = c.execute('SELECT COALESCE(MAX(seq) + 1, 0) FROM hbfiles'
+                                ).fetchone()[0]
+            else:
+                seq = row[1]
+                self.deleteHbFile(row[0])
+            fileId = c.execute(
+                'INSERT INTO hbfiles (hbfname, path, size, mtime, seq) ' +
+                'VALUES (?, ?, ?, ?, ?)',
+                (hbfname, path, fingerprint[0], fingerprint[1], seq)).lastrowid
+            deId = self.nextId('daily_entries')
+            seId = self.nextId('subject_entries')
+            postId = self.nextId('posts')
+            dailyEntries = []
+            subjectEntries = []
+            postRows = []
+            anchors = []
+            postsOfEntries = iter(posts)
+            for de in hbf.dailyEntries:
+                dailyEntries.append((deId, fileId, de.date.isoformat()))
+                for subj in de.subjects:
+                    post = postsOfEntries.next()
+                    subjectEntries.append((seId, deId, subj.name, subj.title,
+                                           subj.contents))
+                    postRows.append((postId, fileId, seId, len(postRows),
+                                     post.date.isoformat(), post.title,
+                                     post.subjname, hbfname,
+                                     post.getPermaLink(), post.contents))
+                    anchors.append((postId, hbfname, post.subjname,
+                                    SubjectAnchor))
+                    for name in post.names:
+                        anchors.append((postId, hbfname, name, NameAnchor))
+                    seId += 1
+                    postId += 1
+                deId += 1
+            c.executemany('INSERT INTO daily_entries VALUES (?, ?, ?)',
+                          dailyEntries)
+            c.executemany('INSERT INTO subject_entries VALUES (?, ?, ?, ?, ?)',
+                          subjectEntries)
+            c.executemany('INSERT INTO posts VALUES ' +
+                          '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', postRows)
+            c.executemany('INSERT INTO anchors VALUES (?, ?, ?, ?)', anchors)
+
+    def nextId(self, table):
+        return self.connection.execute(
+            'SELECT COALESCE(MAX(id) + 1, 1) FROM ' + table).fetchone()[0]
+
+    def deleteHbFile(self, fileId):
+        c = self.connection
+        postsOfFile = 'SELECT id FROM posts WHERE hbfile_id = ?'
+        c.execute('DELETE FROM links WHERE post_id IN (' + postsOfFile + ')',
+                  (fileId,))
+        c.execute('UPDATE links SET target_post_id = NULL, keep_anchor = NULL ' +
+                  'WHERE target_post_id IN (' + postsOfFile + ')', (fileId,))
+        c.execute('DELETE FROM anchors WHERE post_id IN (' + postsOfFile + ')',
+                  (fileId,))
+        c.execute('DELETE FROM posts WHERE hbfile_id = ?', (fileId,))
+        c.execute('DELETE FROM subject_entries WHERE daily_entry_id IN ' +
+                  '(SELECT id FROM daily_entries WHERE hbfile_id = ?)',
+                  (fileId,))
+        c.execute('DELETE FROM daily_entries WHERE hbfile_id = ?', (fileId,))
+        c.execute('DELETE FROM hbfiles WHERE id = ?', (fileId,))
+
+    def update(self, filenames, openFile, createHbFile):
+        """update(filenames, openFile, createHbFile) -> storedFilenames
+
+        Store the handbook files whose fingerprint changed since they were
+        stored, opening them with openFile and parsing them with createHbFile,
+        drop the stored files which aren't in filenames, and resolve the links
+        if any was stored or dropped.
+        """
+        from hbsources import sourceFingerprint
+        stored = []
+        paths = set([os.path.abspath(filename) for filename in filenames])
+        dropped = [row for row in self.connection.execute(
+                'SELECT id, path FROM hbfiles') if row[1] not in paths]
+        if dropped:
+            with self.connection:
+                for fileId, path in dropped:
+                    self.deleteHbFile(fileId)
+        for filename in filenames:
+            path = os.path.abspath(filename)
+            fingerprint = sourceFingerprint(filename)
+            if self.fileFingerprint(path) == fingerprint:
+                continue
+            f = openFile(filename)
+            try:
+                hbf = createHbFile(f)
+            finally:
+                f.close()
+            self.storeHbFile(hbf, path, fingerprint)
+            stored.append(filename)
+        if stored or dropped:
+            self.resolveLinks()
+        return stored
+
+    def rowToPost(self, row):
+        d, title, contents, subjname, hbfname = row
+        return Post(date(int(d[:4]), int(d[5:7]), int(d[8:10])), title,
+                    contents, subjname, hbfname)
+
+    def getPosts(self, d1 = None, d2 = None):
+        """getPosts([d1[, d2]]) -> [(postId, post), ...]
+
+        Get the posts from d1 to d2, inclusive, ordered as the posts of
+        PostExtractor.getPosts, but with the contents as they are in the
+        handbook files.
+        """
+        conditions = []
+        args = []
+        if d1 != None:
+            conditions.append('p.date >= ?')
+            args.append(d1.isoformat())
+        if d2 != None:
+            conditions.append('p.date <= ?')
+            args.append(d2.isoformat())
+        where = ''
+        if conditions:
+            where = 'WHERE ' + ' AND '.join(conditions)
+        rows = self.connection.execute(
+            'SELECT p.id, p.date, p.title, p.contents, p.subjname, ' +
+            'p.hbfname FROM posts p JOIN hbfiles f ON p.hbfile_id = f.id ' +
+            where + ' ORDER BY ' + PostOrder, args)
+        return [(row[0], self.rowToPost(row[1:])) for row in rows]
+
+    def resolveAnchor(self, hbfname, anchor):
+        """resolveAnchor(hbfname, anchor) -> (postId, permaLink, keepAnchor)
+
+        Find the post to which a link to anchor in the hbfname handbook file
+        is adapted, as done by PostExtractor.blogLinkFromHbfLink, or None.
+        """
+        row = self.connection.execute(
+            'SELECT p.id, p.permalink, a.kind FROM anchors a ' +
+            'JOIN posts p ON a.post_id = p.id ' +
+            'JOIN hbfiles f ON p.hbfile_id = f.id ' +
+            'WHERE a.hbfname = ? AND a.anchor = ? ' +
+            'ORDER BY ' + PostOrder + ', a.kind LIMIT 1',
+            (hbfname, anchor)).fetchone()
+        if row == None:
+            return None
+        return row[0], row[1], row[2] == NameAnchor
+
+    def resolveLinks(self):
+        """resolveLinks()
+
+        Resolve the handbook file links of all the stored posts, replacing
+        the links table in a single transaction.
+        """
+        links = []
+        for postId, post in self.getPosts():
+            for match in PostExtractor.HbfIntraLinkRe.finditer(post.contents or ''):
+                target = self.resolveLink(post, match)
+                if target == None:
+                    links.append((postId, match.group(), None, None))
+                else:
+                    links.append((postId, match.group(), target[0],
+                                  target[2]))
+        with self.connection:
+            self.connection.execute('DELETE FROM links')
+            self.connection.executemany('INSERT INTO links VALUES (?, ?, ?, ?)',
+                                        links)
+
+    def resolveLink(self, post, match):
+        filename = match.group('filename')
+        if len(filename) == 0 and match.group('anchor') in post.names:
+            return None
+        return self.resolveAnchor(filename or post.hbfname,
+                                  match.group('anchor'))
+
+
+class StoreAnchors:
+    """The anchors of a PostStore, with the resolve method of AnchorTable."""
+    def __init__(self, store):
+        self.store = store
+
+    def resolve(self, hbfname, anchor):
+        target = self.store.resolveAnchor(hbfname, anchor)
+        if target == None:
+            return None
+        return target[1:]
+
+
+class StorePostExtractor(PostExtractor):
+    """A PostExtractor which gets the posts from a PostStore, querying it for
+    the date ranges and the targets of the links, instead of building all the
+    posts in memory."""
+    def __init__(self, store):
+        PostExtractor.__init__(self)
+        self.store = store
+
+    def buildPosts(self):
+        return [post for postId, post in self.store.getPosts()]
+
+    def anchorTable(self, posts):
+        return StoreAnchors(self.store)
+
+    def iterPosts(self, d1 = None, d2 = None):
+        if d1 != None and d2 != None:
+            assert d1 <= d2
+        anchors = self.anchorTable(None)
+        posts = [post for postId, post in self.store.getPosts(d1, d2)]
+        for post in self.uniqueOf(posts):
+            self.adaptPostLinks(anchors, post)
+            yield post
@@ -0,0 +1,155 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbstore module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import date
+from StringIO import StringIO
+from hbstore import *
+from htmled import HbFile, PostExtractor
+from hbsources import openHbSource
+
+
+class PostStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.f1 = file('dummy_hbfile.html')
+        self.f2 = file('dummy_hbfile2.html')
+        self.hbf1 = HbFile(self.f1)
+        self.hbf2 = HbFile(self.f2)
+        self.store = PostStore()
+        self.store.storeHbFile(self.hbf1)
+        self.store.storeHbFile(self.hbf2)
+        self.store.resolveLinks()
+
+    def tearDown(self):
+        self.store.close()
+        self.f1.close()
+        self.f2.close()
+
+    def assertSamePosts(self, expected, actual):
+        self.assertEquals([str(post) for post in expected],
+                          [str(post) for post in actual])
+
+    def testStoredPostsAreTheExtractedPosts(self):
+        self.assertSamePosts(PostExtractor(self.hbf1, self.hbf2).getPosts(),
+                             StorePostExtractor(self.store).getPosts())
+
+    def testDateRangeQuery(self):
+        d1 = date(2010, 2, 7)
+        d2 = date(2011, 2, 6)
+        self.assertSamePosts(PostExtractor(self.hbf1, self.hbf2).getPosts(d1, d2),
+                             StorePostExtractor(self.store).getPosts(d1, d2))
+        self.assertEquals(4, len(self.store.getPosts(d1, d2)))
+
+    def testGroupPostsFromStore(self):
+        self.assertEquals([(2010, 2), (2010, 5), (2011, 2), (2011, 5)],
+                          [key for key, posts in
+                           StorePostExtractor(self.store).groupPosts('month')])
+
+    def testResolveAnchor(self):
+        postId, permaLink, keepAnchor = self.store.resolveAnchor(
+            'dummy_hbfile.html', 'idiota_1st_mil')
+        self.assertEquals('http://argonauts-life.blogspot.com/2010/02/' +
+                          'idiota-gets-1-million-euros-profit.html', permaLink)
+        self.assertFalse(keepAnchor)
+        self.assertEquals(None, self.store.resolveAnchor('dummy_hbfile.html',
+                                                         'no_such_anchor'))
+
+    def testResolvedLinks(self):
+        links = self.store.connection.execute(
+            'SELECT href, target_post_id FROM links ORDER BY href').fetchall()
+        self.assertEquals(2, len(links))
+        self.assertEquals(None, links[0][1])
+        self.assertTrue('2010-05-06' in links[0][0])
+        self.assertTrue(links[1][1] != None)
+
+    def testDedupOfStoredPosts(self):
+        source = StringIO(open('dummy_hbfile.html').read())
+        source.name = 'copy.html'
+        self.store.storeHbFile(HbFile(source))
+        pe = StorePostExtractor(self.store)
+        self.assertEquals(12, len(pe.getPosts()))
+        pe.dedup = True
+        posts = pe.getPosts()
+        self.assertSamePosts(PostExtractor(self.hbf1, self.hbf2).getPosts(),
+                             posts)
+        self.assertEquals(8, len(pe.extractPosts()))
+
+    def testStoringAgainReplacesFile(self):
+        self.hbf1.dailyEntries[0].subjects[0].contents = '<p>changed</p>'
+        self.store.storeHbFile(self.hbf1)
+        posts = self.store.getPosts(date(2010, 2, 6), date(2010, 2, 6))
+        self.assertEquals(2, len(posts))
+        self.assertEquals('<p>changed</p>', posts[0][1].contents)
+        self.assertEquals(8, len(self.store.getPosts()))
+
+
+class PostStoreUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'store.db')
+        self.files = ['dummy_hbfile.html', 'dummy_hbfile2.html']
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testUpdateStoresOnlyChangedFiles(self):
+        store = PostStore(self.path)
+        self.assertEquals(self.files, store.update(self.files, openHbSource, HbFile))
+        store.close()
+        store = PostStore(self.path)
+        self.assertEquals([], store.update(self.files, openHbSource, HbFile))
+        self.assertEquals(8, len(store.getPosts()))
+        store.close()
+
+    def testUpdateDropsFilesNoLongerGiven(self):
+        store = PostStore(self.path)
+        store.update(self.files, openHbSource, HbFile)
+        self.assertEquals([], store.update(self.files[:1], openHbSource,
+                                           HbFile))
+        self.assertEquals(4, len(store.getPosts()))
+        self.assertEquals(None, store.fileFingerprint(
+                os.path.abspath(self.files[1])))
+        store.close()
+
+    def testFilesOfDifferentHandbooksWithTheSameName(self):
+        files = []
+        for handbook in ['web', 'java']:
+            os.mkdir(os.path.join(self.dir, handbook))
+            files.append(os.path.join(self.dir, handbook, 'ficheiro01.html'))
+            shutil.copy('dummy_hbfile.html', files[-1])
+        store = PostStore(self.path)
+        self.assertEquals(files, store.update(files, openHbSource, HbFile))
+        self.assertEquals(8, len(store.getPosts()))
+        self.assertEquals([], store.update(files, openHbSource, HbFile))
+        store.close()
+
+    def testStoreOfAnotherVersionIsRebuilt(self):
+        store = PostStore(self.path)
+        store.update(self.files, openHbSource, HbFile)
+        store.connection.execute('PRAGMA user_version = 1')
+        store.close()
+        store = PostStore(self.path)
+        self.assertEquals([], store.getPosts())
+        self.assertEquals(self.files, store.update(self.files, openHbSource,
+                                                   HbFile))
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
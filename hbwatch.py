@@ -0,0 +1,125 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Watch mode of hb2post: polls the handbook files and emits the posts which
+# are new or changed since the previous poll.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import sys
+import time
+from htmled import PostExtractor
+
+
+class PostWatcher:
+    """Finds the posts from d1 to d2 which are new or changed since they were
+    last found, by their fingerprints (see Post.getFingerprint).
+
+    Only the size and modification time of the handbook files are checked
+    while none of them changes; then only the changed files are parsed
+    again, by the hbfiles, an hb2post.WarmHbFiles. A file which fails to
+    parse, e.g., because it is half written, is reported to stderr and keeps
+    its previous posts until it parses again.
+    If dateRange is given, it is called at each poll to get (d1, d2), e.g.,
+    so that a range of today moves with the days.
+    """
+    def __init__(self, hbfiles, d1 = None, d2 = None, dedup = False,
+                 dateRange = None):
+        self.hbfiles = hbfiles
+        self.d1 = d1
+        self.d2 = d2
+        self.dedup = dedup
+        self.dateRange = dateRange
+        self.fingerprints = None
+        self.posts = []
+        self.errors = {}
+
+    def changedPosts(self):
+        """changedPosts() -> posts new or changed since the previous call
+
+        The first call gets all the posts. The posts are ordered by date and
+        have their links adapted. All the posts from d1 to d2 are kept in the
+        posts attribute.
+        """
+        dates = (self.d1, self.d2)
+        if self.dateRange != None:
+            self.d1, self.d2 = self.dateRange()
+        if self.fingerprints != None and not self.refresh() and \
+                dates == (self.d1, self.d2):
+            return []
+        pe = PostExtractor(*self.hbfiles.hbfs)
+        pe.workers = self.hbfiles.workers
+        pe.dedup = self.dedup
+        self.posts = pe.getPosts(self.d1, self.d2)
+        previous = self.fingerprints or {}
+        self.fingerprints = {}
+        changed = []
+        for post in self.posts:
+            fingerprint = post.getFingerprint()
+            self.fingerprints[post] = fingerprint
+            if previous.get(post) != fingerprint:
+                changed.append(post)
+        return changed
+
+    def refresh(self):
+        """refresh() -> reparsedFilenames, reporting the files which fail
+        to parse once for each error"""
+        errors = []
+        reparsed = self.hbfiles.refresh(errors)
+        for fn in reparsed:
+            self.errors.pop(fn, None)
+        for fn, error in errors:
+            if self.errors.get(fn) != str(error):
+                self.errors[fn] = str(error)
+                print >> sys.stderr, fn + ': ' + str(error)
+        return reparsed
+
+    def watch(self, emit, interval, cycles = None, sleep = time.sleep):
+        """watch(emit, interval[, cycles[, sleep]])
+
+        Poll the handbook files every interval seconds, calling
+        emit(changedPosts, posts) when there are changed posts, for the
+        given number of cycles, or until interrupted.
+        """
+        cycle = 0
+        while cycles == None or cycle < cycles:
+            if cycle > 0:
+                sleep(interval)
+            changed = self.changedPosts()
+            if changed:
+                emit(changed, self.posts)
+            cycle += 1
+
+
+def watch(options):
+    from hb2post import WarmHbFiles, writeTextPosts, writeJsonLinesPosts, \
+        writePostFiles
+    def emit(changed, posts):
+        if options.outputdir():
+            writePostFiles(posts, options.outputdir(), options.jobs())
+        elif options.format() == 'jsonl':
+            writeJsonLinesPosts(changed, sys.stdout, options.encoding())
+        else:
+            writeTextPosts(changed, sys.stdout)
+        sys.stdout.flush()
+    watcher = PostWatcher(WarmHbFiles(options.hbfilenames(),
+                                      options.processes(),
+                                      options.tolerant()),
+                          dedup = options.dedup(),
+                          dateRange = lambda: (options.startdate(),
+                                               options.enddate()))
+    print >> sys.stderr, 'Watching %d handbook files every %g seconds' % \
+        (len(options.hbfilenames()), options.interval())
+    try:
+        watcher.watch(emit, options.interval())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,134 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbwatch module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from StringIO import StringIO
+from hbwatch import *
+from hb2post import WarmHbFiles
+
+
+class CountingWarmHbFiles(WarmHbFiles):
+    def __init__(self, filenames):
+        self.parsed = []
+        WarmHbFiles.__init__(self, filenames)
+
+    def hbf(self, fn):
+        self.parsed.append(os.path.basename(fn))
+        return WarmHbFiles.hbf(self, fn)
+
+
+class PostWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filenames = []
+        for name in ['dummy_hbfile.html', 'dummy_hbfile2.html']:
+            path = os.path.join(self.dir, name)
+            shutil.copy(name, path)
+            self.filenames.append(path)
+        self.hbfiles = CountingWarmHbFiles(self.filenames)
+        self.watcher = PostWatcher(self.hbfiles)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def edit(self, path, old, new):
+        text = open(path).read()
+        assert old in text
+        f = open(path, 'w')
+        f.write(text.replace(old, new))
+        f.close()
+        # make the change visible even with a coarse modification time
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    def testFirstCycleGetsAllPosts(self):
+        self.assertEquals(8, len(self.watcher.changedPosts()))
+        self.assertEquals([], self.watcher.changedPosts())
+        self.assertEquals(2, len(self.hbfiles.parsed))
+
+    def testNewPostOfChangedFile(self):
+        self.watcher.changedPosts()
+        self.edit(self.filenames[1], '<h3><a name="argo_with_uml211">',
+                  '<h3><a name="new_entry">New entry</a></h3>\n'
+                  '<p>Written today.</p>\n<h3><a name="argo_with_uml211">')
+        changed = self.watcher.changedPosts()
+        self.assertEquals(['new_entry'], [post.subjname for post in changed])
+        self.assertTrue('<p>Written today.</p>' in changed[0].contents)
+        self.assertEquals(9, len(self.watcher.posts))
+        self.assertEquals(['dummy_hbfile.html', 'dummy_hbfile2.html',
+                           'dummy_hbfile2.html'], self.hbfiles.parsed)
+
+    def testChangedPost(self):
+        self.watcher.changedPosts()
+        self.edit(self.filenames[0], 'has UML 2.0 support', 'has UML 2 support')
+        self.assertEquals(['argo_with_uml2'],
+                          [post.subjname for post in
+                           self.watcher.changedPosts()])
+
+    def testPostsInDateRange(self):
+        watcher = PostWatcher(self.hbfiles, date(2011, 1, 1))
+        self.assertEquals(4, len(watcher.changedPosts()))
+
+    def testFileWhichFailsToParseKeepsItsPosts(self):
+        self.watcher.changedPosts()
+        self.edit(self.filenames[0], 'has UML 2.0 support',
+                  'has UML 2 support</h2>')
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.assertEquals([], self.watcher.changedPosts())
+            self.assertEquals([], self.watcher.changedPosts())
+            reported = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEquals(1, reported.count(self.filenames[0] + ': '))
+        self.assertEquals(8, len(self.watcher.posts))
+        self.edit(self.filenames[0], 'has UML 2 support</h2>',
+                  'has UML 2 support')
+        self.assertEquals(['argo_with_uml2'],
+                          [post.subjname for post in
+                           self.watcher.changedPosts()])
+
+    def testDateRangeIsTakenAtEachPoll(self):
+        dates = [(date(2010, 2, 6), date(2010, 2, 6))]
+        watcher = PostWatcher(self.hbfiles, dateRange = lambda: dates[0])
+        self.assertEquals(2, len(watcher.changedPosts()))
+        self.assertEquals([], watcher.changedPosts())
+        dates[0] = (date(2010, 2, 8), date(2010, 2, 8))
+        self.assertEquals(1, len(watcher.changedPosts()))
+        self.assertEquals(1, len(watcher.posts))
+
+    def testWatchEmitsOnlyWhenPostsChange(self):
+        emitted = []
+        sleeps = []
+        def sleep(interval):
+            sleeps.append(interval)
+            if len(sleeps) == 2:
+                self.edit(self.filenames[0], 'has UML 2.0 support',
+                          'has UML 2 support')
+        self.watcher.watch(lambda changed, posts: emitted.append(len(changed)),
+                           0.5, 4, sleep)
+        self.assertEquals([0.5, 0.5, 0.5], sleeps)
+        self.assertEquals([8, 1], emitted)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Writes the extracted posts as Blogger ready HTML files and monthly index
+# pages.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import os
+import re
+from multiprocessing.pool import ThreadPool
+
+PostTemplate = '''<html>
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=%(charset)s">
+<meta name="date" content="%(date)s">
+<title>%(title)s</title>
+<link rel="canonical" href="%(permalink)s">
+</head>
+<body>
+%(contents)s
+</body>
+</html>
+'''
+
+IndexTemplate = '''<html>
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=%(charset)s">
+<title>%(title)s</title>
+</head>
+<body>
+<h1>%(title)s</h1>
+<ul>
+%(items)s
+</ul>
+</body>
+</html>
+'''
+
+IndexItemTemplate = '<li>%(date)s <a href="%(href)s">%(title)s</a></li>'
+
+# the date and title of a post file written with PostTemplate
+PostFileHeadRe = re.compile(r'<meta name="date" content="([^"]*)">\n' +
+                            r'<title>(.*?)</title>\n', re.DOTALL)
+
+MonthDirRe = re.compile(r'^\d{4}/\d{2}$')
+
+
+class PostFileWriter:
+    """Writes each post to its own HTML file, named from its permalink, e.g.,
+    'outputDir/2010/02/idiota-gets-1-million-euros-profit.html', together
+    with an index page per month and an index page of the months.
+
+    The index pages list all the post files in the output directory, not
+    only those written by the last writePosts, so that writing the posts of
+    a date range, or only the changed ones, keeps the posts previously
+    written in the indexes. Files whose contents wouldn't change aren't
+    written again.
+    """
+    BufferSize = 64 * 1024
+
+    def __init__(self, outputDir, workers = 4, charset = 'iso-8859-1'):
+        self.outputDir = outputDir
+        self.workers = workers
+        self.charset = charset
+        self.written = []
+        self.unchanged = []
+
+    def writePosts(self, posts):
+        """writePosts(posts) -> (writtenPaths, unchangedPaths)
+
+        Write the posts, which must be ordered by date, and the index pages
+        of their months and of all the months. The paths are relative to the
+        output directory.
+        """
+        files = []
+        monthDirs = set()
+        paths = set()
+        for post in posts:
+            path = self.uniquePath(post.getPermaLinkPath(), paths)
+            files.append((path, self.postText(post)))
+            monthDirs.add(os.path.dirname(path))
+        self.written = []
+        self.unchanged = []
+        self.writeFiles(files)
+        files = [(monthDir + '/index.html',
+                  self.indexText(monthDir, self.monthItems(monthDir)))
+                 for monthDir in sorted(monthDirs)]
+        months = [IndexItemTemplate % {'date': '', 'title': monthDir,
+                                       'href': monthDir + '/index.html'}
+                  for monthDir in self.monthDirs()]
+        files.append(('index.html', self.indexText('Posts', months)))
+        self.writeFiles(files)
+        return sorted(self.written), sorted(self.unchanged)
+
+    def writeFiles(self, files):
+        pool = ThreadPool(self.workers)
+        try:
+            pool.map(self.writeFile, files)
+        finally:
+            pool.close()
+            pool.join()
+
+    def monthDirs(self):
+        """monthDirs() -> sorted ['yyyy/mm', ...] with post files"""
+        monthDirs = []
+        for year in os.listdir(self.outputDir):
+            yearPath = os.path.join(self.outputDir, year)
+            if not os.path.isdir(yearPath):
+                continue
+            for month in os.listdir(yearPath):
+                monthDir = year + '/' + month
+                if MonthDirRe.match(monthDir) and self.postFiles(monthDir):
+                    monthDirs.append(monthDir)
+        return sorted(monthDirs)
+
+    def postFiles(self, monthDir):
+        monthPath = os.path.join(self.outputDir, monthDir)
+        if not os.path.isdir(monthPath):
+            return []
+        return [name for name in os.listdir(monthPath)
+                if name.endswith('.html') and name != 'index.html']
+
+    def monthItems(self, monthDir):
+        """monthItems(monthDir) -> index items of the post files of monthDir,
+        ordered by date, as in their <meta name="date"> and <title>"""
+        posts = []
+        for name in self.postFiles(monthDir):
+            f = open(os.path.join(self.outputDir, monthDir, name), 'rb',
+                     PostFileWriter.BufferSize)
+            try:
+                head = PostFileHeadRe.search(f.read())
+            finally:
+                f.close()
+            if head != None:
+                posts.append((head.group(1), name, head.group(2)))
+        posts.sort()
+        return [IndexItemTemplate % {'date': d, 'title': title, 'href': name}
+                for d, name, title in posts]
+
+    def uniquePath(self, path, paths):
+        """Blogger doesn't allow two posts with the same permalink, so
+        suffix repeated paths with _2, _3, etc."""
+        uniquePath = path
+        i = 1
+        while uniquePath in paths:
+            i += 1
+            uniquePath = path[:-len('.html')] + '_' + str(i) + '.html'
+        paths.add(uniquePath)
+        return uniquePath
+
+    def postText(self, post):
+        return PostTemplate % {'charset': self.charset, 'date': post.date,
+                               'title': post.title,
+                               'permalink': post.getPermaLink(),
+                               'contents': post.contents}
+
+    def indexText(self, title, items):
+        return IndexTemplate % {'charset': self.charset, 'title': title,
+                                'items': '\n'.join(items)}
+
+    def writeFile(self, pathAndText):
+        path, text = pathAndText
+        fullPath = os.path.join(self.outputDir, path)
+        if self.isUnchanged(fullPath, text):
+            self.unchanged.append(path)
+            return
+        dirPath = os.path.dirname(fullPath)
+        try:
+            os.makedirs(dirPath)
+        except OSError:
+            if not os.path.isdir(dirPath):
+                raise
+        f = open(fullPath, 'wb', PostFileWriter.BufferSize)
+        try:
+            f.write(text)
+        finally:
+            f.close()
+        self.written.append(path)
+
+    def isUnchanged(self, fullPath, text):
+        try:
+            if os.path.getsize(fullPath) != len(text):
+                return False
+            f = open(fullPath, 'rb', PostFileWriter.BufferSize)
+            try:
+                return f.read() == text
+            finally:
+                f.close()
+        except (IOError, OSError):
+            return False
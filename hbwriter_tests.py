@@ -0,0 +1,88 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Automated tests for hbwriter module.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import date
+from hbwriter import *
+from htmled import Post
+
+
+class PostFileWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.writer = PostFileWriter(self.dir, 2)
+        self.posts = [Post(date(2010, 2, 6), 'First post', '<p>one</p>',
+                           'first', 'hbf.html'),
+                      Post(date(2010, 2, 8), 'Second post', '<p>two</p>',
+                           'second', 'hbf.html'),
+                      Post(date(2010, 5, 16), 'Third post', '<p>three</p>',
+                           'third', 'hbf.html')]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, path):
+        return open(os.path.join(self.dir, path)).read()
+
+    def testWritesPostsAndIndexes(self):
+        written, unchanged = self.writer.writePosts(self.posts)
+        self.assertEquals(['2010/02/first-post.html', '2010/02/index.html',
+                           '2010/02/second-post.html', '2010/05/index.html',
+                           '2010/05/third-post.html', 'index.html'], written)
+        self.assertEquals([], unchanged)
+        text = self.read('2010/02/first-post.html')
+        self.assertTrue('<p>one</p>' in text)
+        self.assertTrue('<title>First post</title>' in text)
+        self.assertTrue(self.posts[0].getPermaLink() in text)
+        index = self.read('2010/02/index.html')
+        self.assertTrue('<a href="first-post.html">First post</a>' in index)
+        self.assertTrue('<a href="second-post.html">Second post</a>' in index)
+        self.assertFalse('third-post.html' in index)
+        self.assertTrue('2010/05/index.html' in self.read('index.html'))
+
+    def testUnchangedFilesArentWrittenAgain(self):
+        self.writer.writePosts(self.posts)
+        self.posts[1].contents = '<p>two, changed</p>'
+        written, unchanged = self.writer.writePosts(self.posts)
+        self.assertEquals(['2010/02/second-post.html'], written)
+        self.assertEquals(5, len(unchanged))
+        self.assertTrue('two, changed' in self.read('2010/02/second-post.html'))
+
+    def testRepeatedPermaLinksGetUniquePaths(self):
+        self.posts[1].title = self.posts[0].title
+        written, unchanged = self.writer.writePosts(self.posts)
+        self.assertTrue('2010/02/first-post.html' in written)
+        self.assertTrue('2010/02/first-post_2.html' in written)
+
+    def testWritesOfDifferentRangesKeepTheEarlierPostsInTheIndexes(self):
+        self.writer.writePosts(self.posts[1:])
+        written, unchanged = self.writer.writePosts(self.posts[:1])
+        self.assertEquals(['2010/02/first-post.html', '2010/02/index.html'],
+                          written)
+        self.assertEquals(['index.html'], unchanged)
+        index = self.read('2010/02/index.html')
+        self.assertTrue(index.index('<a href="first-post.html">First post</a>')
+                        < index.index('<a href="second-post.html">'))
+        index = self.read('index.html')
+        self.assertTrue('2010/02/index.html' in index)
+        self.assertTrue('2010/05/index.html' in index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,7 +14,10 @@
 # Contributors:
 # - Luis Sergio Oliveira (euluis)
 
-from datetime import date
+from datetime import date, timedelta
+from calendar import monthrange
+from bisect import bisect_left, bisect_right
+from hashlib import sha1
 import re
 
 def getHbFileName(filename):
@@ -29,20 +32,42 @@ def getHbFileName(filename):
 
 class HbFile:
     """A Handbook file, which contains daily entries."""
-    def __init__(self, f):
-        """HbFile(f) -> hbFile
-
-        Returns the HbFile constructed from the f HTML file.
+    def __init__(self, f, stripper = None, workers = 1, tolerant = False,
+                 journal = None):
+        """HbFile(f[, stripper[, workers[, tolerant[, journal]]]]) -> hbFile
+
+        Returns the HbFile constructed from the f HTML file. The optional
+        stripper is the BoilerplateStripper used on the subject entries
+        contents, which are normalized by workers processes. A tolerant
+        HbFile keeps the entries which could be parsed and the diagnostics
+        of the malformed ones (see TolerantHbFileParser). Given the journal
+        of the events of a handbook file (see hbjournal.HbEventJournal), f
+        may be None and the HbFile is constructed by replaying its events.
         """
-        assert not f.closed
+        assert journal != None or not f.closed
         self.f = f
+        self.stripper = stripper
+        self.workers = workers
+        self.tolerant = tolerant
+        self.journal = journal
         self.parseHbFile()
 
     def parseHbFile(self):
-        parser = HbFileParser(self.f)
-        self.dailyEntries = parser.parse()
+        parserClass = HbFileParser
+        if self.tolerant:
+            parserClass = TolerantHbFileParser
+        parser = parserClass(self.f, self.stripper, self.workers)
+        if self.journal != None:
+            self.dailyEntries = parser.replay(self.journal)
+        else:
+            self.dailyEntries = parser.parse()
+        self.diagnostics = parser.diagnostics
+        # the offsets of the starts of the lines of the text of the file
+        self.lineStarts = parser.lineStarts
 
     def getFileName(self):
+        if self.journal != None:
+            return getHbFileName(self.journal.name)
         assert self.f.name != None
         return getHbFileName(self.f.name)
 
@@ -64,7 +89,11 @@ class HbSubjectEntry:
 
 
 class Post:
-    """A weblog post."""
+    """A weblog post.
+
+    Posts are identified by their key, (hbfname, subjname, date), which
+    their equality and hash follow, while they are ordered by date only.
+    """
     def __init__(self, date, title, contents, subjname, hbfname):
         self.date = date
         self.title = title
@@ -74,8 +103,7 @@ class Post:
         self.setPostNames()
 
     def __str__(self):
-        return 'Date: ' + str(self.date) + '\n' + 'Title: ' + self.title + \
-               '\n' + self.contents
+        return 'Date: %s\nTitle: %s\n%s' % (self.date, self.title, self.contents)
 
     def __cmp__(self, other):
         if other:
@@ -83,12 +111,29 @@ class Post:
         else:
             return 1
 
+    def __eq__(self, other):
+        return isinstance(other, Post) and self.getKey() == other.getKey()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
     def __hash__(self):
-        return self.date.__hash__() | self.title.__hash__()
+        return hash(self.getKey())
+
+    def getKey(self):
+        """getKey() -> (hbfname, subjname, date)"""
+        return (self.hbfname, self.subjname, self.date)
 
     BlogURL = 'http://argonauts-life.blogspot.com/'
 
     def getPermaLink(self):
+        return Post.BlogURL + self.getPermaLinkPath()
+
+    def getPermaLinkPath(self):
+        """getPermaLinkPath() -> 'yyyy/mm/title-words.html'
+
+        The path of the permalink relative to Post.BlogURL.
+        """
         yearNMonth = str(self.date.year) + '/' + \
             str(self.date.month).rjust(2, '0') + '/'
         modTitle = self.title.lower()
@@ -109,7 +154,21 @@ class Post:
             if len(tmpModTitle) >= 39:
                 break
             modTitle = tmpModTitle
-        return Post.BlogURL + yearNMonth + modTitle + '.html'
+        return yearNMonth + modTitle + '.html'
+
+    def getFingerprint(self):
+        """getFingerprint() -> hexDigest
+
+        A fingerprint of the date, title and contents of the post, which
+        changes when any of them changes.
+        """
+        h = sha1()
+        h.update(str(self.date))
+        h.update('\0')
+        h.update(self.title or '')
+        h.update('\0')
+        h.update(self.contents or '')
+        return h.hexdigest()
 
     def wordToRemove(self, w):
         return w == 'a' or w == 'the' or w == 'ndash'
@@ -133,6 +192,59 @@ class Post:
             namePos = self.contents.find('<a name="', nameStart)
 
 
+def yearGrouping(d):
+    """yearGrouping(d) -> ((year,), lastDateOfTheYear)"""
+    return (d.year,), date(d.year, 12, 31)
+
+def monthGrouping(d):
+    """monthGrouping(d) -> ((year, month), lastDateOfTheMonth)"""
+    return (d.year, d.month), \
+        date(d.year, d.month, monthrange(d.year, d.month)[1])
+
+def weekGrouping(d):
+    """weekGrouping(d) -> ((isoYear, isoWeek), lastDateOfTheWeek)"""
+    return d.isocalendar()[:2], d + timedelta(6 - d.weekday())
+
+
+class AnchorTable:
+    """Maps the anchors of the handbook files to the permalinks of the posts
+    where they are, which is what is needed to adapt the links between posts.
+
+    An anchor is either the name of a subject entry, or a name within the
+    contents of a post. Links to a subject entry name are adapted to the post
+    permalink, while links to a name within a post keep the '#name' part.
+    When an anchor is in more than one post, the first post added wins.
+    """
+    def __init__(self, posts = ()):
+        """AnchorTable([posts]) -> anchorTable of the posts, in their order"""
+        self.targets = {}
+        for post in posts:
+            self.addPost(post)
+
+    def addPost(self, post):
+        self.addAnchors(post.hbfname, post.getPermaLink(),
+                        AnchorTable.postAnchors(post))
+
+    @staticmethod
+    def postAnchors(post):
+        """postAnchors(post) -> [(anchor, keepAnchor), ...]"""
+        return [(post.subjname, False)] + [(name, True) for name in post.names]
+
+    def addAnchors(self, hbfname, permaLink, anchors):
+        """addAnchors(hbfname, permaLink, [(anchor, keepAnchor), ...])"""
+        for anchor, keepAnchor in anchors:
+            key = (hbfname, anchor)
+            if key not in self.targets:
+                self.targets[key] = (permaLink, keepAnchor)
+
+    def resolve(self, hbfname, anchor):
+        """resolve(hbfname, anchor) -> (permaLink, keepAnchor) or None"""
+        return self.targets.get((hbfname, anchor))
+
+    def __len__(self):
+        return len(self.targets)
+
+
 class PostExtractor:
     """The PostExtractor class extracts Posts from HbFile instances."""
     def __init__(self, *hbfs):
@@ -142,27 +254,124 @@ class PostExtractor:
         it was given.
         """
         self.hbfs = hbfs
+        self.workers = 1
+        self.dedup = False
+        self.postsAnchors = None
 
     def getPosts(self, d1 = None, d2 = None):
+        return list(self.iterPosts(d1, d2))
+
+    def iterPosts(self, d1 = None, d2 = None):
+        """iterPosts([d1[, d2]]) -> generatorOfPosts
+
+        Generate the posts from d1 to d2, inclusive, ordered by date. The
+        links of each post are adapted just before it is generated, so posts
+        outside of the date range don't have their links adapted.
+        """
+        if d1 != None and d2 != None:
+            assert d1 <= d2
+        posts = self.buildPosts()
+        posts.sort()
+        anchors = self.anchorTable(posts)
+        posts = self.uniqueOf(posts)
+        return self.iterAdaptedPosts(anchors,
+                                     self.postsInRange(posts, [post.date for
+                                                               post in posts],
+                                                       d1, d2))
+
+    def getPostsByRanges(self, ranges):
+        """getPostsByRanges(ranges) -> [posts1, posts2, ...]
+
+        Get the posts of each of the (d1, d2) date ranges in ranges, in the
+        same order as the ranges. The posts are extracted, sorted and have
+        their links adapted only once for all the ranges.
+        """
+        posts = self.extractPosts()
+        dates = [post.date for post in posts]
+        postsOfRanges = []
+        for d1, d2 in ranges:
+            if d1 != None and d2 != None:
+                assert d1 <= d2
+            postsOfRanges.append(self.postsInRange(posts, dates, d1, d2))
+        return postsOfRanges
+
+    def groupPosts(self, by = 'month'):
+        """groupPosts([by]) -> [(key1, posts1), (key2, posts2), ...]
+
+        Group the posts by 'year', 'month' or 'week', ordered by date. The
+        keys are (year,), (year, month) or the ISO (year, week) tuples.
+        """
+        if by not in PostExtractor.Groupings:
+            raise ValueError("'by' must be one of " +
+                             str(sorted(PostExtractor.Groupings.keys())) +
+                             ". It is: '" + str(by) + "'")
+        grouping = PostExtractor.Groupings[by]
+        posts = self.extractPosts()
+        dates = [post.date for post in posts]
+        groups = []
+        start = 0
+        while start < len(dates):
+            key, lastDate = grouping(dates[start])
+            end = bisect_right(dates, lastDate, start)
+            groups.append((key, posts[start: end]))
+            start = end
+        return groups
+
+    Groupings = {'year': yearGrouping, 'month': monthGrouping,
+                 'week': weekGrouping}
+
+    def extractPosts(self):
+        """extractPosts() -> posts
+
+        Get all the posts from the HbFile instances, ordered by date and with
+        their links adapted.
+        """
+        posts = self.buildPosts()
+        posts.sort()
+        anchors = self.anchorTable(posts)
+        posts = self.uniqueOf(posts)
+        for post in self.iterAdaptedPosts(anchors, posts):
+            pass
+        return posts
+
+    def buildPosts(self):
+        """buildPosts() -> posts of all the entries, in the order of the
+        HbFile instances, without adapted links"""
         posts = []
         for hbf in self.hbfs:
             for de in hbf.dailyEntries:
                 for subj in de.subjects:
-                    postTitle = self.stripTags(subj.title)
-                    post = Post(de.date, postTitle, subj.contents, subj.name,
+                    post = Post(de.date, subj.title, subj.contents, subj.name,
                                 hbf.getFileName())
                     posts.append(post)
-        posts.sort()
-        self.adaptPostsLinks(posts)
-        if d1 != None and d2 != None:
-            assert d1 <= d2
+        return posts
+
+    def uniqueOf(self, posts):
+        """uniqueOf(posts) -> posts without the copies of previous posts, if
+        dedup is set
+
+        The anchors of the posts must be taken before, so that the links to
+        the anchors of a dropped copy are adapted to the kept post.
+        """
+        if self.dedup:
+            return list(uniquePosts(posts))
+        return posts
+
+    def postsInRange(self, posts, dates, d1, d2):
+        """postsInRange(posts, dates, d1, d2) -> postsBetweenD1AndD2
+
+        Binary search the sorted dates of the posts for the posts from d1 to
+        d2, inclusive. A None d1 or d2 means an open range.
+        """
+        start = 0
+        end = len(posts)
         if d1 != None:
-            posts = [post for post in posts if d1 <= post.date]
+            start = bisect_left(dates, d1)
         if d2 != None:
-            posts = [post for post in posts if d2 >= post.date]
-        return posts
+            end = bisect_right(dates, d2)
+        return posts[start: end]
     
-    HbfIntraLinkPattern = r'<a\s+href="(?P<filename>[^:]*?)#(?P<anchor>.+?)".*?>'
+    HbfIntraLinkPattern = r'<a\s+href="(?P<filename>[^:"]*?)#(?P<anchor>[^"]+?)".*?>'
 
     def searchHbfIntraLink(self, text):
         return re.search(PostExtractor.HbfIntraLinkPattern, text, re.IGNORECASE)
@@ -177,33 +386,112 @@ class PostExtractor:
         If it isn't successful in finding something, it returns match.group()
         (i.e., the original link). Oh(!), match is a re.MatchObject instance
         resulting from a search with PostExtractor.HbfIntraLinkPattern.
+        The AnchorTable of posts is reused while the same posts list, with the
+        same length, is given.
+        """
+        if self.postsAnchors == None or self.postsAnchors[0] is not posts or \
+                self.postsAnchors[1] != len(posts):
+            self.postsAnchors = (posts, len(posts), AnchorTable(posts))
+        return self.blogLinkFromAnchors(self.postsAnchors[2], post, match)
+
+    def blogLinkFromAnchors(self, anchors, post, match):
+        """blogLinkFromAnchors(anchors, post, match) -> blogLink
+
+        Same as blogLinkFromHbfLink, but looking for the name in the
+        AnchorTable anchors (or any object with the same resolve method).
         """
-        filePath = post.hbfname
-        if len(match.group('filename')) > 0:
-            filePath = match.group('filename')
-        relevantPosts = [p for p in posts if p.hbfname == filePath]
         link = match.group()
-        if match.group('anchor') in post.names and len(match.group('filename')) == 0:
+        filename = match.group('filename')
+        anchor = match.group('anchor')
+        if len(filename) == 0 and anchor in post.names:
             return link
-        for post in relevantPosts:
-            if post.subjname == match.group('anchor'):
-                return link[:match.start('filename') - match.start()] + \
-                    post.getPermaLink() + link[match.end('anchor') - match.start():]
-            elif match.group('anchor') in post.names:
-                return link[:match.start('filename') - match.start()] + \
-                    post.getPermaLink() + link[match.end('filename') - match.start():]
-        return link
+        target = anchors.resolve(filename or post.hbfname, anchor)
+        if target == None:
+            return link
+        return self.replaceHbfLink(match, target[0], target[1])
+
+    def replaceHbfLink(self, match, permaLink, keepAnchor):
+        """replaceHbfLink(match, permaLink, keepAnchor) -> blogLink
+
+        Replace the file name of the handbook file link in match with
+        permaLink, keeping its '#anchor' part if keepAnchor is True.
+        """
+        link = match.group()
+        if keepAnchor:
+            return link[:match.start('filename') - match.start()] + \
+                permaLink + link[match.end('filename') - match.start():]
+        return link[:match.start('filename') - match.start()] + \
+            permaLink + link[match.end('anchor') - match.start():]
 
     def adaptPostsLinks(self, posts):
         """adaptPostsLinks(self, posts)
 
         Adapt the links contained in the posts so that they work in the blog.
         """
-        for post in posts:
-            post.contents = re.sub(PostExtractor.HbfIntraLinkPattern,
-                                   lambda match: self.blogLinkFromHbfLink(posts,
-                                                                          post, match),
-                                   post.contents)
+        anchors = self.anchorTable(posts)
+        for post in self.iterAdaptedPosts(anchors, posts):
+            pass
+
+    LinksBatchSize = 256 * 1024
+
+    def iterAdaptedPosts(self, anchors, posts):
+        """iterAdaptedPosts(anchors, posts) -> generatorOfPosts
+
+        Adapt the links of each post just before generating it. With more than
+        one worker (see the workers attribute) and an AnchorTable, the posts
+        contents are rewritten in batches of about LinksBatchSize characters
+        by a pool of worker processes sharing the read only anchors, and the
+        posts are generated in their order as their batches are done.
+        """
+        if self.workers <= 1 or len(posts) <= 1 or \
+                not isinstance(anchors, AnchorTable):
+            for post in posts:
+                self.adaptPostLinks(anchors, post)
+                yield post
+            return
+        from multiprocessing import Pool
+        batches = sizedBatches(posts, lambda post: len(post.contents or ''),
+                               PostExtractor.LinksBatchSize)
+        pool = Pool(min(self.workers, len(batches)), initLinksAdapter,
+                    (self.__class__, anchors))
+        try:
+            for i, contents in enumerate(pool.imap(adaptLinksBatch, batches)):
+                for post, c in zip(batches[i], contents):
+                    post.contents = c
+                    yield post
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def anchorTable(self, posts):
+        """anchorTable(posts) -> anchors used to adapt the links of posts"""
+        return AnchorTable(posts)
+
+    HbfIntraLinkRe = re.compile(HbfIntraLinkPattern)
+
+    def adaptPostLinks(self, anchors, post):
+        """adaptPostLinks(self, anchors, post)
+
+        Adapt the links contained in post, looking for their targets in the
+        AnchorTable anchors.
+        """
+        post.contents = PostExtractor.HbfIntraLinkRe.sub(
+            lambda match: self.blogLinkFromAnchors(anchors, post, match),
+            post.contents)
+
+    def iterHbfLinks(self, post):
+        """iterHbfLinks(post) -> generatorOf(match, hbfname, anchor)
+
+        Generate the links of post which may be to other posts, with the
+        handbook file name and anchor of their targets, skipping the links to
+        the names within post itself.
+        """
+        for match in PostExtractor.HbfIntraLinkRe.finditer(post.contents or ''):
+            filename = match.group('filename')
+            anchor = match.group('anchor')
+            if len(filename) == 0 and anchor in post.names:
+                continue
+            yield match, filename or post.hbfname, anchor
 
     def stripTags(self, text):
         """stripTags(text) -> textWithoutTags
@@ -214,14 +502,31 @@ class PostExtractor:
         tagStart = text.find('<')
         if tagStart == -1:
             return text
-        twt = ''
+        parts = []
         while tagStart != -1:
-            twt += text[start: tagStart]
+            parts.append(text[start: tagStart])
             start = text.find('>', tagStart) + 1
+            if start == 0:
+                return ''.join(parts)
             tagStart = text.find('<', start)
-            if tagStart == -1:
-                twt += text[start:]
-        return twt
+        parts.append(text[start:])
+        return ''.join(parts)
+
+
+def initLinksAdapter(extractorClass, anchors):
+    """Worker process initializer of PostExtractor.iterAdaptedPosts."""
+    global linksAdapter
+    linksAdapter = (extractorClass(), anchors)
+
+def adaptLinksBatch(posts):
+    """adaptLinksBatch(posts) -> [adaptedContents1, adaptedContents2, ...]
+
+    Adapt the links of a batch of posts in a worker process.
+    """
+    pe, anchors = linksAdapter
+    for post in posts:
+        pe.adaptPostLinks(anchors, post)
+    return [post.contents for post in posts]
 
 
 from HTMLParser import HTMLParser
@@ -256,6 +561,9 @@ class HbFileParsingState:
     def data(self, parsing, data):
         raise StateError('data', parsing.state)
 
+    def entity(self, parsing, reference):
+        pass
+
     def entry(self, parsing):
         pass
 
@@ -364,7 +672,10 @@ class SubjectEntryHbFileParsingState(DailyEntryContentsHbFileParsingState):
         pass
 
     def data(self, parsing, data):
-        pass
+        parsing.addSubjectEntryTitleData(data)
+
+    def entity(self, parsing, reference):
+        parsing.addSubjectEntryTitleData(reference)
 
     def entry(self, parsing):
         parsing.beginSubjectEntryHeader()
@@ -394,6 +705,13 @@ class SubjectEntryContentsHbFileParsingState(DailyEntryContentsHbFileParsingStat
         pass
 
 
+class ResyncHbFileParsingState(IdleHbFileParsingState):
+    """The state of a tolerant parsing after an error, in which everything
+    is skipped until the next daily entry."""
+    def __str__(self):
+        return 'Resync'
+
+
 class HbFileParsing:
     """Implements a Finite State Machine for the Handbook File Parser."""
     Idle = IdleHbFileParsingState()
@@ -402,6 +720,7 @@ class HbFileParsing:
     DefaultSubjectEntryOfDailyEntry = \
         DefaultSubjectEntryOfDailyEntryHbFileParsingState()
     SubjectEntryContents = SubjectEntryContentsHbFileParsingState()
+    Resync = ResyncHbFileParsingState()
     
     def __init__(self, parser):
         self.parser = parser
@@ -431,6 +750,9 @@ class HbFileParsing:
     def data(self, data):
         self.state.data(self, data)
 
+    def entity(self, reference):
+        self.state.entity(self, reference)
+
     def setState2Idle(self):
         self.state.exit(self)
         self.state = HbFileParsing.Idle
@@ -469,6 +791,9 @@ class HbFileParsing:
     def setSubjectEntryTitle(self, data = None):
         self.parser.setSubjectEntryTitle(data)
 
+    def addSubjectEntryTitleData(self, data):
+        self.parser.addSubjectEntryTitleData(data)
+
     def handleABegin(self, attrs):
         self.parser.handleABegin(attrs)
 
@@ -479,22 +804,185 @@ class HbFileParsing:
         self.parser.endPos()
 
 
+class BoilerplateStripper:
+    """Removes boilerplate fragments from text.
+
+    The fragments are given as literal strings or as regular expressions and
+    are all combined into one regular expression, so that stripping them is
+    done in a single pass over the text. The number of times each fragment
+    was removed is kept in the counts attribute, a dictionary keyed by the
+    fragments as they were given.
+    """
+    def __init__(self, literals = (), regexes = (), flags = 0):
+        """BoilerplateStripper([literals[, regexes[, flags]]]) -> stripper
+
+        Numbered back references aren't supported in regexes, since each of
+        them is wrapped in a named group of the combined regular expression.
+        """
+        self.literals = list(literals)
+        self.regexes = list(regexes)
+        self.flags = flags
+        self.fragments = []
+        alternatives = []
+        for literal in literals:
+            alternatives.append(re.escape(literal))
+            self.fragments.append(literal)
+        for regex in regexes:
+            alternatives.append(regex)
+            self.fragments.append(regex)
+        self.counts = {}
+        for fragment in self.fragments:
+            self.counts[fragment] = 0
+        self.pattern = None
+        if alternatives:
+            self.pattern = re.compile('|'.join(
+                    ['(?P<_bp%d>%s)' % (i, alternative)
+                     for i, alternative in enumerate(alternatives)]), flags)
+
+    def strip(self, text):
+        """strip(text) -> textWithoutBoilerplate"""
+        if self.pattern is None or not text:
+            return text
+        return self.pattern.sub(self.countMatch, text)
+
+    def countMatch(self, match):
+        self.counts[self.fragments[int(match.lastgroup[3:])]] += 1
+        return ''
+
+    def addCounts(self, counts):
+        for fragment, count in counts.items():
+            self.counts[fragment] += count
+
+
+def uniquePosts(posts):
+    """uniquePosts(posts) -> generatorOfPosts
+
+    Generate the posts but those with the same fingerprint as a previous one,
+    e.g., an entry copied into another handbook, in a single pass.
+    """
+    fingerprints = set()
+    for post in posts:
+        fingerprint = post.getFingerprint()
+        if fingerprint not in fingerprints:
+            fingerprints.add(fingerprint)
+            yield post
+
+def sizedBatches(items, sizeOf, batchSize):
+    """sizedBatches(items, sizeOf, batchSize) -> [batch1, batch2, ...]
+
+    Split items in lists of consecutive items, each with a total sizeOf of
+    about batchSize.
+    """
+    batches = [[]]
+    size = 0
+    for item in items:
+        if size >= batchSize:
+            batches.append([])
+            size = 0
+        batches[-1].append(item)
+        size += sizeOf(item)
+    return batches
+
+def initContentsNormalizer(literals, regexes, flags):
+    """Worker process initializer of HbFileParser.normalizeDeferredContents."""
+    global contentsNormalizer
+    contentsNormalizer = HbFileParser(None, BoilerplateStripper(literals,
+                                                                regexes, flags))
+
+def normalizeContentsBatch(batch):
+    """normalizeContentsBatch(batch) -> (normalizedContents, strippedCounts)
+
+    Normalize a batch of raw subject entries contents in a worker process.
+    """
+    counts = contentsNormalizer.stripper.counts
+    for fragment in counts:
+        counts[fragment] = 0
+    return [contentsNormalizer.normalizeContents(raw) for raw in batch], counts
+
+
 class HbFileParser(HTMLParser):
-    def __init__(self, f):
+    def __init__(self, f, stripper = None, workers = 1):
+        """HbFileParser(f[, stripper[, workers]]) -> hbFileParser
+
+        With more than one worker, parse only records the span of the raw
+        contents of the subject entries, which are then normalized in batches
+        by a pool of workers processes.
+        """
         HTMLParser.__init__(self)
         self.f = f
+        if stripper is None:
+            stripper = HbFileParser.createBoilerplateStripper()
+        self.stripper = stripper
+        self.workers = workers
+        self.deferred = None
         self.dailyEntries = []
         self.parsing = HbFileParsing(self)
         self.feededData = ''
+        self.lineStarts = [0]
+        self.titleParts = []
+        self.diagnostics = []
 
     def parse(self):
+        if self.workers > 1:
+            self.deferred = []
         self.feed(self.f.read())
+        return self.endParse()
+
+    def replay(self, journal):
+        """replay(journal) -> dailyEntries
+
+        Parse the handbook file recorded in journal by replaying the events
+        of its tokenization, as recorded, instead of tokenizing its text.
+        """
+        if self.workers > 1:
+            self.deferred = []
+        self.addFeededData(journal.text)
+        journal.replay(self)
+        return self.endParse()
+
+    def endParse(self):
+        if self.deferred:
+            self.normalizeDeferredContents()
+        self.deferred = None
         return self.dailyEntries
 
+    NormalizationBatchSize = 256 * 1024
+
+    def normalizeDeferredContents(self):
+        """normalizeDeferredContents()
+
+        Normalize the contents of the subject entries whose normalization was
+        deferred, in batches of about NormalizationBatchSize characters, by
+        a pool of worker processes, keeping the order of the entries.
+        """
+        from multiprocessing import Pool
+        batches = sizedBatches([self.feededData[se.span[0]: se.span[1]]
+                                for se in self.deferred], len,
+                               HbFileParser.NormalizationBatchSize)
+        pool = Pool(min(self.workers, len(batches)), initContentsNormalizer,
+                    (self.stripper.literals, self.stripper.regexes,
+                     self.stripper.flags))
+        try:
+            entries = iter(self.deferred)
+            for contents, counts in pool.imap(normalizeContentsBatch, batches):
+                for c in contents:
+                    entries.next().contents = c
+                self.stripper.addCounts(counts)
+        finally:
+            pool.close()
+            pool.join()
+
     def feed(self, data):
-        self.feededData += data
+        self.addFeededData(data)
         HTMLParser.feed(self, data)
 
+    def addFeededData(self, data):
+        newLine = data.find('\n')
+        while newLine != -1:
+            self.lineStarts.append(len(self.feededData) + newLine + 1)
+            newLine = data.find('\n', newLine + 1)
+        self.feededData += data
+
     def handle_starttag(self, tag, attrs):
         if tag == 'h2':
             self.parsing.h2Begin()
@@ -510,13 +998,23 @@ class HbFileParser(HTMLParser):
         self.dailyEntries.append(self.curDE)
 
     def beginSubjectEntryHeader(self):
+        if self.curDE.date == None:
+            raise ValueError('daily entry without a date')
         self.curSE = HbSubjectEntry(None)
         self.curDE.addSubject(self.curSE)
-        self.curSE.startPos = self.charNumFromLineAndOffset(self.getpos())
+        self.titleParts = []
 
     def setDailyEntryDate(self, data):
-        if self.curDE.date == None:
-            self.curDE.date = self.parseIsoDate(data)
+        if self.curDE.date == None and data.strip():
+            try:
+                self.curDE.date = self.parseIsoDate(data)
+            except ValueError, e:
+                raise ValueError("invalid date '" + data + "': " + str(e))
+
+    # the new lines of a title, which has no tags, are taken as spaces after
+    # a word which is followed by more text, and are dropped otherwise; the
+    # indentation of the <h3> header around its <a> is stripped
+    TitleNewLineRe = re.compile(r'(?<=\S)\n(?=[^\n])')
 
     def setSubjectEntryTitle(self, data = None):
         if self.curSE.title != None:
@@ -524,23 +1022,21 @@ class HbFileParser(HTMLParser):
         elif self.parsing.state == HbFileParsing.DefaultSubjectEntryOfDailyEntry:
             self.curSE.title = self.curDE.date.isoformat()
         else:
-            self.curSE.title = self.getTitleOfSubjectEntry()
+            self.curSE.title = HbFileParser.TitleNewLineRe.sub(
+                ' ', ''.join(self.titleParts)).replace('\n', '').strip()
+        self.titleParts = []
         # set DefaultSubjectEntries names
         if self.curSE.name == None:
             self.curSE.name = self.curSE.title
 
-    def getTitleOfSubjectEntry(self):
-        self.curSE.endPos = self.charNumFromLineAndOffset(self.getpos())
-        aStart = self.feededData.find('<a', self.curSE.startPos)
-        titleStart = self.feededData.find('>', aStart) + 1
-        assert titleStart > self.curSE.startPos
-        titleEnd = self.feededData.find('</a>', titleStart)
-        if titleEnd >= self.curSE.endPos:
-            print '\n' + self.feededData[self.curSE.startPos: self.curSE.endPos]
-        assert titleEnd < self.curSE.endPos
-        del self.curSE.startPos
-        del self.curSE.endPos
-        return self.stripNewLines(self.feededData[titleStart: titleEnd])
+    def addSubjectEntryTitleData(self, data):
+        """addSubjectEntryTitleData(data)
+
+        Add to the title of the current subject entry the text or the entity
+        reference, as written, found in its <h3> header. The tags of the
+        header aren't part of the title.
+        """
+        self.titleParts.append(data)
 
     def handleABegin(self, attrs):
         if self.curSE.name == None:
@@ -562,66 +1058,157 @@ class HbFileParser(HTMLParser):
     def handle_data(self, data):
         self.parsing.data(data)
 
+    def handle_entityref(self, name):
+        self.parsing.entity('&' + name + ';')
+
+    def handle_charref(self, name):
+        self.parsing.entity('&#' + name + ';')
+
     def startPos(self):
         self.start = self.charNumFromLineAndOffset(self.getpos())
 
     def endPos(self):
         self.end = self.charNumFromLineAndOffset(self.getpos())
-        self.curSE.contents = self.feededData[self.start: self.end + 1]
-        self.curSE.contents = self.stripNewLinesOutsideOfPreElements(self.curSE.contents)
-        self.curSE.contents = self.stripTopoFundoNavigation(self.curSE.contents)
-        self.curSE.contents = self.curSE.contents.replace('</h3>', '')
-        if (self.curSE.contents[-1:] == '<'):
-            self.curSE.contents = self.curSE.contents[:-1]
+        self.curSE.span = (self.start, self.end + 1)
+        if self.deferred != None:
+            self.deferred.append(self.curSE)
+        else:
+            self.curSE.contents = self.normalizeContents(
+                self.feededData[self.start: self.end + 1])
+
+    def normalizeContents(self, contents):
+        """normalizeContents(rawContents) -> contents of a subject entry"""
+        contents = self.stripNewLinesOutsideOfPreElements(contents)
+        contents = self.stripper.strip(contents)
+        if (contents[-1:] == '<'):
+            contents = contents[:-1]
+        return contents
 
     def charNumFromLineAndOffset(self, pos):
-        start = 0
-        line = 1
-        moreLines = True
-        while moreLines:
-            if line == pos[0]:
-                return start + pos[1]
-            start = self.feededData.find('\n', start)
-            moreLines = start != -1
-            line += 1
-            start += 1
+        """charNumFromLineAndOffset((line, offset)) -> offset in feededData
+
+        The offsets of the starts of the lines are kept by feed, so this
+        doesn't depend on the size of feededData.
+        """
+        if pos[0] > len(self.lineStarts):
+            return None
+        return self.lineStarts[pos[0] - 1] + pos[1]
+
+    SpaceRe = re.compile('\\s')
+
+    BlockTagStartRe = re.compile('<[phuo]', re.IGNORECASE)
 
     def stripNewLines(self, text):
-        lines = re.split('\\n', text)
+        lines = text.split('\n')
         for i in range(0, len(lines) - 1):
             if len(lines[i]) > 0 and len(lines[i + 1]) > 0:
-                if not re.match('\\s', lines[i][-1:]) and \
-                        not re.match('^<[phuo]', lines[i + 1], re.IGNORECASE):
+                if not HbFileParser.SpaceRe.match(lines[i][-1:]) and \
+                        not HbFileParser.BlockTagStartRe.match(lines[i + 1]):
                     lines[i] = lines[i] + ' '
-        from functools import reduce
-        return reduce(lambda s1, s2: s1 + s2, lines, '')
+        return ''.join(lines)
+
+    PreStartRe = re.compile('<pre>', re.IGNORECASE)
+
+    PreEndRe = re.compile('</pre>', re.IGNORECASE)
 
     def stripNewLinesOutsideOfPreElements(self, text):
-        result = ''
+        """stripNewLinesOutsideOfPreElements(text) -> text
+
+        Strip the new lines of text, except in its <pre> elements. An
+        unclosed <pre> element isn't searched for more than once.
+        """
+        parts = []
         start = 0
-        for match_pre in re.finditer('<pre>.*?</pre>', text[start:],
-                                     re.IGNORECASE | re.MULTILINE | re.DOTALL):
-            result += self.stripNewLines(text[start:match_pre.start()])
-            result += text[match_pre.start():match_pre.end()]
-            start = match_pre.end()
-        result += self.stripNewLines(text[start:])
-        return result
+        preStart = HbFileParser.PreStartRe.search(text)
+        while preStart:
+            preEnd = HbFileParser.PreEndRe.search(text, preStart.end())
+            if not preEnd:
+                break
+            parts.append(self.stripNewLines(text[start:preStart.start()]))
+            parts.append(text[preStart.start():preEnd.end()])
+            start = preEnd.end()
+            preStart = HbFileParser.PreStartRe.search(text, start)
+        parts.append(self.stripNewLines(text[start:]))
+        return ''.join(parts)
 
     TopoFundoNavigation = '<p><a href="#topo" class="ligacao">topo</a> | ' + \
                           '<a href="#fundo" class="ligacao">fundo</a></p>'
 
-    def stripTopoFundoNavigation(self, text):
-        return self.stripTextOf(text, HbFileParser.TopoFundoNavigation)
+    BoilerplateLiterals = [TopoFundoNavigation, '</h3>']
 
-    def stripTextOf(self, text, text2Strip):
-        if text.find(text2Strip) == -1:
-            return text
-        start = 0
-        found = True
-        strippedText = ''
-        while found:
-            end = text.find(text2Strip, start)
-            found = end != -1
-            strippedText += text[start: end]
-            start = end + len(text2Strip)
-        return strippedText
+    BoilerplateRegexes = [r'<p class="barranaveg">.*?</p>']
+
+    @staticmethod
+    def createBoilerplateStripper(literals = None, regexes = None):
+        """createBoilerplateStripper([literals[, regexes]]) -> stripper
+
+        Create a BoilerplateStripper for the fragments that are removed from
+        the subject entries contents, which default to
+        HbFileParser.BoilerplateLiterals and HbFileParser.BoilerplateRegexes.
+        """
+        if literals is None:
+            literals = HbFileParser.BoilerplateLiterals
+        if regexes is None:
+            regexes = HbFileParser.BoilerplateRegexes
+        return BoilerplateStripper(literals, regexes, re.IGNORECASE | re.DOTALL)
+
+
+class HbFileDiagnostic:
+    """An error found by a TolerantHbFileParser, at offset of the handbook
+    file, which is in line."""
+    def __init__(self, offset, line, message):
+        self.offset = offset
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        return '%d:%d: %s' % (self.line, self.offset, self.message)
+
+
+class TolerantHbFileParser(HbFileParser):
+    """A HbFileParser which doesn't stop at the first error of the parsing.
+
+    The error is recorded in the diagnostics, the subject entry in which it
+    happened is dropped, or the daily entry, if it happened in its header,
+    and everything is skipped until the next daily entry. So the daily
+    entries returned by parse are those which could be parsed.
+    """
+    def handle_starttag(self, tag, attrs):
+        self.tolerate(HbFileParser.handle_starttag, tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.tolerate(HbFileParser.handle_endtag, tag)
+
+    def handle_data(self, data):
+        self.tolerate(HbFileParser.handle_data, data)
+
+    def handle_entityref(self, name):
+        self.tolerate(HbFileParser.handle_entityref, name)
+
+    def handle_charref(self, name):
+        self.tolerate(HbFileParser.handle_charref, name)
+
+    def tolerate(self, handler, *args):
+        try:
+            handler(self, *args)
+        except (StateError, ValueError), e:
+            self.recover(e)
+
+    def recover(self, error):
+        """recover(error)
+
+        Record the error, drop the entry in which it happened and skip to the
+        next daily entry.
+        """
+        pos = self.getpos()
+        self.diagnostics.append(HbFileDiagnostic(
+                self.charNumFromLineAndOffset(pos), pos[0], str(error)))
+        state = self.parsing.state
+        if state == HbFileParsing.DailyEntry or self.curDE.date == None:
+            self.dailyEntries.remove(self.curDE)
+        elif state in (HbFileParsing.SubjectEntry,
+                       HbFileParsing.DefaultSubjectEntryOfDailyEntry,
+                       HbFileParsing.SubjectEntryContents):
+            self.curDE.subjects.remove(self.curSE)
+        self.titleParts = []
+        self.parsing.state = HbFileParsing.Resync
@@ -0,0 +1,87 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Benchmark of the adaptation of the links of the posts, from 1 to N worker
+# processes, over a synthetic archive of posts linking to each other.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import multiprocessing
+import random
+import sys
+import time
+from datetime import date, timedelta
+from optparse import OptionParser
+from htmled import Post, PostExtractor
+
+
+def syntheticPosts(n, linksPerPost = 10, files = 20, seed = 1):
+    """syntheticPosts(n[, linksPerPost[, files[, seed]]]) -> posts
+
+    Create n posts, ordered by date, spread over files handbook files, each
+    with a few paragraphs and linksPerPost links to the subject entries and
+    names of other posts.
+    """
+    rnd = random.Random(seed)
+    first = date(2000, 1, 1)
+    paragraph = '<p>' + 'Lorem ipsum dolor sit amet, consectetur. ' * 8 + \
+        '</p>'
+    posts = []
+    for i in range(n):
+        links = []
+        for j in range(linksPerPost):
+            target = rnd.randrange(n)
+            anchor = 'se%d' % target
+            if j % 3 == 0:
+                anchor = 'name%d' % target
+            links.append('<p><a href="ficheiro%02d.html#%s" class="ligacao">'
+                         'link %d</a> %s</p>' % (target % files, anchor, j,
+                                                 paragraph))
+        contents = '<p><a name="name%d">name</a></p>' % i + ''.join(links)
+        posts.append(Post(first + timedelta(i / 3), 'Post number %d' % i,
+                          contents, 'se%d' % i, 'ficheiro%02d.html' % (i % files)))
+    return posts
+
+def timeAdaptPostsLinks(n, workers, linksPerPost):
+    posts = syntheticPosts(n, linksPerPost)
+    pe = PostExtractor()
+    pe.workers = workers
+    start = time.time()
+    pe.adaptPostsLinks(posts)
+    return time.time() - start, [post.contents for post in posts]
+
+
+def main(args = sys.argv[1:]):
+    parser = OptionParser(usage='%prog [-n POSTS] [-l LINKS] [-w MAXWORKERS]')
+    parser.add_option('-n', '--posts', type='int', default=20000,
+                      help='the number of posts [default: %default]')
+    parser.add_option('-l', '--links', type='int', default=10,
+                      help='the number of links per post [default: %default]')
+    parser.add_option('-w', '--workers', type='int',
+                      default=multiprocessing.cpu_count(),
+                      help='the maximum number of workers [default: %default]')
+    (options, args) = parser.parse_args(args)
+    print 'posts: %d, links per post: %d' % (options.posts, options.links)
+    serialTime, serialContents = timeAdaptPostsLinks(options.posts, 1,
+                                                     options.links)
+    print 'workers  seconds  speedup  identical'
+    print '%7d  %7.3f  %7.2f  %9s' % (1, serialTime, 1.0, True)
+    for workers in range(2, options.workers + 1):
+        seconds, contents = timeAdaptPostsLinks(options.posts, workers,
+                                                options.links)
+        print '%7d  %7.3f  %7.2f  %9s' % (workers, seconds,
+                                           serialTime / seconds,
+                                           contents == serialContents)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# -*- mode: Python; coding: utf-8 -*-
+# Python file - http://www.python.org/
+
+# Scaling tests for htmled module: they fail when the time of parsing,
+# normalizing and adapting the links of handbooks of growing sizes grows
+# clearly faster than linearly.
+
+# Copyright (c) 2011 Contributors - see below
+# All rights reserved.
+# The use and distribution terms for this software are covered by the
+# Eclipse Public License 1.0 (http://opensource.org/licenses/eclipse-1.0.php)
+# which can be found in the file epl-v10.html at the root of this distribution.
+# By using this software in any fashion, you are agreeing to be bound by
+# the terms of this license.
+# You must not remove this notice, or any other, from this software.
+# Contributors:
+# - Luis Sergio Oliveira (euluis)
+
+import math
+import time
+import unittest
+from datetime import date, timedelta
+from StringIO import StringIO
+from htmled import *
+
+
+def hbText(days, subjectContents = None):
+    """hbText(days[, subjectContents]) -> text of a handbook file
+
+    A handbook file with a daily entry for each of days days, each with two
+    subject entries, whose contents are given by subjectContents(day).
+    """
+    if subjectContents == None:
+        subjectContents = lambda day: '<p>Text of the day\nin two lines.</p>'
+    parts = ['<html><body><div lang="en">\n']
+    for day in range(days):
+        d = (date(2000, 1, 1) + timedelta(day)).isoformat()
+        parts.append('<h2><a name="%s" class="ancora">%s</a></h2>\n' % (d, d))
+        for subject in range(2):
+            parts.append('<h3><a name="s%d_%d">Subject %d\nof %s</a></h3>\n' %
+                         (day, subject, subject, d))
+            parts.append(subjectContents(day) + '\n')
+    parts.append('</div>\n</body></html>\n')
+    return ''.join(parts)
+
+def parseHbText(text, name = 'ficheiro01.html'):
+    source = StringIO(text)
+    source.name = name
+    return HbFile(source)
+
+def denseLinks(day):
+    return '<p>' + ' '.join(['<a href="ficheiro01.html#s%d_%d">w</a> '
+                             '<a href="other.html">x</a>' %
+                             (max(day - i, 0), i % 2)
+                             for i in range(10)]) + '</p>'
+
+
+class ScalingTest(unittest.TestCase):
+    """Each test times an operation over inputs of growing sizes, taking the
+    best of a few runs, and fits the exponent of the growth of the time with
+    the size in a log-log least squares line.
+
+    The time is the processor time of the process, which other processes
+    running at the same time hardly change, and each run repeats the
+    operation for at least MinTime seconds, so that the small sizes aren't
+    timed at the resolution of the clock. A linear operation has an exponent
+    of about 1 and a quadratic one of about 2; MaxExponent tolerates the
+    remaining noise, and a test fails only if each of Attempts fits exceeds
+    it.
+    """
+    Sizes = [1, 2, 4, 8]
+    Runs = 5
+    MinTime = 0.02
+    MaxExponent = 1.35
+    Attempts = 2
+
+    def bestTime(self, operation, arg):
+        best = None
+        for run in range(ScalingTest.Runs):
+            calls = 0
+            elapsed = 0.0
+            start = time.clock()
+            while elapsed < ScalingTest.MinTime:
+                operation(arg)
+                calls += 1
+                elapsed = time.clock() - start
+            if best == None or elapsed / calls < best:
+                best = elapsed / calls
+        return best
+
+    def timeExponent(self, operation, args):
+        """timeExponent(operation, args) -> (exponent, times)"""
+        xs = []
+        ys = []
+        for k, arg in zip(ScalingTest.Sizes, args):
+            xs.append(math.log(k))
+            ys.append(math.log(self.bestTime(operation, arg)))
+        n = len(xs)
+        meanX = sum(xs) / n
+        meanY = sum(ys) / n
+        exponent = sum([(x - meanX) * (y - meanY) for x, y in zip(xs, ys)]) / \
+            sum([(x - meanX) ** 2 for x in xs])
+        return exponent, [round(math.exp(y), 5) for y in ys]
+
+    def assertLinear(self, operation, inputOfSize, base):
+        """assertLinear(operation, inputOfSize, base)
+
+        Fail if the time of operation(inputOfSize(base * k)) grows faster
+        than about linearly with the factors k of ScalingTest.Sizes.
+        """
+        args = [inputOfSize(base * k) for k in ScalingTest.Sizes]
+        for attempt in range(ScalingTest.Attempts):
+            exponent, times = self.timeExponent(operation, args)
+            if exponent <= ScalingTest.MaxExponent:
+                return
+        self.fail('The time grows as size ** %.2f, times: %s' %
+                  (exponent, times))
+
+    def testParse(self):
+        self.assertLinear(parseHbText, hbText, 150)
+
+    def testParseVeryLongLines(self):
+        self.assertLinear(parseHbText, lambda days: hbText(days).replace(
+                '\n', ' '), 150)
+
+    def testParseHugePreElements(self):
+        self.assertLinear(parseHbText, lambda lines: hbText(
+                2, lambda day: '<pre>' + 'code line\n' * lines + '</pre>'),
+                          2000)
+
+    def testNormalizeManyPreElements(self):
+        parser = HbFileParser(None)
+        self.assertLinear(parser.stripNewLinesOutsideOfPreElements,
+                          lambda n: '<p>a\nb</p><pre>x\ny</pre>\n' * n, 2000)
+
+    def testNormalizeUnclosedPreElements(self):
+        parser = HbFileParser(None)
+        self.assertLinear(parser.stripNewLinesOutsideOfPreElements,
+                          lambda n: '<p>a\nb</p><pre>x\ny\n' * n, 1000)
+
+    def testStripNewLines(self):
+        parser = HbFileParser(None)
+        self.assertLinear(parser.stripNewLines, lambda n: 'word\n' * n, 5000)
+
+    def testStripTags(self):
+        pe = PostExtractor()
+        self.assertLinear(pe.stripTags, lambda n: '<b>word</b> ' * n, 5000)
+
+    def testAdaptDenseLinks(self):
+        self.assertLinear(lambda hbf: PostExtractor(hbf).extractPosts(),
+                          lambda days: parseHbText(hbText(days, denseLinks)),
+                          50)
+
+    def testAdaptLinksWithoutAnchors(self):
+        pe = PostExtractor()
+        self.assertLinear(lambda post: pe.adaptPostsLinks([post]),
+                          lambda n: Post(date(2000, 1, 1), 'T',
+                                         '<a href="other.html">x</a> ' * n,
+                                         's', 'ficheiro01.html'), 1000)
+
+    def testBlogLinkFromHbfLink(self):
+        pe = PostExtractor()
+        def resolveAll(posts):
+            for post in posts:
+                match = pe.searchHbfIntraLink(post.contents)
+                pe.blogLinkFromHbfLink(posts, post, match)
+        self.assertLinear(resolveAll, lambda n: [
+                Post(date(2000, 1, 1) + timedelta(i), 'Post %d' % i,
+                     '<a href="#s%d">x</a>' % (n - i - 1), 's%d' % i,
+                     'ficheiro01.html') for i in range(n)], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
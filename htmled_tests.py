@@ -16,6 +16,7 @@
 
 import unittest
 from datetime import date
+from StringIO import StringIO
 from htmled import *
 
 class TestsForGetHbFileName(unittest.TestCase):
@@ -84,6 +85,32 @@ class HbFileTest(unittest.TestCase):
                           des[2].subjects[0].contents)
 
 
+class BoilerplateStripperTest(unittest.TestCase):
+    """Unit tests for the BoilerplateStripper class."""
+    def testStripLiteralsAndRegexesInOnePass(self):
+        stripper = BoilerplateStripper(['<hr>', 'a.b'], [r'<!--.*?-->'])
+        self.assertEquals('x a_b yz', stripper.strip(
+                '<hr>x a_b y<!-- c -->a.bz<!--d--><hr>'))
+        self.assertEquals({'<hr>': 2, 'a.b': 1, r'<!--.*?-->': 2},
+                          stripper.counts)
+
+    def testRegexesWithGroups(self):
+        regex = r'<(p|div) class="nav">.*?</\w+>'
+        stripper = BoilerplateStripper([], [regex, 'X'])
+        self.assertEquals('ab', stripper.strip('a<p class="nav">n</p>XbX'))
+        self.assertEquals(1, stripper.counts[regex])
+        self.assertEquals(2, stripper.counts['X'])
+
+    def testCountsAccumulate(self):
+        stripper = BoilerplateStripper(['-'])
+        stripper.strip('a-b')
+        stripper.strip('-c-')
+        self.assertEquals(3, stripper.counts['-'])
+
+    def testWithoutFragmentsTextIsUnchanged(self):
+        self.assertEquals('text', BoilerplateStripper().strip('text'))
+
+
 class TestPost(unittest.TestCase):
     def setUp(self):
         self.title = 'The Title!'
@@ -158,6 +185,36 @@ class TestPost(unittest.TestCase):
                                         'Customizing Eeebuntu GNU/Linux 3.0 Standard into a development environment',
                                         2009, 9, 21)
 
+    def testFingerprintIsStableAndFollowsContents(self):
+        post = Post(date(2010, 2, 6), 'Title', '<p>x</p>', 'n', 'h.html')
+        same = Post(date(2010, 2, 6), 'Title', '<p>x</p>', 'n', 'h.html')
+        self.assertEquals(post.getFingerprint(), same.getFingerprint())
+        same.contents = '<p>y</p>'
+        self.assertNotEquals(post.getFingerprint(), same.getFingerprint())
+
+    def testEqualityFollowsKey(self):
+        post = Post(date(2010, 2, 6), 'Title', '<p>x</p>', 'n', 'h.html')
+        self.assertEquals(('h.html', 'n', date(2010, 2, 6)), post.getKey())
+        edited = Post(date(2010, 2, 6), 'Edited', '<p>y</p>', 'n', 'h.html')
+        self.assertTrue(post == edited)
+        self.assertEquals(hash(post), hash(edited))
+        sameDate = Post(date(2010, 2, 6), 'Title', '<p>x</p>', 'm', 'h.html')
+        self.assertTrue(post != sameDate)
+        self.assertFalse(post == None)
+        self.assertEquals(1, len(set([post, edited])))
+
+    def testOrderedByDateOnly(self):
+        posts = [Post(date(2010, 2, 8), 'A', '', 'a', 'h.html'),
+                 Post(date(2010, 2, 6), 'B', '', 'b', 'h.html'),
+                 Post(date(2010, 2, 6), 'A', '', 'c', 'h.html')]
+        self.assertEquals(['b', 'c', 'a'],
+                          [post.subjname for post in sorted(posts)])
+
+    def test__hash__spreadsPostsOfTheSameDate(self):
+        posts = [Post(date(2010, 2, 6), 'Title', '', 'n%d' % i, 'h.html')
+                 for i in range(1000)]
+        self.assertEquals(1000, len(set([hash(post) for post in posts])))
+
     def test__hash__fullyInitializedPost(self):
         post = Post(date(2009, 10, 2), 'title', 'contents', 'name', '')
         self.assertTrue(isinstance(post.__hash__(), int))
@@ -171,6 +228,28 @@ class TestPost(unittest.TestCase):
         self.assertTrue(isinstance(post.__hash__(), int))
 
 
+class AnchorTableTest(unittest.TestCase):
+    def setUp(self):
+        self.post1 = Post(date(2009, 11, 6), 'Post 1', '<p><a name="x">x</a></p>',
+                          'post1', 'hbf.html')
+        self.post2 = Post(date(2009, 11, 7), 'Post 2', '<p><a name="post1">!</a></p>',
+                          'post2', 'hbf.html')
+        self.anchors = AnchorTable([self.post1, self.post2])
+
+    def testResolveSubjectNameAndNames(self):
+        self.assertEquals((self.post1.getPermaLink(), False),
+                          self.anchors.resolve('hbf.html', 'post1'))
+        self.assertEquals((self.post1.getPermaLink(), True),
+                          self.anchors.resolve('hbf.html', 'x'))
+        self.assertEquals(None, self.anchors.resolve('other.html', 'x'))
+        self.assertEquals(3, len(self.anchors))
+
+    def testFirstPostAddedWins(self):
+        anchors = AnchorTable([self.post2, self.post1])
+        self.assertEquals((self.post2.getPermaLink(), True),
+                          anchors.resolve('hbf.html', 'post1'))
+
+
 class TestPostExtractor(unittest.TestCase):
     """Test cases for the PostExtractor class."""
     def setUp(self):
@@ -193,6 +272,48 @@ class TestPostExtractor(unittest.TestCase):
         self.pe = PostExtractor(self.hbf, self.hbf2)
         self.assertEquals(2, len(self.pe.hbfs))
 
+    def copyOfHbFile(self, name):
+        source = StringIO(open('dummy_hbfile.html').read())
+        source.name = name
+        return HbFile(source)
+
+    def testDedupDropsEntriesCopiedIntoAnotherHbFile(self):
+        self.pe = PostExtractor(self.hbf, self.copyOfHbFile('copy.html'))
+        self.assertEquals(8, len(self.pe.getPosts()))
+        self.pe.dedup = True
+        posts = self.pe.getPosts()
+        self.assertEquals(4, len(posts))
+        self.assertEquals(['dummy_hbfile.html'] * 4,
+                          [post.hbfname for post in posts])
+
+    def hbFileOf(self, name, text):
+        source = StringIO('<html><body><div>\n' + text + '</div>\n' +
+                          '</body></html>\n')
+        source.name = name
+        return HbFile(source)
+
+    def testDedupAdaptsTheLinksToTheDroppedCopies(self):
+        header = '<h2><a name="2010-01-01">2010-01-01</a></h2>\n'
+        copied = '<h3><a name="copied">Copied</a></h3>\n<p>text</p>\n'
+        linking = '<h3><a name="linking">Linking</a></h3>\n' + \
+            '<p><a href="#copied">the copied entry</a></p>\n'
+        for extract in (lambda pe: pe.getPosts(), lambda pe: pe.extractPosts()):
+            pe = PostExtractor(self.hbFileOf('a.html', header + copied),
+                               self.hbFileOf('b.html', header + copied +
+                                             linking))
+            pe.dedup = True
+            posts = extract(pe)
+            self.assertEquals([('a.html', 'copied'), ('b.html', 'linking')],
+                              [(post.hbfname, post.subjname) for post in posts])
+            self.assertTrue('href="' + posts[0].getPermaLink() + '"' in
+                            posts[1].contents)
+
+    def testUniquePostsKeepsTheFirstOfEachFingerprint(self):
+        posts = [Post(date(2010, 2, 6), 'T', '<p>x</p>', 'a', 'h1.html'),
+                 Post(date(2010, 2, 6), 'T', '<p>y</p>', 'b', 'h1.html'),
+                 Post(date(2010, 2, 6), 'T', '<p>x</p>', 'a', 'h2.html')]
+        self.assertEquals(posts[:2], list(uniquePosts(posts)))
+
     def testGetPosts(self):
         des = self.hbf.dailyEntries
         self.assertEquals(2, len(des[0].subjects))
@@ -225,13 +346,46 @@ class TestPostExtractor(unittest.TestCase):
         self.assertEquals(1, len(posts))
         self.assertEquals(4, len(self.pe.getPosts(date(2010, 2, 6))))
 
+    def testGetPostsByRanges(self):
+        ranges = [(date(2010, 2, 6), date(2010, 2, 6)),
+                  (date(2010, 2, 7), date(2010, 5, 31)),
+                  (date(2010, 6, 1), date(2010, 12, 31)),
+                  (None, date(2010, 2, 7))]
+        postsOfRanges = self.pe.getPostsByRanges(ranges)
+        self.assertEquals([2, 2, 0, 2], [len(posts) for posts in postsOfRanges])
+        self.assertEquals(date(2010, 5, 16), postsOfRanges[1][1].date)
+        for (d1, d2), posts in zip(ranges, postsOfRanges):
+            self.assertEquals([str(post) for post in self.pe.getPosts(d1, d2)],
+                              [str(post) for post in posts])
+
+    def testGroupPostsByMonth(self):
+        groups = self.pe.groupPosts('month')
+        self.assertEquals([(2010, 2), (2010, 5)], [key for key, _ in groups])
+        self.assertEquals([3, 1], [len(posts) for _, posts in groups])
+
+    def testGroupPostsByYearAndWeek(self):
+        self.hbf2 = HbFile(self.f2)
+        self.pe = PostExtractor(self.hbf, self.hbf2)
+        groups = self.pe.groupPosts(by = 'year')
+        self.assertEquals([((2010,), 4), ((2011,), 4)],
+                          [(key, len(posts)) for key, posts in groups])
+        groups = self.pe.groupPosts(by = 'week')
+        self.assertEquals([(2010, 5), (2010, 6), (2010, 19), (2011, 5),
+                           (2011, 6), (2011, 20)], [key for key, _ in groups])
+        self.assertEquals([2, 1, 1, 2, 1, 1], [len(posts) for _, posts in groups])
+
+    def testGroupPostsByUnknownGroupingFails(self):
+        self.assertRaises(ValueError, self.pe.groupPosts, 'day')
+
     def testPostTitleFreeOfTags(self):
-        subj = HbSubjectEntry('<code>Xpto</code> testing', 'subj_name')
-        subj.contents = 'some contents'
-        self.hbf.dailyEntries[1].subjects.append(subj)
-        self.pe = PostExtractor(self.hbf)
-        posts = self.pe.getPosts()
-        self.assertEquals('Xpto testing', posts[3].title)
+        source = StringIO('<html><body><div>\n' +
+                          '<h2><a name="2010-02-10">2010-02-10</a></h2>\n' +
+                          '<h3><a name="subj_name"><code>Xpto</code>\n' +
+                          'testing</a></h3>\n<p>some contents</p>\n' +
+                          '</div>\n</body></html>\n')
+        source.name = 'ficheiro01.html'
+        posts = PostExtractor(HbFile(source)).getPosts()
+        self.assertEquals('Xpto testing', posts[0].title)
 
     def testBlogLinkFromInterHbfHbfLink(self):
         postName = 'name'
@@ -318,6 +472,35 @@ class TestPostExtractor(unittest.TestCase):
         self.assertEquals(1, post2.contents.count(post1.getPermaLink() +
                                                   '#intra-post1-link'))
     
+    def testParallelLinksAdaptationEqualsSerial(self):
+        self.hbf2 = HbFile(self.f2)
+        serial = PostExtractor(self.hbf, self.hbf2).extractPosts()
+        self.f1.seek(0)
+        self.f2.seek(0)
+        pe = PostExtractor(HbFile(self.f1), HbFile(self.f2))
+        pe.workers = 3
+        PostExtractor.LinksBatchSize = 1
+        try:
+            parallel = pe.extractPosts()
+        finally:
+            PostExtractor.LinksBatchSize = 256 * 1024
+        self.assertEquals([(p.date, p.title, p.contents) for p in serial],
+                          [(p.date, p.title, p.contents) for p in parallel])
+
+    def testParallelIterPostsAdaptsOnlyPostsInRange(self):
+        self.hbf2 = HbFile(self.f2)
+        pe = PostExtractor(self.hbf, self.hbf2)
+        pe.workers = 2
+        posts = list(pe.iterPosts(date(2011, 2, 6), date(2011, 2, 6)))
+        self.assertEquals(2, len(posts))
+        self.assertEquals(1, sum([post.contents.count(Post.BlogURL)
+                                  for post in posts]))
+
+    def testSizedBatches(self):
+        self.assertEquals([['ab', 'c'], ['def'], ['g']],
+                          sizedBatches(['ab', 'c', 'def', 'g'], len, 3))
+        self.assertEquals([[]], sizedBatches([], len, 3))
+
     def testResolvesLinksBetweenHbFiles(self):
         self.hbf2 = HbFile(self.f2)
         self.pe = PostExtractor(self.hbf, self.hbf2)
@@ -346,6 +529,7 @@ class HbFileParsingTest(unittest.TestCase):
         self.setDailyEntryDateCalled = False
         self.setDailyEntryDateCalledWith = None
         self.subjectEntryTitle = None
+        self.subjectEntryTitleData = []
         self.aAttributes = None
     
     def testIdle2DailyEntry(self):
@@ -390,6 +574,9 @@ class HbFileParsingTest(unittest.TestCase):
         else:
             self.subjectEntryTitle = data
 
+    def addSubjectEntryTitleData(self, data):
+        self.subjectEntryTitleData.append(data)
+
     def startPos(self):
         self.startPosCalled = True
 
@@ -405,6 +592,16 @@ class HbFileParsingTest(unittest.TestCase):
         self.parsing.h3End()
         self.parsing.tagBegin()
         assert self.parsing.state == HbFileParsing.SubjectEntryContents
+        self.assertEquals([title], self.subjectEntryTitleData)
+
+    def testSubjectEntryEntityEvents(self):
+        self.parsing.state = HbFileParsing.DailyEntry
+        self.parsing.h3Begin()
+        self.parsing.data('Caf')
+        self.parsing.entity('&eacute;')
+        self.parsing.h3End()
+        self.parsing.entity('&amp;')
+        self.assertEquals(['Caf', '&eacute;'], self.subjectEntryTitleData)
 
     def testDaily2Subject2Contents2Daily(self):
         self.parsing.state = HbFileParsing.DailyEntry
@@ -521,10 +718,63 @@ class HbFileParserTest(unittest.TestCase):
                          self.makeDailyEntryHeader('2006-03-31') + '\n')
         self.assertEquals(2, len(self.parser.dailyEntries))
 
-    def testStripTopoFundoNavigation(self):
-        contents = self.p1 + HbFileParser.TopoFundoNavigation
+    def testBoilerplateStrippedFromSubjectEntryContents(self):
+        self.parser.feed(self.makeDailyEntryHeader('2006-03-20') + '\n' +
+                         self.makeSubjectEntryHeader('name', 'title') + '\n' +
+                         self.p1 + HbFileParser.TopoFundoNavigation +
+                         self.makeDailyEntryHeader('2006-03-21'))
         self.assertEquals(self.p1,
-                          self.parser.stripTopoFundoNavigation(contents))
+                          self.parser.dailyEntries[0].subjects[0].contents)
+        self.assertEquals(1, self.parser.stripper.counts[
+                HbFileParser.TopoFundoNavigation])
+
+    def testParserWithCustomBoilerplateStripper(self):
+        seguinte = '<a href="[^"]*" class="ligacao">seguinte</a>'
+        self.parser = HbFileParser(None, HbFileParser.createBoilerplateStripper(
+                regexes = [seguinte]))
+        self.parser.feed(self.makeDailyEntryHeader('2006-03-20') + '\n' +
+                         self.p1 + '<a href="x.html#topo" class="ligacao">' +
+                         'seguinte</a>' + self.makeDailyEntryHeader('2006-03-21'))
+        self.assertEquals(self.p1,
+                          self.parser.dailyEntries[0].subjects[0].contents)
+        self.assertEquals(1, self.parser.stripper.counts[seguinte])
+
+    def parseWithWorkers(self, text, workers):
+        source = StringIO(text)
+        parser = HbFileParser(source, workers=workers)
+        return parser, parser.parse()
+
+    def testParallelNormalizationEqualsSerial(self):
+        text = ''.join([self.makeDailyEntryHeader('2006-03-%02d' % day) +
+                        '\n' + self.makeSubjectEntryHeader('se%d' % day,
+                                                           'Title %d' % day) +
+                        '\n' + self.p1 + '\n<pre>a\nb</pre>\n' +
+                        HbFileParser.TopoFundoNavigation
+                        for day in range(1, 29)]) + \
+                        self.makeDailyEntryHeader('2006-03-29')
+        serialParser, serial = self.parseWithWorkers(text, 1)
+        HbFileParser.NormalizationBatchSize = 1024
+        try:
+            parallelParser, parallel = self.parseWithWorkers(text, 3)
+        finally:
+            HbFileParser.NormalizationBatchSize = 256 * 1024
+        self.assertEquals(len(serial), len(parallel))
+        for serialDE, parallelDE in zip(serial, parallel):
+            self.assertEquals(
+                [(se.title, se.contents, se.span) for se in serialDE.subjects],
+                [(se.title, se.contents, se.span) for se in parallelDE.subjects])
+        self.assertEquals(28, parallelParser.stripper.counts[
+                HbFileParser.TopoFundoNavigation])
+        self.assertEquals(serialParser.stripper.counts,
+                          parallelParser.stripper.counts)
+
+    def testSubjectEntrySpanOfRawContents(self):
+        text = self.makeDailyEntryHeader('2006-03-20') + '\n' + \
+            self.makeSubjectEntryHeader('name', 'title') + '\n' + self.p1 + \
+            self.makeDailyEntryHeader('2006-03-21')
+        self.parser.feed(text)
+        start, end = self.parser.dailyEntries[0].subjects[0].span
+        self.assertEquals(self.p1, self.parser.normalizeContents(text[start: end]))
 
     def testStripNewlinesWithoutTrailingWhitespaceDoesntColateWords(self):
         textWithNewlines = "Line1\nLast line \n"
@@ -557,8 +807,23 @@ class HbFileParserTest(unittest.TestCase):
                                                     'The title with  newline')
 
     def testParseSubjectEntryWithCodeTagInTitle(self):
-        title = '<code>Xpto</code> testing'
-        self.assertParsingOfSubjectEntryTitleEquals(title, title)
+        self.assertParsingOfSubjectEntryTitleEquals('<code>Xpto</code> testing',
+                                                    'Xpto testing')
+
+    def testParseSubjectEntryWithEntitiesInTitle(self):
+        self.assertParsingOfSubjectEntryTitleEquals(
+            'Caf&eacute; &amp; <b>P&#227;o</b>', 'Caf&eacute; &amp; P&#227;o')
+
+    def testParseSubjectEntryWithIndentedAnchorInTitle(self):
+        self.parser.feed(self.makeDailyEntryHeader('2006-04-10') + '\n' +
+                         '<h3>\n  <a name="a1">Good\n  one</a>\n</h3>\n' +
+                         self.p1 + '\n')
+        self.assertEquals('Good   one',
+                          self.parser.dailyEntries[0].subjects[0].title)
+
+    def testParseSubjectEntryWithNestedMarkupInTitle(self):
+        self.assertParsingOfSubjectEntryTitleEquals(
+            '<em>New\n<code>x &lt; y</code></em> rule', 'New x &lt; y rule')
 
     def assertTextFoundInContestsOfWrappedSubjectEntryContainingText(self,
                                                                      textToPlaceInSubjectEntry,
@@ -591,5 +856,62 @@ class HbFileParserTest(unittest.TestCase):
                                                                           expectedParenLine)
 
 
+
+class TolerantHbFileParserTest(unittest.TestCase):
+    def dailyEntry(self, d, *subjects):
+        return '<h2><a name="%s" class="ancora">%s</a></h2>\n' % (d, d) + \
+            ''.join(['<h3><a name="%s">%s</a></h3>\n<p>%s</p>\n' %
+                     (name, name.upper(), name) for name in subjects])
+
+    def parse(self, text):
+        source = StringIO('<html><body><div>\n' + text + '</div>\n</body>' +
+                          '</html>\n')
+        source.name = 'ficheiro01.html'
+        return HbFile(source, tolerant = True)
+
+    def entries(self, hbf):
+        return [(de.date.isoformat(), [se.name for se in de.subjects])
+                for de in hbf.dailyEntries]
+
+    def testWellFormedFileHasNoDiagnostics(self):
+        hbf = self.parse(self.dailyEntry('2010-01-01', 'a', 'b'))
+        self.assertEquals([('2010-01-01', ['a', 'b'])], self.entries(hbf))
+        self.assertEquals([], hbf.diagnostics)
+
+    def testBrokenSubjectEntryIsDroppedUntilNextDailyEntry(self):
+        text = self.dailyEntry('2010-01-01', 'a', 'b').replace(
+            '<p>b</p>', '<p>b</h2></p>') + \
+            self.dailyEntry('2010-01-02', 'c')
+        source = StringIO(text)
+        self.assertRaises(StateError, HbFile, source)
+        hbf = self.parse(text)
+        self.assertEquals([('2010-01-01', ['a']), ('2010-01-02', ['c'])],
+                          self.entries(hbf))
+        [diagnostic] = hbf.diagnostics
+        self.assertEquals(len('<html><body><div>\n') + text.index('</h2></p>'),
+                          diagnostic.offset)
+        self.assertEquals(6, diagnostic.line)
+        self.assertTrue('h2End' in diagnostic.message)
+        self.assertTrue(str(diagnostic).startswith("6:%d: " %
+                                                   diagnostic.offset))
+
+    def testEveryErrorIsFoundInOnePass(self):
+        text = self.dailyEntry('2010-01-01', 'a') + \
+            self.dailyEntry('2010-13-45', 'b') + \
+            self.dailyEntry('2010-01-03', 'c').replace('<p>c</p>',
+                                                       '<p>c</h2></p>') + \
+            '<h2></h2>\n<h3><a name="d">D</a></h3>\n' + \
+            self.dailyEntry('2010-01-05', 'e')
+        hbf = self.parse(text)
+        self.assertEquals([('2010-01-01', ['a']), ('2010-01-03', []),
+                           ('2010-01-05', ['e'])], self.entries(hbf))
+        self.assertEquals(3, len(hbf.diagnostics))
+        self.assertEquals(sorted([d.offset for d in hbf.diagnostics]),
+                          [d.offset for d in hbf.diagnostics])
+        self.assertTrue(hbf.diagnostics[0].message.startswith(
+                "invalid date '2010-13-45'"))
+        self.assertTrue('without a date' in hbf.diagnostics[2].message)
+
+
 if __name__ == "__main__":
     unittest.main()